@@ -0,0 +1,73 @@
+"""Завантаження чекпоінтів для агрегації: через SignalPredictor та напряму в NumPy
+
+Запуск з кореня проекту:
+    python benchmarks/checkpoint_io_benchmark.py [--models 3]
+"""
+import os
+import sys
+import glob
+import time
+import resource
+import argparse
+import tempfile
+import numpy as np
+import tensorflow as tf
+
+# Додаємо кореневу директорію проекту до PYTHONPATH
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from core_ml_components.signal_predictor import SignalPredictor
+from core_ml_components.checkpoint_io import read_checkpoint, write_checkpoint
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def restore_tensor(path, name, dtype):
+    """Читання одного тензора тим самим оп, що й SignalPredictor.restore"""
+    return tf.raw_ops.Restore(file_pattern=path, tensor_name=name, dt=dtype).numpy()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк читання чекпоінтів')
+    parser.add_argument('--models', type=int, default=3)
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(os.path.join(ROOT_DIR, "federated_client", "client*", "retrained_model", "*.ckpt")))
+    paths = paths[:args.models]
+
+    # Паритет: read_checkpoint дає те саме, що raw_ops.Restore у SignalPredictor.restore,
+    # а файл write_checkpoint читається назад без змін
+    tensors = read_checkpoint(paths[0])
+    assert all(np.array_equal(restore_tensor(paths[0], name, tf.as_dtype(value.dtype)), value)
+               for name, value in tensors.items())
+    written = write_checkpoint(os.path.join(tempfile.mkdtemp(), "written.ckpt"), tensors)
+    assert all(np.array_equal(restore_tensor(written, name, tf.as_dtype(value.dtype)), value)
+               for name, value in tensors.items())
+    print(f"Паритет: {len(tensors)} тензорів збігаються з raw_ops.Restore, запис/читання без втрат")
+
+    rss_before = peak_rss_mb()
+    start = time.perf_counter()
+    weights = [read_checkpoint(path) for path in paths]
+    numpy_time = time.perf_counter() - start
+    numpy_rss = peak_rss_mb() - rss_before
+
+    # Попередній шлях створював окрему модель на кожен чекпоінт (restore тут не
+    # враховано, тож це нижня межа його вартості)
+    rss_before = peak_rss_mb()
+    start = time.perf_counter()
+    models = [SignalPredictor() for _ in paths]
+    model_time = time.perf_counter() - start
+    model_rss = peak_rss_mb() - rss_before
+    del models
+
+    print(f"Чекпоінтів: {len(weights)}")
+    print(f"  SignalPredictor() на кожен: {model_time:.2f} с, +{model_rss:.0f} МБ піку RSS")
+    print(f"  read_checkpoint:            {numpy_time:.3f} с, +{numpy_rss:.0f} МБ піку RSS")
+    print(f"  прискорення: {model_time / numpy_time:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Час раунду для кількох клієнтів на одній машині з розподілом ядер і без нього
+
+Кожен "клієнт" - окремий процес, який, як federated_client.py, готує модель
+та тренує фіксовану кількість кроків на батчі такого ж розміру. Час раунду - від
+запуску першого процесу до завершення останнього. Без розподілу кожен
+процес створює пули потоків TF на всі ядра; з розподілом процеси
+прив'язуються до ядер (plan_cpu_partition) і отримують відповідну
+кількість потоків.
+
+Запуск з кореня проекту:
+    python benchmarks/cpu_partition_benchmark.py --clients 7
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+# Додаємо кореневу директорію проекту до PYTHONPATH
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from core_ml_components.cpu_partition import plan_cpu_partition, thread_env, pin_process, available_cpus
+
+WORKER_SNIPPET = """
+import time, json, sys
+sys.path.append({root!r})
+import numpy as np
+from core_ml_components.model_artifact import load_predictor
+x = np.random.default_rng({seed}).random(({batch_size}, 150, 6), dtype=np.float32)
+y = x[:, -1, :]
+model = load_predictor()
+model.train(x=x, y=y)
+start = time.perf_counter()
+for _ in range({steps}):
+    np.asarray(model.train(x=x, y=y)["loss"])
+print(json.dumps({{"train_seconds": time.perf_counter() - start}}))
+"""
+
+
+def run_round(num_clients, steps, batch_size, partitioned):
+    plan = plan_cpu_partition(num_clients, evaluation=False) if partitioned else None
+    base_env = dict(os.environ, TF_CPP_MIN_LOG_LEVEL="3")
+
+    start = time.perf_counter()
+    processes = []
+    for i in range(1, num_clients + 1):
+        env = thread_env(plan[f"client_{i}"], base_env) if plan else base_env
+        process = subprocess.Popen(
+            [sys.executable, "-c", WORKER_SNIPPET.format(root=ROOT_DIR, seed=i, steps=steps, batch_size=batch_size)],
+            cwd=ROOT_DIR, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        if plan:
+            pin_process(process.pid, plan[f"client_{i}"])
+        processes.append(process)
+
+    train_times = []
+    for process in processes:
+        stdout, stderr = process.communicate()
+        lines = [line for line in stdout.splitlines() if line.startswith("{")]
+        if not lines:
+            raise RuntimeError(stderr[-2000:])
+        train_times.append(json.loads(lines[-1])["train_seconds"])
+    return time.perf_counter() - start, train_times
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Час раунду з розподілом ядер і без нього')
+    parser.add_argument('--clients', type=int, default=7, help='Кількість процесів-клієнтів')
+    parser.add_argument('--steps', type=int, default=20, help='Кроків тренування на клієнта')
+    parser.add_argument('--batch_size', type=int, default=128, help='Розмір батчу')
+    args = parser.parse_args()
+
+    # Артефакт моделі готуємо заздалегідь, щоб процеси не експортували його одночасно
+    from core_ml_components.model_artifact import load_predictor, load_artifact
+    if load_artifact() is None:
+        load_predictor()
+
+    print(f"Ядер: {len(available_cpus())}, клієнтів: {args.clients}, кроків: {args.steps}, батч: {args.batch_size}")
+    print("Розподіл:", plan_cpu_partition(args.clients, evaluation=False))
+    for label, partitioned in (("без розподілу", False), ("з розподілом", True)):
+        wall_time, train_times = run_round(args.clients, args.steps, args.batch_size, partitioned)
+        print(f"  {label:14s} раунд {wall_time:6.2f} с, тренування на клієнта: "
+              f"сер. {sum(train_times) / len(train_times):.2f} с, макс. {max(train_times):.2f} с")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Байти на раунд та збіжність: повний чекпоінт проти стиснених дельт
+
+Кілька раундів FedAvg для клієнтів client1..N в одному процесі. У кожному
+раунді клієнт тренує одну епоху від глобальних ваг; сервер отримує або
+повний чекпоінт, або дельту (topk / int8 з error feedback), записану у файл
+і прочитану назад, та відновлює повні ваги через apply_delta. Після
+кожного раунду глобальна модель оцінюється (MSE) на вікнах з даних
+клієнта, який не бере участі в тренуванні.
+
+Запуск з кореня проекту:
+    python benchmarks/delta_upload_benchmark.py --rounds 5
+"""
+import os
+import sys
+import argparse
+import tempfile
+import numpy as np
+
+# Додаємо кореневу директорію проекту до PYTHONPATH
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from core_ml_components.signal_predictor import SignalPredictor
+from core_ml_components.util_functions import load_prepared_series, INPUT_SIZE
+from core_ml_components.recording_format import list_recordings
+from core_ml_components.checkpoint_io import write_checkpoint
+from core_ml_components.weight_delta import DeltaCompressor, weight_delta, write_delta, read_delta, apply_delta
+
+CONFIGS = [
+    ("повний", None, None),
+    ("int8", "int8", None),
+    ("topk 10%", "topk", 0.1),
+    ("topk 1%", "topk", 0.01),
+]
+
+
+def client_series(client_num, max_samples, min_vals, max_vals):
+    data_file = list_recordings(os.path.join(ROOT_DIR, "federated_client", f"client{client_num}", "data"))[0]
+    series = load_prepared_series(data_file, INPUT_SIZE, min_vals, max_vals)[:max_samples]
+    return np.asarray(series, dtype=np.float32)
+
+
+def evaluate(model, series, n_windows=1024):
+    starts = np.linspace(0, len(series) - INPUT_SIZE - 1, n_windows).astype(int)
+    X = series[starts[:, None] + np.arange(INPUT_SIZE)]
+    y = series[starts + INPUT_SIZE]
+    prediction = np.asarray(model.infer(X)["output"])
+    return float(np.mean((prediction - y) ** 2))
+
+
+def run_config(model, initial_weights, initial_optimizer, clients, validation, rounds, method, topk_ratio, tmp_dir):
+    global_weights = dict(initial_weights)
+    compressors = [DeltaCompressor(method, topk_ratio or 0.01) if method else None for _ in clients]
+    history = []
+    for _ in range(rounds):
+        uploads, counts, round_bytes = [], [], 0
+        for i, series in enumerate(clients):
+            model.model.set_weights([global_weights[str(j)] for j in range(len(global_weights))])
+            for variable, value in zip(model.model.optimizer.variables, initial_optimizer):
+                variable.assign(value)
+            model.train_epoch(series)
+            trained = {str(j): w for j, w in enumerate(model.model.get_weights())}
+
+            path = os.path.join(tmp_dir, f"client_{i}")
+            if compressors[i] is None:
+                write_checkpoint(path + ".ckpt", trained)
+                round_bytes += os.path.getsize(path + ".ckpt")
+                uploads.append(trained)
+            else:
+                compressed = compressors[i].compress(weight_delta(trained, global_weights))
+                write_delta(path + ".delta", compressed, global_weights, method)
+                round_bytes += os.path.getsize(path + ".delta")
+                uploads.append(apply_delta(global_weights, read_delta(path + ".delta")[1]))
+                compressors[i].commit()
+            counts.append(len(series) - INPUT_SIZE)
+
+        shares = np.array(counts) / sum(counts)
+        global_weights = {name: sum(upload[name] * share for upload, share in zip(uploads, shares)).astype(value.dtype)
+                          for name, value in global_weights.items()}
+        model.model.set_weights([global_weights[str(j)] for j in range(len(global_weights))])
+        history.append((round_bytes, evaluate(model, validation)))
+    return history
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Повні чекпоінти проти стиснених дельт ваг')
+    parser.add_argument('--rounds', type=int, default=5, help='Кількість раундів')
+    parser.add_argument('--clients', type=int, default=3, help='Кількість клієнтів (client1..N)')
+    parser.add_argument('--max_samples', type=int, default=2000, help='Відліків на клієнта')
+    args = parser.parse_args()
+
+    min_vals = np.load(os.path.join(ROOT_DIR, "federated_client", "min_vals.npy"))
+    max_vals = np.load(os.path.join(ROOT_DIR, "federated_client", "max_vals.npy"))
+    clients = [client_series(i, args.max_samples, min_vals, max_vals) for i in range(1, args.clients + 1)]
+    validation = client_series(args.clients + 1, 4 * args.max_samples, min_vals, max_vals)
+
+    model = SignalPredictor()
+    model.model.optimizer.build(model.model.trainable_variables)
+    initial_weights = {str(j): w for j, w in enumerate(model.model.get_weights())}
+    initial_optimizer = [variable.numpy() for variable in model.model.optimizer.variables]
+
+    print(f"Клієнтів: {args.clients}, раундів: {args.rounds}, відліків на клієнта: {args.max_samples}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for label, method, topk_ratio in CONFIGS:
+            history = run_config(model, initial_weights, initial_optimizer, clients, validation,
+                                 args.rounds, method, topk_ratio, tmp_dir)
+            print(f"{label}:")
+            for round_number, (round_bytes, mse) in enumerate(history, 1):
+                print(f"  раунд {round_number}: {round_bytes / 1024:8.1f} КБ/раунд, MSE валідації {mse:.6f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Порівняння епохи з Python-циклом по батчах та епохи в одному виклику графа
+
+Запуск з кореня проекту:
+    python benchmarks/epoch_loop_benchmark.py [--epochs 2] [--data_file ...]
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import tensorflow as tf
+
+# Додаємо кореневу директорію проекту до PYTHONPATH
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from core_ml_components.signal_predictor import SignalPredictor
+from core_ml_components.util_functions import (load_series, make_windows, iterate_batches, series_from_windows,
+                                               INPUT_SIZE, OUTPUT_SIZE)
+
+BATCH_SIZE = 128
+
+
+def python_loop_epoch(model, train_X, train_Y):
+    epoch_losses = []
+    for batch_X, batch_y in iterate_batches(train_X, train_Y, BATCH_SIZE):
+        epoch_losses.append(model.train(x=batch_X, y=batch_y)["loss"])
+    return np.mean(epoch_losses)
+
+
+def graph_epoch(model, series):
+    return float(model.train_epoch(series, BATCH_SIZE))
+
+
+def time_epochs(run_epoch, epochs):
+    run_epoch()  # прогрів: трасування tf.function
+    start = time.perf_counter()
+    for _ in range(epochs):
+        run_epoch()
+    return (time.perf_counter() - start) / epochs
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк циклу епохи')
+    parser.add_argument('--epochs', type=int, default=2)
+    parser.add_argument('--data_file', type=str,
+                        default=os.path.join(ROOT_DIR, "federated_client", "client1", "data", "data1.txt"))
+    args = parser.parse_args()
+
+    min_vals = np.load(os.path.join(ROOT_DIR, "federated_client", "min_vals.npy"))
+    max_vals = np.load(os.path.join(ROOT_DIR, "federated_client", "max_vals.npy"))
+    data = load_series(args.data_file, min_vals, max_vals)
+    train_X, train_Y = make_windows(data, INPUT_SIZE, OUTPUT_SIZE)
+    series = np.asarray(data)
+
+    # Ряд, відновлений з вікон (потоковий режим), має давати ті самі вікна
+    rebuilt_X, rebuilt_Y = make_windows(series_from_windows(train_X, train_Y), INPUT_SIZE, OUTPUT_SIZE)
+    assert np.array_equal(rebuilt_X, train_X) and np.array_equal(rebuilt_Y, train_Y)
+    print(f"Вікон: {len(train_X)}, батчів на епоху: {-(-len(train_X) // BATCH_SIZE)}")
+
+    model = SignalPredictor()
+    series_tensor = tf.convert_to_tensor(series)
+    loop_time = time_epochs(lambda: python_loop_epoch(model, train_X, train_Y), args.epochs)
+    graph_time = time_epochs(lambda: graph_epoch(model, series_tensor), args.epochs)
+    print(f"Python-цикл: {loop_time:.2f} с/епоху")
+    print(f"граф:        {graph_time:.2f} с/епоху")
+    print(f"прискорення: {loop_time / graph_time:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Порівняння пропускної здатності (прикладів/с) конвеєрів вхідних даних клієнта
+
+Запуск з кореня проекту:
+    python benchmarks/input_pipeline_benchmark.py [--epochs 2] [--data_file ...]
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+# Додаємо кореневу директорію проекту до PYTHONPATH
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from core_ml_components.signal_predictor import SignalPredictor
+from core_ml_components.util_functions import (load_series, make_windows, iterate_batches, make_window_dataset,
+                                               INPUT_SIZE, OUTPUT_SIZE)
+
+BATCH_SIZE = 128
+
+
+def run_epochs(model, make_batches, epochs):
+    """Тренування заданої кількості епох; повертає (прикладів, секунд)"""
+    # Прогрів: трасування tf.function та запуск конвеєра
+    for batch_X, batch_y in make_batches():
+        model.train(x=batch_X, y=batch_y)
+        break
+
+    examples = 0
+    start = time.perf_counter()
+    for _ in range(epochs):
+        for batch_X, batch_y in make_batches():
+            model.train(x=batch_X, y=batch_y)
+            examples += len(batch_X)
+    return examples, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк конвеєрів вхідних даних')
+    parser.add_argument('--epochs', type=int, default=2)
+    parser.add_argument('--data_file', type=str,
+                        default=os.path.join(ROOT_DIR, "federated_client", "client1", "data", "data1.txt"))
+    args = parser.parse_args()
+
+    min_vals = np.load(os.path.join(ROOT_DIR, "federated_client", "min_vals.npy"))
+    max_vals = np.load(os.path.join(ROOT_DIR, "federated_client", "max_vals.npy"))
+    series = load_series(args.data_file, min_vals, max_vals)
+    train_X, train_Y = make_windows(series, INPUT_SIZE, OUTPUT_SIZE)
+    dataset = make_window_dataset(series, INPUT_SIZE, OUTPUT_SIZE, BATCH_SIZE)
+
+    model = SignalPredictor()
+    results = {
+        "tf_data": run_epochs(model, lambda: dataset, args.epochs),
+        "numpy": run_epochs(model, lambda: iterate_batches(train_X, train_Y, BATCH_SIZE), args.epochs),
+    }
+    for name, (examples, seconds) in results.items():
+        print(f"{name:8s}: {examples} прикладів за {seconds:.2f} с -> {examples / seconds:.0f} прикладів/с")
+
+
+if __name__ == "__main__":
+    main()
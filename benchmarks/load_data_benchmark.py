@@ -0,0 +1,93 @@
+"""Порівняння швидкості load_data зі старим построчним парсером
+
+Запуск з кореня проекту:
+    python benchmarks/load_data_benchmark.py
+"""
+import os
+import sys
+import glob
+import time
+import numpy as np
+
+# Додаємо кореневу директорію проекту до PYTHONPATH
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from core_ml_components.util_functions import load_data, read_sensor_sections, apply_moving_average, INPUT_SIZE, OUTPUT_SIZE
+
+
+def legacy_read_sections(filepath):
+    """Попередній розбір файлу (readlines + map(float) для кожного рядка)"""
+    with open(filepath, "r") as f:
+        lines = f.readlines()
+
+    acc_data, gyro_data = [], []
+    reading_gyro = False
+    for line in lines:
+        line = line.strip()
+        if not line or "Accelerometer" in line:
+            continue
+        if "Gyroscope" in line:
+            reading_gyro = True
+            continue
+        values = list(map(float, line.split(",")))
+        if reading_gyro:
+            gyro_data.append(values)
+        else:
+            acc_data.append(values)
+    return acc_data, gyro_data
+
+
+def legacy_load_data(filepath, input_size, output_size, min_vals, max_vals):
+    """Попередня реалізація load_data"""
+    acc_data, gyro_data = legacy_read_sections(filepath)
+    min_length = min(len(acc_data), len(gyro_data))
+    acc_data = apply_moving_average(np.array(acc_data[:min_length]), window_size=5)
+    gyro_data = apply_moving_average(np.array(gyro_data[:min_length]), window_size=5)
+    data = np.hstack([acc_data, gyro_data])
+    data = (data - min_vals) / (max_vals - min_vals + 1e-8)
+
+    X, Y = [], []
+    for i in range(len(data) - input_size - output_size):
+        X.append(data[i : i + input_size])
+        Y.append(data[i + input_size])
+    return np.array(X, dtype=np.float32), np.array(Y, dtype=np.float32)
+
+
+def time_call(func, files, *args):
+    start = time.perf_counter()
+    for filepath in files:
+        func(filepath, *args)
+    return time.perf_counter() - start
+
+
+def report(title, legacy_time, new_time, n_files):
+    print(title)
+    print(f"  старий: {legacy_time:.2f} с ({legacy_time / n_files * 1000:.1f} мс/файл)")
+    print(f"  новий:  {new_time:.2f} с ({new_time / n_files * 1000:.1f} мс/файл)")
+    print(f"  прискорення: {legacy_time / new_time:.2f}x")
+
+
+def main():
+    files = sorted(glob.glob(os.path.join(ROOT_DIR, "federated_client", "client*", "data", "data*.txt")))
+    min_vals = np.load(os.path.join(ROOT_DIR, "federated_client", "min_vals.npy"))
+    max_vals = np.load(os.path.join(ROOT_DIR, "federated_client", "max_vals.npy"))
+
+    X_old, Y_old = legacy_load_data(files[0], INPUT_SIZE, OUTPUT_SIZE, min_vals, max_vals)
+    X_new, Y_new = load_data(files[0], INPUT_SIZE, OUTPUT_SIZE, min_vals, max_vals)
+    print(f"Форми: старий {X_old.shape}, новий {X_new.shape}")
+    print(f"Макс. розбіжність X: {np.max(np.abs(X_old - X_new)):.2e}, Y: {np.max(np.abs(Y_old - Y_new)):.2e}")
+
+    print(f"Файлів: {len(files)}")
+    report("Розбір тексту:",
+           time_call(legacy_read_sections, files),
+           time_call(read_sensor_sections, files),
+           len(files))
+    report("load_data повністю:",
+           time_call(legacy_load_data, files, INPUT_SIZE, OUTPUT_SIZE, min_vals, max_vals),
+           time_call(load_data, files, INPUT_SIZE, OUTPUT_SIZE, min_vals, max_vals),
+           len(files))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Порівняння float32-інференсу SignalPredictor та int8 TFLite (QuantizedPredictor)
+
+Запуск з кореня проекту:
+    python benchmarks/quantized_inference_benchmark.py [--files 5]
+"""
+import os
+import sys
+import glob
+import time
+import argparse
+import numpy as np
+import tensorflow as tf
+
+# Додаємо кореневу директорію проекту до PYTHONPATH
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from core_ml_components.signal_predictor import SignalPredictor
+from core_ml_components.quantized_predictor import QuantizedPredictor, build_unrolled_model, convert_to_tflite
+from core_ml_components.util_functions import load_data, INPUT_SIZE, OUTPUT_SIZE
+
+
+def predict(model, X, batch_size=2048):
+    return np.concatenate([np.asarray(model.infer(np.ascontiguousarray(X[i:i + batch_size]))["output"])
+                           for i in range(0, len(X), batch_size)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк квантованого інференсу')
+    parser.add_argument('--files', type=int, default=5, help='Кількість файлів client1 у тестовому наборі')
+    parser.add_argument('--verify', action='store_true',
+                        help='Порівняти модель з підставленими вагами з повною конвертацією чекпоінта')
+    args = parser.parse_args()
+
+    min_vals = np.load(os.path.join(ROOT_DIR, "federated_client", "min_vals.npy"))
+    max_vals = np.load(os.path.join(ROOT_DIR, "federated_client", "max_vals.npy"))
+    files = sorted(glob.glob(os.path.join(ROOT_DIR, "federated_client", "client1", "data", "data*.txt")))[:args.files]
+    windows = [load_data(f, INPUT_SIZE, OUTPUT_SIZE, min_vals, max_vals) for f in files]
+    X = np.concatenate([w[0] for w in windows])
+    Y = np.concatenate([w[1] for w in windows])
+    print(f"Тестових вікон: {len(X)}")
+
+    model = SignalPredictor()
+    start = time.perf_counter()
+    quantized = QuantizedPredictor()
+    template_time = time.perf_counter() - start
+    start = time.perf_counter()
+    quantized.set_weights(model.model.get_weights())
+    patch_time = time.perf_counter() - start
+
+    if args.verify:
+        # Конвертер може по-іншому розкласти константи (наприклад, нульові bias),
+        # тому порівнюються прогнози, а не байти моделей
+        unrolled = build_unrolled_model(quantized.batch_size)
+        unrolled.set_weights(model.model.get_weights())
+        start = time.perf_counter()
+        converted = convert_to_tflite(unrolled, quantized.batch_size)
+        convert_time = time.perf_counter() - start
+        interpreter = tf.lite.Interpreter(model_content=converted)
+        interpreter.allocate_tensors()
+        batch = np.ascontiguousarray(X[:quantized.batch_size])
+        interpreter.set_tensor(interpreter.get_input_details()[0]["index"], batch)
+        interpreter.invoke()
+        expected = interpreter.get_tensor(interpreter.get_output_details()[0]["index"])
+        patched = quantized.infer(batch)["output"]
+        print(f"Повна конвертація чекпоінта: {convert_time:.1f} с, "
+              f"макс. |Δ| з підстановкою ваг: {np.max(np.abs(expected - patched)):.2e}")
+
+    predict(model, X[:256])
+    start = time.perf_counter()
+    reference = predict(model, X)
+    float_time = time.perf_counter() - start
+    start = time.perf_counter()
+    result = predict(quantized, X)
+    int8_time = time.perf_counter() - start
+
+    mse_float = np.mean((reference - Y) ** 2)
+    mse_int8 = np.mean((result - Y) ** 2)
+    print(f"Конвертація шаблону int8 TFLite (один раз на процес): {template_time:.1f} с")
+    print(f"Підстановка ваг чекпоінта: {patch_time * 1000:.0f} мс, {len(quantized.tflite_model) / 1e6:.1f} МБ")
+    print(f"Прогноз float32: {float_time:.1f} с ({len(X) / float_time:.0f} вікон/с)")
+    print(f"Прогноз int8:    {int8_time:.1f} с ({len(X) / int8_time:.0f} вікон/с), {float_time / int8_time:.2f}x")
+    print(f"MSE float32 {mse_float:.6f}, int8 {mse_int8:.6f}, дрейф {mse_int8 - mse_float:+.2e}")
+    print(f"Макс. |Δ прогнозу|: {np.max(np.abs(result - reference)):.2e}")
+
+
+if __name__ == "__main__":
+    main()
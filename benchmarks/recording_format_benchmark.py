@@ -0,0 +1,68 @@
+"""Порівняння часу завантаження текстових та бінарних (.srec) записів
+
+Запуск з кореня проекту:
+    python benchmarks/recording_format_benchmark.py
+"""
+import os
+import sys
+import glob
+import time
+import shutil
+import tempfile
+import numpy as np
+
+# Додаємо кореневу директорію проекту до PYTHONPATH
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from core_ml_components.util_functions import load_data, read_sensor_sections, INPUT_SIZE, OUTPUT_SIZE
+from core_ml_components.recording_format import convert_text_file
+
+
+def time_call(func, files, *args):
+    start = time.perf_counter()
+    for filepath in files:
+        func(filepath, *args)
+    return time.perf_counter() - start
+
+
+def main():
+    source_files = sorted(glob.glob(os.path.join(ROOT_DIR, "federated_client", "client*", "data", "data*.txt")))
+    min_vals = np.load(os.path.join(ROOT_DIR, "federated_client", "min_vals.npy"))
+    max_vals = np.load(os.path.join(ROOT_DIR, "federated_client", "max_vals.npy"))
+
+    work_dir = tempfile.mkdtemp()
+    try:
+        text_files, binary_files = [], []
+        for i, source in enumerate(source_files):
+            text_path = os.path.join(work_dir, f"data{i}.txt")
+            shutil.copyfile(source, text_path)
+            text_files.append(text_path)
+            binary_files.append(convert_text_file(text_path))
+
+        text_size = sum(os.path.getsize(f) for f in text_files)
+        binary_size = sum(os.path.getsize(f) for f in binary_files)
+        print(f"Файлів: {len(text_files)}")
+        print(f"Розмір: текст {text_size / 1e6:.1f} МБ, .srec {binary_size / 1e6:.1f} МБ "
+              f"({text_size / binary_size:.1f}x)")
+
+        X_text, _ = load_data(text_files[0], INPUT_SIZE, OUTPUT_SIZE, min_vals, max_vals)
+        X_binary, _ = load_data(binary_files[0], INPUT_SIZE, OUTPUT_SIZE, min_vals, max_vals)
+        print(f"Макс. розбіжність X: {np.max(np.abs(X_text - X_binary)):.2e}")
+
+        for title, func, args in (
+            ("Читання відліків", read_sensor_sections, ()),
+            ("load_data (windowed)", load_data, (INPUT_SIZE, OUTPUT_SIZE, min_vals, max_vals, True)),
+        ):
+            text_time = time_call(func, text_files, *args)
+            binary_time = time_call(func, binary_files, *args)
+            print(title)
+            print(f"  текст: {text_time * 1000 / len(text_files):.2f} мс/файл")
+            print(f"  .srec: {binary_time * 1000 / len(binary_files):.2f} мс/файл")
+            print(f"  прискорення: {text_time / binary_time:.1f}x")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Швидкість передачі файлу моделі через loopback: цикли по 4096 байт проти socket_transfer
+
+Відправник і отримувач працюють у різних потоках одного процесу та
+з'єднані TCP через 127.0.0.1. Старий варіант - цикли read(4096)/sendall та
+recv(4096)/write, як у клієнті та серверах до socket_transfer; новий -
+send_file (socket.sendfile) та recv_to_file (recv_into у буфер).
+
+Запуск з кореня проекту:
+    python benchmarks/socket_transfer_benchmark.py
+"""
+import os
+import sys
+import time
+import socket
+import tempfile
+import threading
+
+# Додаємо кореневу директорію проекту до PYTHONPATH
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from core_ml_components.socket_transfer import send_file, recv_to_file
+
+
+def legacy_send(sock, filepath):
+    with open(filepath, 'rb') as f:
+        while True:
+            chunk = f.read(4096)
+            if not chunk:
+                break
+            sock.sendall(chunk)
+
+
+def legacy_recv(sock, filepath, size):
+    with open(filepath, 'wb') as f:
+        received = 0
+        while received < size:
+            chunk = sock.recv(min(4096, size - received))
+            if not chunk:
+                raise ConnectionError("З'єднання перервано")
+            f.write(chunk)
+            received += len(chunk)
+
+
+def measure(send, recv, source_path, target_path, repeats):
+    size = os.path.getsize(source_path)
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(('127.0.0.1', 0))
+    server.listen(1)
+
+    def receiver():
+        connection, _ = server.accept()
+        with connection:
+            for _ in range(repeats):
+                recv(connection, target_path, size)
+            connection.sendall(b"OK")
+
+    thread = threading.Thread(target=receiver)
+    thread.start()
+    with socket.create_connection(server.getsockname()) as sock:
+        start = time.perf_counter()
+        for _ in range(repeats):
+            send(sock, source_path)
+        sock.recv(2)
+        elapsed = time.perf_counter() - start
+    thread.join()
+    server.close()
+    return size * repeats / elapsed / (1024 * 1024)
+
+
+def main():
+    sizes = [("модель 650 КБ", 656266, 200), ("64 МБ", 64 * 1024 * 1024, 4)]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        source_path = os.path.join(tmp_dir, "source.bin")
+        target_path = os.path.join(tmp_dir, "target.bin")
+        for label, size, repeats in sizes:
+            with open(source_path, "wb") as f:
+                f.write(os.urandom(size))
+            legacy = measure(legacy_send, legacy_recv, source_path, target_path, repeats)
+            new = measure(send_file, recv_to_file, source_path, target_path, repeats)
+            with open(source_path, "rb") as a, open(target_path, "rb") as b:
+                assert a.read() == b.read(), "Отриманий файл не збігається з відправленим"
+            print(f"{label:14s} старий: {legacy:8.1f} МБ/с   новий: {new:8.1f} МБ/с   ({new / legacy:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Час старту точок входу: імпорт модуля та готовність моделі до першого кроку
+
+Кожен замір виконується в окремому процесі. Модель готується двома
+способами: побудова SignalPredictor з трасуванням при першому виклику та
+завантаження попередньо трасованого артефакту (model_artifact).
+
+Запуск з кореня проекту:
+    python benchmarks/startup_benchmark.py
+"""
+import os
+import sys
+import json
+import subprocess
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENTRY_POINTS = {
+    # Базова лінія: сам TensorFlow (у Keras 3 він уже тягне частину важких модулів)
+    "tensorflow": ("", "import tensorflow"),
+    "federated_client": ("federated_client", "import federated_client"),
+    "evaluation_server": ("evaluation_module", "import evaluation_server"),
+    "aggregation_script": ("server_components", "import aggregation_script"),
+}
+
+IMPORT_SNIPPET = """
+import time, json, sys
+start = time.perf_counter()
+{statement}
+print(json.dumps({{"seconds": time.perf_counter() - start,
+                   "heavy": sorted(m for m in ("matplotlib", "seaborn", "sklearn", "pandas") if m in sys.modules)}}))
+"""
+
+MODEL_SNIPPET = """
+import time, json, sys
+sys.path.append({root!r})
+import numpy as np
+from core_ml_components.signal_predictor import SignalPredictor
+from core_ml_components.model_artifact import load_artifact
+x = np.zeros((32, 150, 6), dtype=np.float32)
+y = np.zeros((32, 6), dtype=np.float32)
+start = time.perf_counter()
+model = {factory}
+model.infer(x)
+model.train(x=x, y=y)
+print(json.dumps({{"seconds": time.perf_counter() - start}}))
+"""
+
+
+def run_snippet(code, cwd):
+    env = dict(os.environ, TF_CPP_MIN_LOG_LEVEL="3")
+    result = subprocess.run([sys.executable, "-c", code], cwd=cwd, env=env, capture_output=True, text=True)
+    for line in reversed(result.stdout.splitlines()):
+        if line.startswith("{"):
+            return json.loads(line)
+    raise RuntimeError(result.stderr[-2000:])
+
+
+def main():
+    sys.path.append(ROOT_DIR)
+    from core_ml_components.model_artifact import load_predictor, load_artifact
+    if load_artifact() is None:
+        load_predictor()
+
+    print("Імпорт модуля (с):")
+    for name, (directory, statement) in ENTRY_POINTS.items():
+        result = run_snippet(IMPORT_SNIPPET.format(statement=statement), os.path.join(ROOT_DIR, directory))
+        print(f"  {name:20s} {result['seconds']:6.2f}   важкі модулі: {', '.join(result['heavy']) or '-'}")
+
+    print("Модель готова до першого кроку (с):")
+    for label, factory in (("SignalPredictor()", "SignalPredictor()"), ("артефакт", "load_artifact()")):
+        result = run_snippet(MODEL_SNIPPET.format(root=ROOT_DIR, factory=factory), ROOT_DIR)
+        print(f"  {label:20s} {result['seconds']:6.2f}")
+
+
+if __name__ == "__main__":
+    main()
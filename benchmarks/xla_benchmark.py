@@ -0,0 +1,65 @@
+"""Порівняння звичайних та XLA-скомпільованих (jit_compile) train/infer
+
+Для кожного розміру батчу вимірюється кількість кроків тренування за
+секунду та затримка інференсу, а також перевіряється збіг результатів
+двох моделей з однаковими початковими вагами.
+
+Запуск з кореня проекту:
+    python benchmarks/xla_benchmark.py [--batch_sizes 32 64 128 256 512] [--steps 10]
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+# Додаємо кореневу директорію проекту до PYTHONPATH
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from core_ml_components.signal_predictor import SignalPredictor, INPUT_SIZE, FEATURES
+
+
+def measure(func, args, steps):
+    """Середній час виклику після прогріву (трасування/компіляції)"""
+    np.asarray(next(iter(func(*args).values())))
+    start = time.perf_counter()
+    for _ in range(steps):
+        np.asarray(next(iter(func(*args).values())))
+    return (time.perf_counter() - start) / steps
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк XLA-компіляції SignalPredictor')
+    parser.add_argument('--batch_sizes', type=int, nargs='+', default=[32, 64, 128, 256, 512])
+    parser.add_argument('--steps', type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'батч':>5} | {'train кр/с':>11} {'XLA':>7} | {'infer мс':>9} {'XLA':>7} | "
+          f"{'Δ вихід':>8} {'Δ loss':>8}")
+    for batch_size in args.batch_sizes:
+        x = rng.random((batch_size, INPUT_SIZE, FEATURES), dtype=np.float32)
+        y = rng.random((batch_size, FEATURES), dtype=np.float32)
+
+        reference = SignalPredictor()
+        compiled = SignalPredictor(jit_compile=True)
+        compiled.model.set_weights(reference.model.get_weights())
+
+        # Паритет: інференс та перший крок тренування з однакових ваг
+        output_diff = np.max(np.abs(np.asarray(reference.infer(x)["output"]) -
+                                    np.asarray(compiled.infer(x)["output"])))
+        loss_diff = abs(float(reference.train(x, y)["loss"]) - float(compiled.train(x, y)["loss"]))
+
+        train_time = measure(reference.train, (x, y), args.steps)
+        train_time_xla = measure(compiled.train, (x, y), args.steps)
+        infer_time = measure(reference.infer, (x,), args.steps)
+        infer_time_xla = measure(compiled.infer, (x,), args.steps)
+
+        print(f"{batch_size:>5} | {1 / train_time:>11.2f} {1 / train_time_xla:>7.2f} | "
+              f"{infer_time * 1000:>9.1f} {infer_time_xla * 1000:>7.1f} | "
+              f"{output_diff:>8.1e} {loss_diff:>8.1e}")
+
+
+if __name__ == "__main__":
+    main()
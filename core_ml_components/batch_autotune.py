@@ -0,0 +1,113 @@
+import os
+import json
+import time
+import socket
+import numpy as np
+import tensorflow as tf
+
+from core_ml_components.signal_predictor import INPUT_SIZE, FEATURES
+from core_ml_components.model_artifact import LoadedPredictor
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_PATH = os.path.join(ROOT_DIR, "model_artifacts", "batch_size_cache.json")
+CANDIDATE_BATCH_SIZES = (32, 64, 128, 256, 512)
+
+# Оцінка кількості float32-значень активацій на один приклад, які GRU
+# зберігають для зворотного проходу: вхід, виходи шарів та 3 вентилі на
+# кожному кроці в обох напрямках
+ACTIVATION_FLOATS_PER_EXAMPLE = INPUT_SIZE * (FEATURES + 2 * 96 * 4 + 2 * 64 * 4)
+
+
+def estimate_batch_memory(batch_size):
+    """Приблизний обсяг пам'яті (байт) одного кроку тренування з батчем batch_size"""
+    return batch_size * ACTIVATION_FLOATS_PER_EXAMPLE * 4
+
+
+def machine_key(jit_compile=False):
+    """Ключ кешу: машина, кількість ядер, версія TF та режим компіляції"""
+    return f"{socket.gethostname()}|cpus={os.cpu_count()}|tf={tf.__version__}|xla={int(jit_compile)}"
+
+
+def load_cached_batch_size(key, cache_path=CACHE_PATH):
+    try:
+        with open(cache_path, "r") as f:
+            return json.load(f).get(key, {}).get("batch_size")
+    except (OSError, ValueError):
+        return None
+
+
+def save_cached_batch_size(key, batch_size, results, cache_path=CACHE_PATH):
+    """Атомарне оновлення запису кешу для цієї машини"""
+    try:
+        with open(cache_path, "r") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+    cache[key] = {"batch_size": batch_size, "samples_per_sec": results}
+
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(cache, f, indent=2)
+    os.replace(tmp_path, cache_path)
+
+
+def training_state_variables(model):
+    """Змінні, які змінює model.train: ваги моделі та стан оптимізатора (iterations, моменти Adam)"""
+    if isinstance(model, LoadedPredictor):
+        return [v for v in tf.train.TrackableView(model.loaded).descendants() if isinstance(v, tf.Variable)]
+    optimizer = model.model.optimizer
+    if not optimizer.built:
+        # Змінні оптимізатора мають існувати до знімка, інакше перший пробний крок створить їх уже зміненими
+        optimizer.build(model.model.trainable_variables)
+    return list(model.model.weights) + list(optimizer.variables)
+
+
+def measure_batch_throughput(model, series, batch_size, steps=3, rng=None):
+    """Приклади/с для model.train на випадкових вікнах ряду (після одного кроку прогріву)"""
+    rng = rng or np.random.default_rng()
+    n_windows = len(series) - INPUT_SIZE
+    offsets = np.arange(INPUT_SIZE)
+    batches = []
+    for _ in range(steps + 1):
+        starts = rng.integers(0, n_windows, size=batch_size)
+        batches.append((series[starts[:, None] + offsets], series[starts + INPUT_SIZE]))
+
+    model.train(x=batches[0][0], y=batches[0][1])
+    start = time.perf_counter()
+    for batch_X, batch_y in batches[1:]:
+        np.asarray(model.train(x=batch_X, y=batch_y)["loss"])
+    return steps * batch_size / (time.perf_counter() - start)
+
+
+def autotune_batch_size(model, series, memory_budget_mb=512, candidates=CANDIDATE_BATCH_SIZES, steps=3):
+    """Вибір розміру батчу з найбільшою кількістю прикладів/с у межах бюджету пам'яті
+
+    Пробні кроки тренують модель, тому ваги та стан оптимізатора
+    запам'ятовуються перед підбором і відновлюються після нього: реальне
+    тренування починається з того самого стану, що й без автопідбору.
+
+    Returns:
+        tuple: (найкращий розмір батчу, {розмір батчу: прикладів/с})
+    """
+    series = np.asarray(series, dtype=np.float32)
+    n_windows = len(series) - INPUT_SIZE
+    if n_windows <= 0:
+        return min(candidates), {}
+    budget = memory_budget_mb * 1024 * 1024
+    allowed = [b for b in candidates if estimate_batch_memory(b) <= budget and b <= n_windows]
+    if not allowed:
+        allowed = [min(candidates)]
+
+    variables = training_state_variables(model)
+    snapshot = [v.numpy() for v in variables]
+    results = {}
+    try:
+        for batch_size in allowed:
+            results[batch_size] = measure_batch_throughput(model, series, batch_size, steps)
+            print(f"Автопідбір батчу: {batch_size} -> {results[batch_size]:.0f} прикладів/с")
+    finally:
+        for variable, value in zip(variables, snapshot):
+            variable.assign(value)
+    best = max(results, key=results.get)
+    return best, results
@@ -0,0 +1,41 @@
+import tensorflow as tf
+
+
+def read_checkpoint(checkpoint_path):
+    """Іменовані тензори чекпоінта (формат tf.raw_ops.Save) як NumPy-масиви
+
+    Читання не потребує моделі: тензори зчитуються за іменами, з якими їх
+    зберіг SignalPredictor.save.
+
+    Returns:
+        dict: {ім'я тензора: np.ndarray}, відсортований за іменами
+    """
+    reader = tf.train.load_checkpoint(checkpoint_path)
+    return {name: reader.get_tensor(name) for name in sorted(reader.get_variable_to_shape_map())}
+
+
+def write_checkpoint(checkpoint_path, tensors):
+    """Запис словника {ім'я: масив} у формат, який читає SignalPredictor.restore"""
+    names = list(tensors)
+    tf.raw_ops.Save(
+        filename=checkpoint_path,
+        tensor_names=names,
+        data=[tf.convert_to_tensor(tensors[name]) for name in names],
+        name="save",
+    )
+    return checkpoint_path
+
+
+def model_tensors(model):
+    """Ваги SignalPredictor у тому ж вигляді, що й read_checkpoint"""
+    return {weight.name: weight.numpy() for weight in sorted(model.model.weights, key=lambda w: w.name)}
+
+
+def check_compatible(reference, tensors):
+    """Перевірка, що два набори тензорів мають однакові імена та форми"""
+    if reference.keys() != tensors.keys():
+        missing = sorted(set(reference) ^ set(tensors))
+        raise ValueError(f"Набори тензорів чекпоінтів не збігаються: {missing[:3]}")
+    for name, value in reference.items():
+        if value.shape != tensors[name].shape:
+            raise ValueError(f"Форма тензора {name} не збігається: {value.shape} та {tensors[name].shape}")
@@ -0,0 +1,76 @@
+import os
+import psutil
+
+# Змінні середовища, які читає рантайм TensorFlow при створенні пулів потоків
+# (process_util.cc), та OpenMP/BLAS для NumPy
+THREAD_ENV_VARS = ("TF_NUM_INTRAOP_THREADS", "TF_NUM_INTEROP_THREADS", "OMP_NUM_THREADS")
+
+
+def available_cpus():
+    """Ядра, доступні поточному процесу"""
+    try:
+        return sorted(psutil.Process().cpu_affinity())
+    except (AttributeError, psutil.Error, OSError):
+        # cpu_affinity не підтримується (macOS)
+        return list(range(psutil.cpu_count() or 1))
+
+
+def plan_cpu_partition(num_clients, cpus=None, evaluation=True):
+    """Розподіл ядер між агрегацією, сервером оцінки та клієнтами
+
+    Якщо ядер вистачає, агрегація та сервер оцінки отримують по одному
+    ядру, а решта ділиться між клієнтами порівну суцільними блоками.
+    Якщо ядер менше, ніж процесів, кожен процес отримує одне ядро по колу:
+    процеси ділять ядра, але з одним потоком TF кожен не створює зайвих
+    потоків, що конкурують між собою.
+
+    Returns:
+        dict: {"aggregation": [...], "evaluation": [...], "client_1": [...], ...}
+    """
+    cpus = list(cpus) if cpus is not None else available_cpus()
+    services = ["aggregation"] + (["evaluation"] if evaluation else [])
+    clients = [f"client_{i}" for i in range(1, num_clients + 1)]
+
+    if len(cpus) < len(services) + len(clients):
+        roles = clients + services
+        return {role: [cpus[i % len(cpus)]] for i, role in enumerate(roles)}
+
+    plan = {role: [cpus[i]] for i, role in enumerate(services)}
+    client_cpus = cpus[len(services):]
+    per_client, extra = divmod(len(client_cpus), len(clients)) if clients else (0, 0)
+    start = 0
+    for i, role in enumerate(clients):
+        size = per_client + (1 if i < extra else 0)
+        plan[role] = client_cpus[start:start + size]
+        start += size
+    return plan
+
+
+def thread_env(cores, base_env=None):
+    """Середовище дочірнього процесу з пулами потоків під виділені ядра"""
+    env = dict(os.environ if base_env is None else base_env)
+    n_threads = max(len(cores), 1)
+    env["TF_NUM_INTRAOP_THREADS"] = str(n_threads)
+    env["TF_NUM_INTEROP_THREADS"] = "1" if n_threads <= 2 else "2"
+    env["OMP_NUM_THREADS"] = str(n_threads)
+    return env
+
+
+def pin_process(pid, cores):
+    """Прив'язка процесу до ядер; False, якщо ОС не підтримує cpu_affinity"""
+    try:
+        psutil.Process(pid).cpu_affinity(list(cores))
+        return True
+    except (AttributeError, psutil.Error, OSError, ValueError) as e:
+        print(f"Не вдалося прив'язати процес {pid} до ядер {list(cores)}: {e}")
+        return False
+
+
+def find_processes(script_name):
+    """Локальні процеси Python, запущені зі скриптом script_name"""
+    found = []
+    for process in psutil.process_iter(["pid", "cmdline"]):
+        cmdline = process.info.get("cmdline") or []
+        if any(os.path.basename(arg) == script_name for arg in cmdline[1:]):
+            found.append(process.info["pid"])
+    return found
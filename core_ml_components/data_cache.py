@@ -0,0 +1,157 @@
+import os
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import numpy as np
+
+from core_ml_components.util_functions import load_series, INPUT_SIZE
+
+# Версія формату записів кешу; змінюється разом зі зміною підготовки даних
+CACHE_FORMAT_VERSION = 1
+
+
+def file_digest(filepath, chunk_size=1 << 20):
+    """SHA-256 вмісту файлу"""
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class PreprocessedDataCache:
+    """Дисковий кеш розібраних, згладжених та нормалізованих рядів
+
+    Кожен запис - окремий .npy файл float32 форми (n_samples, FEATURES),
+    який відкривається через np.load(mmap_mode='r'). Ключ запису будується з
+    хешу вмісту файлу даних, розміру вхідного вікна, вікна згладжування та
+    векторів min/max, тому зміна будь-якого з них автоматично дає новий
+    запис. Загальний розмір кешу обмежено max_bytes: при перевищенні
+    видаляються записи, які найдовше не використовувались.
+    """
+
+    def __init__(self, cache_dir, max_bytes=256 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def make_key(self, filepath, min_vals, max_vals, input_size=INPUT_SIZE, smoothing_window=5):
+        """Ключ запису для файлу та параметрів підготовки"""
+        key = hashlib.sha256()
+        key.update(f"v{CACHE_FORMAT_VERSION}:{file_digest(filepath)}:{input_size}:{smoothing_window}:".encode())
+        key.update(np.asarray(min_vals, dtype=np.float64).tobytes())
+        key.update(np.asarray(max_vals, dtype=np.float64).tobytes())
+        return key.hexdigest()
+
+    def entry_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npy")
+
+    def load_series(self, filepath, min_vals, max_vals, input_size=INPUT_SIZE, smoothing_window=5, evict=True):
+        """Підготовлений ряд з кешу або, при промаху, з тексту з записом у кеш
+
+        evict=False відкладає витіснення (warm витісняє один раз після всіх записів).
+
+        Returns:
+            np.ndarray: read-only memmap float32 форми (n_samples, FEATURES)
+        """
+        key = self.make_key(filepath, min_vals, max_vals, input_size, smoothing_window)
+        path = self.entry_path(key)
+
+        if os.path.exists(path):
+            try:
+                data = np.load(path, mmap_mode="r")
+                # Оновлюємо час використання для LRU-витіснення
+                os.utime(path)
+                print(f"Дані {os.path.basename(filepath)} завантажено з кешу")
+                return data
+            except (OSError, ValueError) as e:
+                print(f"Пошкоджений запис кешу {path}, буде перестворено: {e}")
+                self._remove(path)
+
+        data = load_series(filepath, min_vals, max_vals, smoothing_window=smoothing_window)
+        self._write(path, data)
+        if evict:
+            self.evict()
+        if os.path.exists(path):
+            return np.load(path, mmap_mode="r")
+        return data
+
+    def _write(self, path, data):
+        """Атомарний запис: спочатку у тимчасовий файл, потім перейменування"""
+        # Ідентифікатор потоку: у симуляції кілька потоків одного процесу готують той самий файл
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                np.save(f, np.ascontiguousarray(data, dtype=np.float32))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Не вдалося записати кеш {path}: {e}")
+            self._remove(tmp_path)
+
+    def entries(self):
+        """Список (path, size, mtime) записів кешу"""
+        result = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".npy"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            result.append((path, stat.st_size, stat.st_mtime))
+        return result
+
+    def total_bytes(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        """Видалення найстаріших записів, доки кеш не вміститься в max_bytes"""
+        entries = sorted(self.entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    def warm(self, filepaths, min_vals, max_vals, input_size=INPUT_SIZE, smoothing_window=5, workers=1):
+        """Попередня підготовка всіх файлів у кеш на пулі потоків
+
+        Після прогріву кожен раунд лише відкриває готовий запис через mmap.
+        Підготовка - читання файлів та операції numpy, тому достатньо потоків:
+        дочірні процеси (fork чи spawn) заново імпортували б TensorFlow
+        процесу клієнта. Кількість потоків задається workers, щоб підготовка
+        не конкурувала з потоками тренування.
+
+        Витіснення виконується один раз після всіх записів: інакше потоки
+        видаляли б записи, щойно створені іншими потоками.
+
+        Returns:
+            int: кількість файлів, записи яких є в кеші після витіснення
+        """
+        paths = {f: self.entry_path(self.make_key(f, min_vals, max_vals, input_size, smoothing_window))
+                 for f in filepaths}
+        pending = [f for f in filepaths if not os.path.exists(paths[f])]
+        if pending:
+            with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+                futures = {
+                    executor.submit(self.load_series, filepath, min_vals, max_vals, input_size, smoothing_window,
+                                    evict=False): filepath
+                    for filepath in pending
+                }
+                for future in as_completed(futures):
+                    try:
+                        future.result()
+                    except Exception as e:
+                        print(f"Помилка попередньої підготовки {futures[future]}: {e}")
+            self.evict()
+        return sum(os.path.exists(paths[f]) for f in filepaths)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
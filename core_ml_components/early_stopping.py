@@ -0,0 +1,36 @@
+class LossPlateau:
+    """Зупинка локального тренування, коли втрата перестала зменшуватись
+
+    Епоха вважається покращенням, якщо її втрата менша за найкращу досі
+    щонайменше на min_delta. Тренування зупиняється після patience епох
+    поспіль без покращення або після max_epochs епох. При patience=0
+    завжди виконується рівно max_epochs епох (фіксований режим).
+    """
+
+    def __init__(self, max_epochs, patience=0, min_delta=0.0):
+        if max_epochs < 1:
+            raise ValueError("max_epochs має бути не менше 1")
+        self.max_epochs = max_epochs
+        self.patience = patience
+        self.min_delta = min_delta
+        self.reset()
+
+    def reset(self):
+        self.epochs = 0
+        self.best_loss = float("inf")
+        self.stale_epochs = 0
+        self.stopped_early = False
+
+    def update(self, loss):
+        """Облік втрати чергової епохи; повертає True, якщо треба зупинитися"""
+        self.epochs += 1
+        if loss < self.best_loss - self.min_delta:
+            self.best_loss = loss
+            self.stale_epochs = 0
+        else:
+            self.stale_epochs += 1
+
+        if self.patience > 0 and self.stale_epochs >= self.patience and self.epochs < self.max_epochs:
+            self.stopped_early = True
+            return True
+        return self.epochs >= self.max_epochs
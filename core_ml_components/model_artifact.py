@@ -0,0 +1,102 @@
+import os
+import json
+import shutil
+import hashlib
+import tensorflow as tf
+
+from core_ml_components.signal_predictor import SignalPredictor
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ARTIFACT_DIR = os.path.join(ROOT_DIR, "model_artifacts", "signal_predictor")
+ARTIFACT_INFO = "artifact_info.json"
+
+
+def source_fingerprint():
+    """Відбиток визначення моделі та версії TF; зміна будь-якого з них робить артефакт застарілим"""
+    digest = hashlib.sha256(tf.__version__.encode())
+    with open(os.path.join(ROOT_DIR, "core_ml_components", "signal_predictor.py"), "rb") as f:
+        digest.update(f.read())
+    return digest.hexdigest()
+
+
+class LoadedPredictor:
+    """SignalPredictor, завантажений з попередньо трасованого SavedModel
+
+    Має ті самі train/infer/save/restore/train_epochs, що й SignalPredictor,
+    але не будує Keras-модель і не трасує функції при старті процесу.
+    """
+
+    jit_compile = False
+
+    def __init__(self, loaded):
+        self.loaded = loaded
+        self.train = loaded.train
+        self.infer = loaded.infer
+        self.save = loaded.save
+        self.restore = loaded.restore
+        self.train_epochs = loaded.train_epochs
+
+    def train_epoch(self, series, batch_size=128):
+        return self.train_epochs(series, 1, batch_size)["loss"][0]
+
+
+def export_artifact(model, artifact_dir=ARTIFACT_DIR):
+    """Експорт моделі з конкретними train/infer/save/restore/train_epochs у SavedModel
+
+    Запис іде у тимчасову директорію з подальшим перейменуванням, тож
+    процеси, які стартують одночасно, не бачать недописаного артефакту.
+    """
+    tmp_dir = f"{artifact_dir}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tf.saved_model.save(model, tmp_dir)
+    with open(os.path.join(tmp_dir, ARTIFACT_INFO), "w") as f:
+        json.dump({"fingerprint": source_fingerprint(), "tensorflow": tf.__version__}, f)
+
+    shutil.rmtree(artifact_dir, ignore_errors=True)
+    try:
+        os.replace(tmp_dir, artifact_dir)
+    except OSError:
+        # Інший процес уже встиг записати артефакт
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        return False
+    print(f"Артефакт моделі збережено в {artifact_dir}")
+    return True
+
+
+def load_artifact(artifact_dir=ARTIFACT_DIR):
+    """LoadedPredictor з артефакту або None, якщо артефакту немає чи він застарів"""
+    try:
+        with open(os.path.join(artifact_dir, ARTIFACT_INFO), "r") as f:
+            info = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if info.get("fingerprint") != source_fingerprint():
+        print("Артефакт моделі застарів, модель буде перебудовано")
+        return None
+    try:
+        return LoadedPredictor(tf.saved_model.load(artifact_dir))
+    except Exception as e:
+        print(f"Не вдалося завантажити артефакт моделі {artifact_dir}: {e}")
+        return None
+
+
+def load_predictor(jit_compile=False, artifact_dir=ARTIFACT_DIR):
+    """Модель для тренування/оцінки: з артефакту, якщо він актуальний, інакше нова
+
+    XLA-режим завжди будує SignalPredictor, бо артефакт містить звичайні
+    (не скомпільовані) функції. Новозбудована модель експортується, щоб
+    наступні процеси стартували з артефакту.
+    """
+    if not jit_compile:
+        loaded = load_artifact(artifact_dir)
+        if loaded is not None:
+            return loaded
+
+    model = SignalPredictor(jit_compile=jit_compile)
+    if not jit_compile:
+        try:
+            os.makedirs(os.path.dirname(artifact_dir), exist_ok=True)
+            export_artifact(model, artifact_dir)
+        except Exception as e:
+            print(f"Не вдалося експортувати артефакт моделі: {e}")
+    return model
@@ -0,0 +1,262 @@
+import os
+import sys
+import glob
+import json
+import argparse
+import numpy as np
+
+# Додаємо кореневу директорію проекту до PYTHONPATH
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core_ml_components.util_functions import read_sensor_sections, smooth_channels, FEATURES
+from core_ml_components.recording_format import list_recordings
+
+STATS_FORMAT = "normalization_stats"
+STATS_VERSION = 1
+STATS_FILENAME = "normalization_stats.json"
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Єдиний файл статистик для всіх клієнтів та сервера оцінки
+SHARED_STATS_PATH = os.path.join(ROOT_DIR, "common_data", STATS_FILENAME)
+CLIENTS_DIR = os.path.join(ROOT_DIR, "federated_client")
+# min_vals.npy/max_vals.npy, з якими натреновано наявні чекпоінти; використовуються, поки немає спільного файлу
+LEGACY_STATS_DIR = os.path.join(ROOT_DIR, "federated_client")
+
+
+class NormalizationStats:
+    """Потокові статистики нормалізації: min/max, середнє та стандартне відхилення
+
+    Статистики накопичуються за один прохід (update) і об'єднуються
+    асоціативно (merge) за формулою Чана для паралельної дисперсії, тому
+    результат не залежить від того, як дані розбиті між файлами та клієнтами.
+    """
+
+    def __init__(self, n_features=FEATURES, smoothing_window=5):
+        self.smoothing_window = smoothing_window
+        self.count = 0
+        self.min = np.full(n_features, np.inf)
+        self.max = np.full(n_features, -np.inf)
+        self.mean = np.zeros(n_features)
+        self.m2 = np.zeros(n_features)
+
+    @property
+    def min_vals(self):
+        return self.min
+
+    @property
+    def max_vals(self):
+        return self.max
+
+    @property
+    def std(self):
+        if self.count == 0:
+            return np.zeros_like(self.m2)
+        return np.sqrt(self.m2 / self.count)
+
+    def update(self, data):
+        """Додавання блоку даних форми (n_samples, n_features)"""
+        data = np.asarray(data)
+        if len(data) == 0:
+            return self
+        batch = NormalizationStats(data.shape[1], self.smoothing_window)
+        batch.count = len(data)
+        batch.min = np.min(data, axis=0).astype(np.float64)
+        batch.max = np.max(data, axis=0).astype(np.float64)
+        batch.mean = np.mean(data, axis=0, dtype=np.float64)
+        batch.m2 = np.var(data, axis=0, dtype=np.float64) * batch.count
+        return self.merge(batch)
+
+    def merge(self, other):
+        """Об'єднання з іншим накопичувачем (на місці)"""
+        if other.smoothing_window != self.smoothing_window:
+            raise ValueError("Неможливо об'єднати статистики з різними вікнами згладжування: "
+                             f"{self.smoothing_window} та {other.smoothing_window}")
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.count = other.count
+            self.min, self.max = other.min.copy(), other.max.copy()
+            self.mean, self.m2 = other.mean.copy(), other.m2.copy()
+            return self
+
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean = self.mean + delta * (other.count / total)
+        self.m2 = self.m2 + other.m2 + delta ** 2 * (self.count * other.count / total)
+        self.min = np.minimum(self.min, other.min)
+        self.max = np.maximum(self.max, other.max)
+        self.count = total
+        return self
+
+    def update_from_file(self, filepath):
+        """Додавання згладженого запису з файлу даних"""
+        acc_data, gyro_data = read_sensor_sections(filepath)
+        return self.update(smooth_channels(acc_data, gyro_data, self.smoothing_window))
+
+    @classmethod
+    def from_files(cls, filepaths, smoothing_window=5):
+        stats = cls(smoothing_window=smoothing_window)
+        for filepath in filepaths:
+            stats.update_from_file(filepath)
+        return stats
+
+    def to_dict(self):
+        return {
+            "format": STATS_FORMAT,
+            "version": STATS_VERSION,
+            "smoothing_window": self.smoothing_window,
+            "count": int(self.count),
+            "min": self.min.tolist(),
+            "max": self.max.tolist(),
+            "mean": self.mean.tolist(),
+            "m2": self.m2.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        if state.get("format") != STATS_FORMAT:
+            raise ValueError("Файл не містить статистик нормалізації")
+        if state.get("version", 0) > STATS_VERSION:
+            raise ValueError(f"Непідтримувана версія статистик нормалізації: {state.get('version')}")
+        stats = cls(len(state["min"]), state["smoothing_window"])
+        stats.count = state["count"]
+        stats.min = np.asarray(state["min"], dtype=np.float64)
+        stats.max = np.asarray(state["max"], dtype=np.float64)
+        stats.mean = np.asarray(state["mean"], dtype=np.float64)
+        stats.m2 = np.asarray(state["m2"], dtype=np.float64)
+        return stats
+
+    def save(self, path):
+        """Атомарне збереження у JSON"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r") as f:
+            return cls.from_dict(json.load(f))
+
+
+def load_min_max(stats_path, legacy_dir=None):
+    """Параметри min/max зі збереженого файлу статистик без читання сирих даних
+
+    Якщо файлу статистик немає, використовуються min_vals.npy/max_vals.npy
+    з legacy_dir (старий формат).
+
+    Returns:
+        tuple: (min_vals, max_vals) або (None, None), якщо параметрів не знайдено
+    """
+    if stats_path and os.path.exists(stats_path):
+        try:
+            stats = NormalizationStats.load(stats_path)
+            if stats.count > 0:
+                return stats.min_vals, stats.max_vals
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Помилка читання статистик нормалізації {stats_path}: {e}")
+
+    if legacy_dir is not None:
+        try:
+            return (np.load(os.path.join(legacy_dir, "min_vals.npy")),
+                    np.load(os.path.join(legacy_dir, "max_vals.npy")))
+        except FileNotFoundError:
+            pass
+    return None, None
+
+
+def client_data_files(clients_dir=CLIENTS_DIR):
+    """Файли даних усіх клієнтів: {ім'я директорії клієнта: [файли]}"""
+    groups = {}
+    for client_dir in sorted(glob.glob(os.path.join(clients_dir, "client*"))):
+        files = list_recordings(os.path.join(client_dir, "data"))
+        if files:
+            groups[os.path.basename(client_dir)] = files
+    return groups
+
+
+def merge_client_stats(clients_dir=CLIENTS_DIR, smoothing_window=5):
+    """Статистики даних усіх клієнтів: build для кожного клієнта та merge"""
+    groups = client_data_files(clients_dir)
+    if not groups:
+        raise FileNotFoundError(f"Не знайдено файлів даних клієнтів у {clients_dir}")
+    stats = NormalizationStats(smoothing_window=smoothing_window)
+    for files in groups.values():
+        stats.merge(NormalizationStats.from_files(files, smoothing_window=smoothing_window))
+    print(f"Статистики нормалізації об'єднано з даних: {', '.join(groups)}")
+    return stats
+
+
+def build_shared_stats(stats_path=SHARED_STATS_PATH, clients_dir=CLIENTS_DIR):
+    """Побудова та збереження спільного файлу статистик з даних усіх клієнтів"""
+    stats = merge_client_stats(clients_dir)
+    stats.save(stats_path)
+    print(f"Спільні статистики нормалізації збережено в {stats_path}")
+    return stats
+
+
+def load_shared_min_max(stats_path=SHARED_STATS_PATH, build=False):
+    """Параметри min/max, спільні для всіх клієнтів та сервера оцінки
+
+    Порядок пошуку: файл статистик stats_path (або min_vals.npy/max_vals.npy
+    поруч із ним), далі успадковані federated_client/min_vals.npy та
+    max_vals.npy, з якими натреновано наявні чекпоінти. Сирі дані не
+    читаються: якщо нічого не знайдено, виникає FileNotFoundError, а з
+    build=True спільний файл будується з даних усіх клієнтів.
+    """
+    min_vals, max_vals = load_min_max(stats_path, legacy_dir=os.path.dirname(stats_path))
+    if min_vals is not None:
+        return min_vals, max_vals
+    min_vals, max_vals = load_min_max(None, legacy_dir=LEGACY_STATS_DIR)
+    if min_vals is not None:
+        print(f"Спільний файл статистик {stats_path} не знайдено, використовуються "
+              f"успадковані min_vals.npy/max_vals.npy з {LEGACY_STATS_DIR}")
+        return min_vals, max_vals
+    if not build:
+        raise FileNotFoundError(f"Не знайдено параметрів нормалізації: ні {stats_path}, ні min_vals.npy/max_vals.npy "
+                                f"у {LEGACY_STATS_DIR}. Створіть спільний файл командою: "
+                                "python core_ml_components/normalization_stats.py shared")
+    stats = build_shared_stats(stats_path)
+    return stats.min_vals, stats.max_vals
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Статистики нормалізації даних')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help='Обчислити статистики з файлів даних')
+    build_parser.add_argument('files', nargs='+', help='Файли даних data*.txt')
+    build_parser.add_argument('--output', type=str, required=True, help='Шлях до файлу статистик')
+    build_parser.add_argument('--smoothing_window', type=int, default=5, help='Розмір вікна усереднення')
+
+    merge_parser = subparsers.add_parser('merge', help="Об'єднати кілька файлів статистик")
+    merge_parser.add_argument('files', nargs='+', help='Файли статистик')
+    merge_parser.add_argument('--output', type=str, required=True, help='Шлях до файлу статистик')
+
+    shared_parser = subparsers.add_parser(
+        'shared', help="Спільні статистики з даних усіх клієнтів (build + merge). Замінюють успадковані "
+                       "federated_client/min_vals.npy та max_vals.npy, тому наявні чекпоінти слід перетренувати")
+    shared_parser.add_argument('--clients_dir', type=str, default=CLIENTS_DIR, help='Директорія з client*/data')
+    shared_parser.add_argument('--output', type=str, default=SHARED_STATS_PATH, help='Шлях до файлу статистик')
+    shared_parser.add_argument('--smoothing_window', type=int, default=5, help='Розмір вікна усереднення')
+
+    args = parser.parse_args()
+    if args.command == 'build':
+        stats = NormalizationStats.from_files(args.files, smoothing_window=args.smoothing_window)
+    elif args.command == 'shared':
+        stats = merge_client_stats(args.clients_dir, smoothing_window=args.smoothing_window)
+    else:
+        stats = NormalizationStats.load(args.files[0])
+        for path in args.files[1:]:
+            stats.merge(NormalizationStats.load(path))
+
+    stats.save(args.output)
+    print(f"Статистики ({stats.count} відліків) збережено в {args.output}")
+    print(f"min: {stats.min_vals}\nmax: {stats.max_vals}\nmean: {stats.mean}\nstd: {stats.std}")
+
+
+if __name__ == "__main__":
+    main()
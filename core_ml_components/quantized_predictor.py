@@ -0,0 +1,252 @@
+import threading
+
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras.models import Sequential
+from tensorflow.keras.layers import Dense, Input, Bidirectional, GRU
+from tensorflow.lite.python import schema_py_generated as tflite_schema
+from tensorflow.python.framework.convert_to_constants import convert_variables_to_constants_v2
+
+from core_ml_components.signal_predictor import INPUT_SIZE, FEATURES
+
+# Розмір батчу, під який конвертується модель: TFLite-інтерпретатор працює з
+# фіксованою формою входу, останній неповний батч доповнюється нулями
+QUANTIZED_BATCH_SIZE = 256
+
+
+def build_unrolled_model(batch_size=QUANTIZED_BATCH_SIZE):
+    """Архітектура SignalPredictor з розгорнутими GRU та фіксованим батчем
+
+    Розгорнуті по часу GRU перетворюються на звичайні FULLY_CONNECTED оп
+    TFLite, які квантуються та виконуються XNNPACK; GRU з циклом while
+    виконуються TFLite значно повільніше за TensorFlow. Імена шарів ті
+    самі, що в SignalPredictor, тож імена ваг збігаються з чекпоінтом.
+    """
+    model = Sequential(name="signal_predictor")
+    model.add(Input(shape=(INPUT_SIZE, FEATURES), batch_size=batch_size, name="input_layer"))
+    model.add(Bidirectional(
+        GRU(96, return_sequences=True, unroll=True, name="forward_gru_1"),
+        name="bidirectional_gru_1"
+    ))
+    model.add(Bidirectional(
+        GRU(64, unroll=True, name="forward_gru_2"),
+        name="bidirectional_gru_2"
+    ))
+    model.add(Dense(32, activation="relu", name="dense_1"))
+    model.add(Dense(FEATURES, name="dense_2"))
+    return model
+
+
+def convert_to_tflite(model, batch_size):
+    """Заморожування графа та конвертація в TFLite з int8-квантуванням ваг"""
+    concrete_function = tf.function(model.__call__).get_concrete_function(
+        tf.TensorSpec([batch_size, INPUT_SIZE, FEATURES], tf.float32)
+    )
+    frozen = convert_variables_to_constants_v2(concrete_function)
+    converter = tf.lite.TFLiteConverter.from_concrete_functions([frozen])
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    return converter.convert()
+
+
+def weight_layouts(weight, shape):
+    """Варіанти, у яких вага може лежати в константі TFLite форми shape
+
+    Ядра Dense та GRU зберігаються транспонованими, bias GRU (2, N)
+    розбивається на два окремі рядки. На першому кроці розгорнутого GRU
+    стан нульовий, тож конвертер згортає h0 @ U + b у рядок bias,
+    нарізаний по гейтах і розмножений на батч.
+    """
+    layouts = [(None, weight)]
+    if weight.ndim == 2:
+        layouts.append(("T", weight.T))
+        layouts.extend(((row,), weight[row]) for row in range(weight.shape[0]))
+        if len(shape) == 2 and 0 < shape[1] < weight.shape[1] and weight.shape[1] % shape[1] == 0:
+            layouts.extend(((row, start, start + shape[1]), np.broadcast_to(weight[row, start:start + shape[1]], shape))
+                           for row in range(weight.shape[0])
+                           for start in range(0, weight.shape[1], shape[1]))
+    return layouts
+
+
+def apply_layout(weight, layout, shape):
+    if layout is None:
+        return weight
+    if layout == "T":
+        return weight.T
+    if len(layout) == 1:
+        return weight[layout[0]]
+    row, start, stop = layout
+    return np.broadcast_to(weight[row, start:stop], shape)
+
+
+def quantize_symmetric(values, axis):
+    """Симетричне int8-квантування як у конвертера TFLite: шкала max|w| / 127
+    на кожен зріз уздовж axis (None - одна шкала на тензор)"""
+    if axis is None:
+        max_abs = np.max(np.abs(values), keepdims=True)
+    else:
+        reduce_axes = tuple(i for i in range(values.ndim) if i != axis)
+        max_abs = np.max(np.abs(values), axis=reduce_axes, keepdims=True)
+    scales = np.where(max_abs > 0, max_abs / 127.0, 1.0).astype(np.float32)
+    quantized = np.clip(np.round(values / scales), -127, 127).astype(np.int8)
+    return quantized, scales.ravel()
+
+
+class QuantizedTemplate:
+    """TFLite-модель, сконвертована один раз, та розміщення ваг у ній
+
+    Конвертація виконується з випадковими каліброваними вагами, після чого
+    кожна константа flatbuffer зіставляється за значенням з вагою (або її
+    транспонуванням / рядком). Для нового чекпоінта ваги квантуються numpy
+    та записуються в копію flatbuffer на ті самі місця - без повторного
+    заморожування та конвертації графа.
+    """
+
+    def __init__(self, batch_size=QUANTIZED_BATCH_SIZE, seed=0):
+        self.batch_size = batch_size
+        self.model = build_unrolled_model(batch_size)
+        rng = np.random.default_rng(seed)
+        calibration = [rng.standard_normal(w.shape).astype(np.float32) for w in self.model.get_weights()]
+        self.model.set_weights(calibration)
+        self.tflite_model = convert_to_tflite(self.model, batch_size)
+        self.patches = self.locate_weights(calibration)
+
+    def locate_weights(self, calibration):
+        model_bytes = bytearray(self.tflite_model)
+        base_address = np.frombuffer(model_bytes, np.uint8).ctypes.data
+        tflite_model = tflite_schema.Model.GetRootAsModel(model_bytes, 0)
+        subgraph = tflite_model.Subgraphs(0)
+
+        patches = []
+        located = set()
+        seen_buffers = set()
+        for i in range(subgraph.TensorsLength()):
+            tensor = subgraph.Tensors(i)
+            buffer = tflite_model.Buffers(tensor.Buffer())
+            if tensor.Buffer() in seen_buffers or buffer.DataLength() == 0:
+                continue
+            seen_buffers.add(tensor.Buffer())
+            data = buffer.DataAsNumpy()
+            shape = tuple(tensor.ShapeAsNumpy())
+            quantization = tensor.Quantization()
+
+            if tensor.Type() == tflite_schema.TensorType.INT8:
+                scales = quantization.ScaleAsNumpy()
+                axis = quantization.QuantizedDimension() if len(scales) > 1 else None
+                values = data.view(np.int8).reshape(shape).astype(np.float32)
+                values *= scales.reshape([-1 if d == axis else 1 for d in range(len(shape))])
+                tolerance = float(np.max(scales)) * 0.5 + 1e-6
+                scale_offset = scales.ctypes.data - base_address
+            elif tensor.Type() == tflite_schema.TensorType.FLOAT32:
+                values = data.view(np.float32).reshape(shape)
+                tolerance, axis, scale_offset = 0.0, None, None
+            else:
+                continue
+
+            matches = [(index, layout)
+                       for index, weight in enumerate(calibration)
+                       for layout, candidate in weight_layouts(weight, shape)
+                       if candidate.shape == values.shape and np.max(np.abs(candidate - values)) <= tolerance]
+            if len(matches) > 1:
+                raise RuntimeError(f"Константа {tensor.Name().decode()} неоднозначно відповідає вагам {matches}")
+            if not matches:
+                continue
+            index, layout = matches[0]
+            located.add((index, layout))
+            patches.append({
+                "weight": index,
+                "layout": layout,
+                "dtype": np.int8 if scale_offset is not None else np.float32,
+                "shape": shape,
+                "offset": data.ctypes.data - base_address,
+                "axis": axis,
+                "scale_offset": scale_offset,
+            })
+
+        # Кожна вага має потрапити в модель повністю: або як є / транспонована,
+        # або всіма своїми рядками
+        for index, weight in enumerate(calibration):
+            whole = (index, None) in located or (index, "T") in located
+            rows = weight.ndim == 2 and all((index, (row,)) in located for row in range(weight.shape[0]))
+            if not (whole or rows):
+                raise RuntimeError(f"Вагу {self.model.weights[index].name} {weight.shape} не знайдено в TFLite-моделі")
+        return patches
+
+    def patch(self, weights):
+        """TFLite-модель (bytes) з новими вагами у порядку model.get_weights()"""
+        model_bytes = bytearray(self.tflite_model)
+        for patch in self.patches:
+            values = apply_layout(np.asarray(weights[patch["weight"]], dtype=np.float32), patch["layout"], patch["shape"])
+            count = int(np.prod(patch["shape"]))
+            target = np.frombuffer(model_bytes, patch["dtype"], count, patch["offset"]).reshape(patch["shape"])
+            if patch["scale_offset"] is None:
+                target[...] = values
+                continue
+            quantized, scales = quantize_symmetric(values, patch["axis"])
+            target[...] = quantized
+            np.frombuffer(model_bytes, np.float32, len(scales), patch["scale_offset"])[:] = scales
+        return bytes(model_bytes)
+
+    def read_checkpoint(self, checkpoint_path):
+        """Ваги з чекпоінта SignalPredictor за іменами змінних"""
+        return [tf.raw_ops.Restore(file_pattern=checkpoint_path, tensor_name=var.name, dt=var.dtype).numpy()
+                .reshape(var.shape)
+                for var in self.model.weights]
+
+
+# Шаблони спільні для всіх предикторів процесу: конвертація виконується
+# один раз для кожного розміру батчу
+_templates = {}
+_templates_lock = threading.Lock()
+
+
+def get_template(batch_size=QUANTIZED_BATCH_SIZE):
+    with _templates_lock:
+        if batch_size not in _templates:
+            _templates[batch_size] = QuantizedTemplate(batch_size)
+        return _templates[batch_size]
+
+
+class QuantizedPredictor:
+    """Інференс через TFLite-модель з динамічним квантуванням ваг до int8
+
+    Граф конвертується один раз на процес (get_template), для кожного
+    чекпоінта ваги лише квантуються та записуються у flatbuffer. Кожен
+    екземпляр має власний інтерпретатор, тож паралельні оцінки не
+    блокують одна одну.
+    """
+
+    def __init__(self, batch_size=QUANTIZED_BATCH_SIZE, num_threads=None):
+        self.batch_size = batch_size
+        self.num_threads = num_threads
+        self.template = get_template(batch_size)
+        self.interpreter = None
+
+    def restore(self, checkpoint_path):
+        """Завантаження ваг з чекпоінта SignalPredictor"""
+        self.set_weights(self.template.read_checkpoint(checkpoint_path))
+
+    def set_weights(self, weights):
+        """Ваги у порядку SignalPredictor.model.get_weights()"""
+        self.tflite_model = self.template.patch(weights)
+        self.interpreter = tf.lite.Interpreter(model_content=self.tflite_model, num_threads=self.num_threads)
+        self.interpreter.allocate_tensors()
+        self.input_index = self.interpreter.get_input_details()[0]["index"]
+        self.output_index = self.interpreter.get_output_details()[0]["index"]
+
+    def infer(self, x):
+        """Прогноз для довільної кількості вікон (інтерфейс як у SignalPredictor.infer)"""
+        if self.interpreter is None:
+            raise RuntimeError("Спочатку потрібно завантажити ваги (restore або set_weights)")
+        x = np.asarray(x, dtype=np.float32)
+        outputs = []
+        for start in range(0, len(x), self.batch_size):
+            batch = x[start:start + self.batch_size]
+            n_rows = len(batch)
+            if n_rows < self.batch_size:
+                batch = np.concatenate([batch, np.zeros((self.batch_size - n_rows,) + batch.shape[1:], np.float32)])
+            self.interpreter.set_tensor(self.input_index, np.ascontiguousarray(batch))
+            self.interpreter.invoke()
+            outputs.append(self.interpreter.get_tensor(self.output_index)[:n_rows].copy())
+        if not outputs:
+            return {"output": np.empty((0, FEATURES), dtype=np.float32)}
+        return {"output": np.concatenate(outputs)}
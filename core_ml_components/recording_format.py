@@ -0,0 +1,150 @@
+"""Компактний бінарний формат 6-канальних записів (.srec) та конвертер з тексту
+
+Структура файлу:
+    4 байти   - сигнатура b"SREC"
+    4 байти   - довжина заголовка (uint32, little-endian)
+    заголовок - JSON: version, channels, samples, dtype, layout
+    доповнення нулями до кратного DATA_ALIGNMENT зміщення
+    дані      - float32 по каналах (layout "columnar"): спочатку всі
+                відліки першого каналу, потім другого і т.д.
+
+Конвертація з кореня проекту:
+    python core_ml_components/recording_format.py federated_client/client1/data testing_data
+"""
+import os
+import sys
+import glob
+import json
+import struct
+import argparse
+import numpy as np
+
+MAGIC = b"SREC"
+FORMAT_VERSION = 1
+DATA_ALIGNMENT = 64
+BINARY_EXTENSION = ".srec"
+TEXT_EXTENSION = ".txt"
+CHANNEL_NAMES = ['AccX', 'AccY', 'AccZ', 'GyroX', 'GyroY', 'GyroZ']
+
+
+def is_binary_recording(filepath):
+    """Чи є файл записом у бінарному форматі (перевірка сигнатури)"""
+    try:
+        with open(filepath, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def write_recording(filepath, data, channels=CHANNEL_NAMES):
+    """Запис масиву форми (n_samples, n_channels) у бінарний формат"""
+    data = np.asarray(data, dtype="<f4")
+    if data.ndim != 2 or data.shape[1] != len(channels):
+        raise ValueError(f"Очікується масив форми (n_samples, {len(channels)}), отримано {data.shape}")
+
+    header = json.dumps({
+        "version": FORMAT_VERSION,
+        "channels": list(channels),
+        "samples": int(data.shape[0]),
+        "dtype": "<f4",
+        "layout": "columnar",
+    }).encode("utf-8")
+    prefix_size = len(MAGIC) + 4 + len(header)
+    padding = (-prefix_size) % DATA_ALIGNMENT
+
+    tmp_path = f"{filepath}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(header)))
+        f.write(header)
+        f.write(b"\0" * padding)
+        f.write(np.ascontiguousarray(data.T).tobytes())
+    os.replace(tmp_path, filepath)
+
+
+def read_header(filepath):
+    """Заголовок бінарного запису та зміщення початку даних"""
+    with open(filepath, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{filepath} не є бінарним записом")
+        (header_size,) = struct.unpack("<I", f.read(4))
+        header = json.loads(f.read(header_size).decode("utf-8"))
+    if header.get("version", 0) > FORMAT_VERSION:
+        raise ValueError(f"Непідтримувана версія формату запису: {header.get('version')}")
+    prefix_size = len(MAGIC) + 4 + header_size
+    return header, prefix_size + (-prefix_size) % DATA_ALIGNMENT
+
+
+def read_recording(filepath):
+    """Відкриття бінарного запису через memmap без копіювання
+
+    Returns:
+        np.ndarray: read-only view форми (n_samples, n_channels)
+    """
+    header, offset = read_header(filepath)
+    n_channels = len(header["channels"])
+    columns = np.memmap(filepath, dtype=np.dtype(header["dtype"]), mode="r", offset=offset,
+                        shape=(n_channels, header["samples"]))
+    return columns.T
+
+
+def list_recordings(data_dir, pattern="data*"):
+    """Файли записів у директорії; бінарна версія має пріоритет над текстовою"""
+    recordings = {}
+    for extension in (TEXT_EXTENSION, BINARY_EXTENSION):
+        for path in glob.glob(os.path.join(data_dir, pattern + extension)):
+            recordings[os.path.splitext(path)[0]] = path
+    return [recordings[stem] for stem in sorted(recordings)]
+
+
+def preferred_recording(filepath):
+    """Шлях до .srec версії запису, якщо вона існує, інакше сам filepath"""
+    binary_path = os.path.splitext(filepath)[0] + BINARY_EXTENSION
+    return binary_path if os.path.exists(binary_path) else filepath
+
+
+def convert_text_file(text_path):
+    """Конвертація одного текстового запису в .srec поруч з оригіналом"""
+    from core_ml_components.util_functions import read_sensor_sections
+
+    acc_data, gyro_data = read_sensor_sections(text_path)
+    min_length = min(len(acc_data), len(gyro_data))
+    if min_length == 0:
+        raise ValueError("файл не містить відліків акселерометра та гіроскопа")
+    data = np.concatenate([acc_data[:min_length], gyro_data[:min_length]], axis=1)
+    binary_path = os.path.splitext(text_path)[0] + BINARY_EXTENSION
+    write_recording(binary_path, data)
+    return binary_path
+
+
+def main():
+    # Додаємо кореневу директорію проекту до PYTHONPATH
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    parser = argparse.ArgumentParser(description='Конвертація текстових записів у бінарний формат .srec')
+    parser.add_argument('paths', nargs='+', help='Текстові файли або директорії з *.txt записами')
+    parser.add_argument('--remove_text', action='store_true', help='Видалити текстові файли після конвертації')
+    args = parser.parse_args()
+
+    text_files = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            text_files.extend(sorted(glob.glob(os.path.join(path, "*" + TEXT_EXTENSION))))
+        else:
+            text_files.append(path)
+
+    for text_path in text_files:
+        try:
+            binary_path = convert_text_file(text_path)
+        except Exception as e:
+            print(f"Помилка конвертації {text_path}: {e}")
+            continue
+        text_size = os.path.getsize(text_path)
+        binary_size = os.path.getsize(binary_path)
+        print(f"{text_path} -> {binary_path} ({text_size} -> {binary_size} байт, {text_size / binary_size:.1f}x)")
+        if args.remove_text:
+            os.remove(text_path)
+
+
+if __name__ == "__main__":
+    main()
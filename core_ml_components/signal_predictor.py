@@ -6,9 +6,20 @@ INPUT_SIZE = 150
 OUTPUT_SIZE = 6
 FEATURES = 6
 
+TRAIN_SIGNATURE = [
+    tf.TensorSpec([None, INPUT_SIZE, FEATURES], tf.float32),
+    tf.TensorSpec([None, FEATURES], tf.float32),
+]
+INFER_SIGNATURE = [tf.TensorSpec([None, INPUT_SIZE, FEATURES], tf.float32)]
+EPOCHS_SIGNATURE = [
+    tf.TensorSpec([None, FEATURES], tf.float32),
+    tf.TensorSpec([], tf.int32),
+    tf.TensorSpec([], tf.int32),
+]
+
 class SignalPredictor(tf.keras.Model):
 
-    def __init__(self):
+    def __init__(self, jit_compile=False):
         super().__init__()
         # self.model = Sequential(name="signal_predictor")
         # self.model.add(Input(shape=(INPUT_SIZE, FEATURES), name="input_layer"))
@@ -33,13 +44,59 @@ class SignalPredictor(tf.keras.Model):
         self.model.compile(optimizer="adam", loss=tf.keras.losses.MeanSquaredError())
         self.model.summary()
 
-    @tf.function(
-        input_signature=[
-            tf.TensorSpec([None, INPUT_SIZE, FEATURES], tf.float32),
-            tf.TensorSpec([None, FEATURES], tf.float32),
-        ]
-    )
+        # XLA-компіляція train/infer: один злитий граф замість окремого запуску
+        # кожної операції. Форма батчу змінна, тому кожен новий розмір батчу
+        # компілюється окремо при першому виклику.
+        self.jit_compile = jit_compile
+        if jit_compile:
+            # Змінні оптимізатора створюються до трасування: під XLA їх не можна створювати
+            self.model.optimizer.build(self.model.trainable_variables)
+            self.train = tf.function(self._train_step, input_signature=TRAIN_SIGNATURE, jit_compile=True)
+            self.infer = tf.function(self._infer_step, input_signature=INFER_SIGNATURE, jit_compile=True)
+
+    @tf.function(input_signature=TRAIN_SIGNATURE)
     def train(self, x, y):
+        return self._train_step(x, y)
+
+    @tf.function(input_signature=INFER_SIGNATURE)
+    def infer(self, x):
+        return self._infer_step(x)
+
+    def train_epoch(self, series, batch_size=128):
+        """Одна перемішана епоха в графі; повертає середню втрату епохи"""
+        return self.train_epochs(series, 1, batch_size)["loss"][0]
+
+    @tf.function(input_signature=EPOCHS_SIGNATURE)
+    def train_epochs(self, series, epochs, batch_size):
+        """Кілька епох тренування на підготовленому ряді за один виклик графа
+
+        Вікна не матеріалізуються: на кожному кроці батч збирається через
+        tf.gather з ряду форми (n_samples, FEATURES). Вікно з початком i - це
+        series[i:i + INPUT_SIZE], ціль - series[i + INPUT_SIZE]; як і в
+        make_windows, використовуються len(series) - INPUT_SIZE - OUTPUT_SIZE
+        вікон, тож ряд передається без обрізання.
+
+        Returns:
+            dict: "loss" - вектор середніх втрат по епохах форми (epochs,)
+        """
+        n_windows = tf.maximum(tf.shape(series)[0] - INPUT_SIZE - OUTPUT_SIZE, 0)
+        n_batches = (n_windows + batch_size - 1) // batch_size
+        offsets = tf.range(INPUT_SIZE)
+        epoch_losses = tf.TensorArray(tf.float32, size=epochs)
+
+        for epoch in tf.range(epochs):
+            starts = tf.random.shuffle(tf.range(n_windows))
+            total_loss = tf.constant(0.0)
+            for batch in tf.range(n_batches):
+                batch_starts = starts[batch * batch_size:(batch + 1) * batch_size]
+                x = tf.gather(series, batch_starts[:, tf.newaxis] + offsets)
+                y = tf.gather(series, batch_starts + INPUT_SIZE)
+                total_loss += self.train(x, y)["loss"]
+            epoch_losses = epoch_losses.write(epoch, total_loss / tf.cast(tf.maximum(n_batches, 1), tf.float32))
+
+        return {"loss": epoch_losses.stack()}
+
+    def _train_step(self, x, y):
         with tf.GradientTape() as tape:
             prediction = self.model(x)
             loss = self.model.loss(y, prediction)
@@ -49,10 +106,7 @@ class SignalPredictor(tf.keras.Model):
         )
         return {"loss": loss}
 
-    @tf.function(
-        input_signature=[tf.TensorSpec([None, INPUT_SIZE, FEATURES], tf.float32)]
-    )
-    def infer(self, x):
+    def _infer_step(self, x):
         prediction = self.model(x)
         return {"output": prediction}
 
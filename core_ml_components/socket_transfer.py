@@ -0,0 +1,46 @@
+"""Передача файлів моделей через сокет без проміжних копій у Python
+
+Відправка йде через socket.sendfile (os.sendfile на Linux: дані йдуть з
+файлового кешу ядра прямо в сокет; на інших ОС - великими блоками).
+Отримання - через recv_into у заздалегідь виділений буфер з записом у файл
+великими блоками, без створення нового bytes-об'єкта на кожен фрагмент.
+"""
+# Розмір буфера отримання: файл моделі (~650 КБ) вміщується повністю
+RECV_BUFFER_SIZE = 4 * 1024 * 1024
+
+
+def send_file(sock, filepath):
+    """Відправка вмісту файлу в сокет; повертає кількість надісланих байт"""
+    with open(filepath, "rb") as f:
+        return sock.sendfile(f)
+
+
+def recv_exact_into(sock, view):
+    """Заповнення memoryview рівно len(view) байтами з сокета"""
+    received = 0
+    while received < len(view):
+        n = sock.recv_into(view[received:])
+        if n == 0:
+            raise ConnectionError("З'єднання перервано під час отримання даних")
+        received += n
+    return received
+
+
+def recv_exact(sock, size):
+    """Рівно size байт з сокета в новий bytearray"""
+    data = bytearray(size)
+    recv_exact_into(sock, memoryview(data))
+    return data
+
+
+def recv_to_file(sock, filepath, size, buffer_size=RECV_BUFFER_SIZE):
+    """Отримання рівно size байт з сокета у файл"""
+    buffer = memoryview(bytearray(min(max(size, 1), buffer_size)))
+    remaining = size
+    with open(filepath, "wb") as f:
+        while remaining > 0:
+            chunk = buffer[:min(remaining, len(buffer))]
+            recv_exact_into(sock, chunk)
+            f.write(chunk)
+            remaining -= len(chunk)
+    return size
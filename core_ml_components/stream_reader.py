@@ -0,0 +1,120 @@
+import os
+import re
+import numpy as np
+
+from core_ml_components.util_functions import (IncrementalSmoother, normalize_inplace, make_windows, parse_rows,
+                                               INPUT_SIZE, OUTPUT_SIZE, FEATURES)
+
+# Рядок-заголовок секції: "Accelerometer" або "Gyroscope"
+SECTION_HEADER = re.compile(r"^.*(Accelerometer|Gyroscope).*$", re.MULTILINE)
+
+
+class SensorLogTail:
+    """Інкрементальне читання файлу запису, який постійно доповнюється
+
+    Між викликами зберігається зміщення у файлі, незавершений останній рядок,
+    непарні відліки акселерометра/гіроскопа, стан згладжування
+    (IncrementalSmoother) та хвіст нормалізованого ряду для вікон, що
+    перетинають межу між викликами. read_new_windows() повертає лише вікна,
+    які стали повними з часу попереднього виклику.
+
+    Підтримуються рядки з 3 значеннями (у поточній секції Accelerometer або
+    Gyroscope) та рядки з 6 значеннями (повний відлік acc + gyro).
+    """
+
+    def __init__(self, filepath, min_vals, max_vals, input_size=INPUT_SIZE, output_size=OUTPUT_SIZE,
+                 smoothing_window=5):
+        if min_vals is None or max_vals is None:
+            raise ValueError("Для потокового читання потрібні фіксовані параметри нормалізації")
+        self.filepath = filepath
+        self.min_vals = min_vals
+        self.max_vals = max_vals
+        self.input_size = input_size
+        self.output_size = output_size
+        self.smoothing_window = smoothing_window
+        self.reset()
+
+    def reset(self):
+        """Скидання стану (новий файл або файл було перезаписано)"""
+        self.offset = 0
+        self.partial_line = b""
+        self.section = "acc"
+        self.pending_acc = np.empty((0, 3), dtype=np.float32)
+        self.pending_gyro = np.empty((0, 3), dtype=np.float32)
+        self.smoother = IncrementalSmoother(self.smoothing_window, FEATURES)
+        self.carry = np.empty((0, FEATURES), dtype=np.float32)
+        self.total_samples = 0
+
+    def read_new_windows(self):
+        """Нові вікна (X, Y) з моменту попереднього виклику
+
+        Returns:
+            tuple: (X, Y) форм (n_new, input_size, FEATURES) та (n_new, FEATURES)
+        """
+        samples = self._read_new_samples()
+        smoothed = self.smoother.push(samples)
+        normalize_inplace(smoothed, self.min_vals, self.max_vals)
+
+        series = np.concatenate([self.carry, smoothed])
+        X, Y = make_windows(series, self.input_size, self.output_size)
+        # Хвіст, з якого ще можуть початися майбутні вікна
+        self.carry = series[len(X):]
+        return X, Y
+
+    def _read_new_samples(self):
+        try:
+            size = os.path.getsize(self.filepath)
+        except OSError:
+            return np.empty((0, FEATURES), dtype=np.float32)
+
+        if size < self.offset:
+            print(f"Файл {self.filepath} зменшився, читаємо його з початку")
+            self.reset()
+        if size == self.offset:
+            return np.empty((0, FEATURES), dtype=np.float32)
+
+        with open(self.filepath, "rb") as f:
+            f.seek(self.offset)
+            chunk = f.read(size - self.offset)
+        self.offset += len(chunk)
+
+        # Останній рядок без "\n" ще може дописуватися
+        chunk = self.partial_line + chunk
+        last_newline = chunk.rfind(b"\n")
+        if last_newline == -1:
+            self.partial_line = chunk
+            return np.empty((0, FEATURES), dtype=np.float32)
+        self.partial_line = chunk[last_newline + 1:]
+        text = chunk[:last_newline + 1].decode("utf-8", errors="replace")
+
+        complete = [np.empty((0, FEATURES), dtype=np.float32)]
+        position = 0
+        for header in SECTION_HEADER.finditer(text):
+            complete.append(self._consume_rows(text[position:header.start()]))
+            self.section = "gyro" if header.group(1) == "Gyroscope" else "acc"
+            position = header.end()
+        complete.append(self._consume_rows(text[position:]))
+
+        # Пари (acc[i], gyro[i]) стають повними відліками
+        n_pairs = min(len(self.pending_acc), len(self.pending_gyro))
+        if n_pairs:
+            complete.append(np.concatenate([self.pending_acc[:n_pairs], self.pending_gyro[:n_pairs]], axis=1))
+            self.pending_acc = self.pending_acc[n_pairs:]
+            self.pending_gyro = self.pending_gyro[n_pairs:]
+
+        samples = np.concatenate(complete)
+        self.total_samples += len(samples)
+        return samples
+
+    def _consume_rows(self, text):
+        """Розбір рядків секції; повертає повні 6-канальні відліки"""
+        rows = parse_rows(text)
+        if len(rows) == 0:
+            return np.empty((0, FEATURES), dtype=np.float32)
+        if rows.shape[1] == FEATURES:
+            return rows
+        if self.section == "gyro":
+            self.pending_gyro = np.concatenate([self.pending_gyro, rows])
+        else:
+            self.pending_acc = np.concatenate([self.pending_acc, rows])
+        return np.empty((0, FEATURES), dtype=np.float32)
@@ -0,0 +1,134 @@
+"""Протокол передачі моделі на сервер v2: один кадр та одне підтвердження
+
+У протоколі v1 (main.cpp) завантаження займає п'ять обмінів запит/відповідь:
+SEND_MODEL/READY, ім'я файлу/OK, FILE_SIZE/SIZE_RECEIVED, вміст/OK,
+DATA_COUNT/DATA_COUNT_RECEIVED. У v2 клієнт надсилає все одним кадром:
+
+    FRAME_MAGIC (4 байти) | довжина заголовка (uint32, big-endian) |
+    довжина вмісту (uint64, big-endian) | заголовок JSON (UTF-8) | вміст
+
+Заголовок кадру завантаження містить поля UPLOAD_FIELDS. Сервер відповідає
+таким самим кадром з порожнім вмістом і заголовком {"status": "OK"} або
+{"status": "ERROR", "message": ...}.
+
+Версія узгоджується одразу після підключення: клієнт надсилає HELLO_COMMAND,
+сервер з підтримкою v2 відповідає HELLO_REPLY. Сервер v1 невідомі команди
+ігнорує, тому клієнт після таймауту продовжує за протоколом v1.
+"""
+import os
+import json
+import struct
+
+from core_ml_components.socket_transfer import send_file, recv_exact
+from core_ml_components.weight_delta import DELTA_EXTENSION
+
+PROTOCOL_VERSION = 2
+HELLO_COMMAND = "PROTOCOL_V2"
+HELLO_REPLY = "PROTOCOL_V2_OK"
+
+FRAME_MAGIC = b"FLU2"
+FRAME_PREFIX = struct.Struct(">4sIQ")
+# Заголовок - кілька полів JSON; більший розмір означає пошкоджений потік
+MAX_HEADER_SIZE = 64 * 1024
+
+UPLOAD_FIELDS = ("client_id", "filename", "data_count", "epochs", "round", "codec")
+# Формат вмісту кадру та розширення файлу, під яким його зберігає сервер
+CODEC_EXTENSIONS = {"checkpoint": ".ckpt", "delta": DELTA_EXTENSION}
+
+
+def codec_for_path(path):
+    """Формат вмісту за розширенням файлу моделі"""
+    extension = os.path.splitext(path)[1]
+    for codec, codec_extension in CODEC_EXTENSIONS.items():
+        if extension == codec_extension:
+            return codec
+    raise ValueError(f"Невідомий формат файлу моделі: {path}")
+
+
+def upload_header(client_id, filename, data_count, epochs, round_number, codec):
+    """Заголовок кадру завантаження моделі"""
+    return {"client_id": client_id, "filename": filename, "data_count": int(data_count),
+            "epochs": int(epochs), "round": int(round_number), "codec": codec}
+
+
+def check_upload_header(header):
+    """Перевірка заголовка кадру завантаження (ValueError, якщо він некоректний)"""
+    missing = [field for field in UPLOAD_FIELDS if field not in header]
+    if missing:
+        raise ValueError(f"У заголовку кадру відсутні поля: {', '.join(missing)}")
+    if header["codec"] not in CODEC_EXTENSIONS:
+        raise ValueError(f"Невідомий формат вмісту кадру: {header['codec']}")
+    filename = os.path.basename(str(header["filename"]))
+    if not filename or filename != header["filename"]:
+        raise ValueError(f"Некоректне ім'я файлу в заголовку кадру: {header['filename']}")
+    if int(header["data_count"]) < 0 or int(header["epochs"]) < 0:
+        raise ValueError("Кількість даних та епох у заголовку кадру не може бути від'ємною")
+    return header
+
+
+def encode_frame_prefix(header, payload_size):
+    """Початок кадру: префікс із довжинами та заголовок JSON"""
+    header_bytes = json.dumps(header).encode()
+    return FRAME_PREFIX.pack(FRAME_MAGIC, len(header_bytes), payload_size) + header_bytes
+
+
+def parse_frame_prefix(prefix):
+    """Довжини заголовка та вмісту з префікса кадру (FRAME_PREFIX.size байт)"""
+    frame_magic, header_size, payload_size = FRAME_PREFIX.unpack(prefix)
+    if frame_magic != FRAME_MAGIC:
+        raise ValueError(f"Неочікуваний початок кадру: {frame_magic!r}")
+    if header_size > MAX_HEADER_SIZE:
+        raise ValueError(f"Завеликий заголовок кадру: {header_size} байт")
+    return header_size, payload_size
+
+
+def decode_frame_header(header_bytes):
+    """Словник заголовка кадру з байтів JSON"""
+    header = json.loads(bytes(header_bytes).decode())
+    if not isinstance(header, dict):
+        raise ValueError("Заголовок кадру має бути об'єктом JSON")
+    return header
+
+
+def ack_header(error=None):
+    """Заголовок підтвердження кадру завантаження (або відмови з описом помилки)"""
+    if error is None:
+        return {"status": "OK"}
+    return {"status": "ERROR", "message": str(error)}
+
+
+def send_frame(sock, header, payload=b"", payload_path=None):
+    """Відправка кадру; вміст - bytes або файл payload_path (через sendfile)"""
+    payload_size = os.path.getsize(payload_path) if payload_path is not None else len(payload)
+    sock.sendall(encode_frame_prefix(header, payload_size))
+    if payload_path is not None:
+        send_file(sock, payload_path)
+    elif payload_size:
+        sock.sendall(payload)
+
+
+def recv_frame_header(sock, magic=None):
+    """Заголовок кадру; вміст залишається в сокеті
+
+    Args:
+        magic: вже прочитані з сокета перші 4 байти кадру (None - прочитати)
+
+    Returns:
+        tuple: (заголовок, розмір вмісту в байтах)
+    """
+    if magic is None:
+        magic = bytes(recv_exact(sock, len(FRAME_MAGIC)))
+    prefix = magic + bytes(recv_exact(sock, FRAME_PREFIX.size - len(magic)))
+    header_size, payload_size = parse_frame_prefix(prefix)
+    return decode_frame_header(recv_exact(sock, header_size)), payload_size
+
+
+def recv_frame(sock, magic=None):
+    """Кадр повністю: (заголовок, вміст bytearray)"""
+    header, payload_size = recv_frame_header(sock, magic)
+    return header, recv_exact(sock, payload_size)
+
+
+def send_ack(sock, error=None):
+    """Підтвердження кадру завантаження (або відмова з описом помилки)"""
+    send_frame(sock, ack_header(error))
@@ -1,9 +1,11 @@
 import tensorflow as tf
 from tensorflow.keras.models import Sequential
 from tensorflow.keras.layers import LSTM, Dense, Input, Bidirectional, GRU
+import io
 import numpy as np
 from scipy.ndimage import uniform_filter1d
-import os
+
+from core_ml_components.recording_format import is_binary_recording, read_recording
 
 # Константи
 INPUT_SIZE = 150
@@ -90,12 +92,231 @@ def apply_moving_average(data, window_size=5):
     Returns:
         np.ndarray: оброблені дані
     """
-    smoothed_data = np.zeros_like(data)
-    for i in range(data.shape[1]):
-        smoothed_data[:, i] = uniform_filter1d(data[:, i], size=window_size, mode='nearest')
-    return smoothed_data
+    return uniform_filter1d(data, size=window_size, axis=0, mode='nearest')
+
+
+def smooth_channels(acc_data, gyro_data, smoothing_window=5):
+    """Згладжування всіх 6 каналів одним викликом уздовж осі 0
+
+    Returns:
+        np.ndarray: згладжені дані float32 форми (n_samples, FEATURES)
+    """
+    min_length = min(len(acc_data), len(gyro_data))
+    raw = np.concatenate([acc_data[:min_length], gyro_data[:min_length]], axis=1).astype(np.float32, copy=False)
+
+    data = np.empty(raw.shape, dtype=np.float32)
+    uniform_filter1d(raw, size=smoothing_window, axis=0, mode='nearest', output=data)
+    return data
+
+
+def smooth_and_normalize(acc_data, gyro_data, min_vals=None, max_vals=None, smoothing_window=5):
+    """Згладжування всіх каналів одним викликом та нормалізація на місці
+
+    Сирі канали акселерометра та гіроскопа складаються в один масив,
+    фільтр застосовується один раз уздовж осі 0 у заздалегідь виділений
+    буфер float32, після чого нормалізація виконується в цьому ж буфері.
+
+    Args:
+        acc_data (np.ndarray): дані акселерометра форми (n_samples, 3)
+        gyro_data (np.ndarray): дані гіроскопа форми (n_samples, 3)
+        min_vals (np.ndarray, optional): мінімальні значення для нормалізації
+        max_vals (np.ndarray, optional): максимальні значення для нормалізації
+        smoothing_window (int): розмір вікна усереднення
+
+    Returns:
+        tuple: (data, min_vals, max_vals) - нормалізовані дані float32 форми
+            (n_samples, FEATURES) та використані параметри нормалізації
+            (обчислені з даних, якщо не були задані)
+    """
+    data = smooth_channels(acc_data, gyro_data, smoothing_window)
+
+    if min_vals is None or max_vals is None:
+        min_vals = np.min(data, axis=0)
+        max_vals = np.max(data, axis=0)
+
+    normalize_inplace(data, min_vals, max_vals)
+    return data, min_vals, max_vals
+
+
+def normalize_inplace(data, min_vals, max_vals):
+    """Min-max нормалізація масиву float32 без виділення нового масиву"""
+    np.subtract(data, min_vals, out=data)
+    np.divide(data, max_vals - min_vals + 1e-8, out=data)
+    return data
+
+
+class IncrementalSmoother:
+    """Інкрементальне згладжування для даних, що надходять частинами
+
+    Дає той самий результат, що й uniform_filter1d(mode='nearest') над
+    усім рядом, але зберігає між викликами лише останні window_size - 1
+    сирих відліків. Для останніх (window_size - 1) // 2 відліків частини
+    ще немає правого контексту, тому вони повертаються наступним push()
+    або flush().
+    """
+
+    def __init__(self, window_size=5, n_features=FEATURES):
+        self.window_size = window_size
+        self.left = window_size // 2
+        self.right = (window_size - 1) // 2
+        self.n_features = n_features
+        self.tail = None  # останні window_size - 1 відліків (з урахуванням доповнення зліва)
+        self.last_sample = None
+
+    def push(self, chunk):
+        """Додавання нових відліків; повертає згладжені значення, які вже можна обчислити"""
+        chunk = np.asarray(chunk, dtype=np.float32).reshape(-1, self.n_features)
+        if len(chunk) == 0:
+            return np.empty((0, self.n_features), dtype=np.float32)
+
+        if self.tail is None:
+            # mode='nearest': зліва ряд доповнюється першим відліком
+            self.tail = np.repeat(chunk[:1], self.left, axis=0)
+        extended = np.concatenate([self.tail, chunk])
+        self.last_sample = chunk[-1:]
+        return self._emit(extended)
+
+    def flush(self):
+        """Завершення потоку: повертає відліки, що очікували правого контексту"""
+        if self.tail is None:
+            return np.empty((0, self.n_features), dtype=np.float32)
+        # mode='nearest': справа ряд доповнюється останнім відліком
+        extended = np.concatenate([self.tail, np.repeat(self.last_sample, self.right, axis=0)])
+        result = self._emit(extended)
+        self.tail = None
+        self.last_sample = None
+        return result
+
+    def _emit(self, extended):
+        n_ready = len(extended) - self.window_size + 1
+        if n_ready > 0:
+            smoothed = np.empty(extended.shape, dtype=np.float32)
+            uniform_filter1d(extended, size=self.window_size, axis=0, mode='nearest', output=smoothed)
+            result = smoothed[self.left:self.left + n_ready]
+        else:
+            result = np.empty((0, self.n_features), dtype=np.float32)
+        self.tail = extended[max(len(extended) - (self.window_size - 1), 0):]
+        return result
+
+def _skip_header_line(text, header):
+    """Відкидання рядка із заголовком секції (якщо він є)"""
+    pos = text.find(header)
+    if pos == -1:
+        return text
+    line_end = text.find("\n", pos)
+    return "" if line_end == -1 else text[line_end + 1:]
+
+
+def parse_rows(text):
+    """Перетворення тексту секції (рядки з числами через кому) у масив float32"""
+    if not text.strip():
+        return np.empty((0, 3), dtype=np.float32)
+    return np.loadtxt(io.StringIO(text), delimiter=",", dtype=np.float32, ndmin=2)
+
+
+def read_sensor_sections(filepath):
+    """Читання секцій акселерометра та гіроскопа з файлу запису
+
+    Файл читається цілком, заголовки секцій шукаються один раз, а кожна
+    секція перетворюється в масив одним викликом замість поелементного
+    розбору рядків.
+
+    Args:
+        filepath (str): шлях до файлу з даними
+
+    Бінарні записи (.srec) розпізнаються за сигнатурою і відкриваються
+    через memmap без розбору тексту.
+
+    Returns:
+        tuple: (acc_data, gyro_data) - масиви float32 форми (n_samples, 3)
+    """
+    if is_binary_recording(filepath):
+        data = read_recording(filepath)
+        return data[:, :3], data[:, 3:6]
 
-def load_data(filepath, input_size, output_size, min_vals=None, max_vals=None):
+    with open(filepath, "r") as f:
+        text = f.read()
+
+    gyro_pos = text.find("Gyroscope")
+    if gyro_pos == -1:
+        acc_text, gyro_text = text, ""
+    else:
+        acc_text = text[:gyro_pos]
+        gyro_text = _skip_header_line(text[gyro_pos:], "Gyroscope")
+    acc_text = _skip_header_line(acc_text, "Accelerometer")
+
+    return parse_rows(acc_text), parse_rows(gyro_text)
+
+
+def load_series(filepath, min_vals=None, max_vals=None, smoothing_window=5):
+    """Завантаження, згладжування та нормалізація запису в один масив
+
+    Args:
+        filepath (str): шлях до файлу з даними
+        min_vals (np.ndarray, optional): мінімальні значення для нормалізації
+        max_vals (np.ndarray, optional): максимальні значення для нормалізації;
+            без них запис нормалізується власними min/max (нічого не зберігається)
+        smoothing_window (int): розмір вікна усереднення
+
+    Returns:
+        np.ndarray: нормалізовані дані float32 форми (n_samples, FEATURES)
+    """
+    acc_data, gyro_data = read_sensor_sections(filepath)
+
+    # Згладжування та нормалізація за один прохід у спільному буфері
+    data, _, _ = smooth_and_normalize(acc_data, gyro_data, min_vals, max_vals,
+                                      smoothing_window=smoothing_window)
+    return data
+
+
+def count_windows(n_samples, input_size, output_size):
+    """Кількість навчальних вікон у ряді довжини n_samples"""
+    return max(n_samples - input_size - output_size, 0)
+
+
+def make_windows(data, input_size, output_size):
+    """Ковзні вікна над рядом без копіювання даних
+
+    X[i] == data[i : i + input_size], Y[i] == data[i + input_size].
+    Обидва результати - read-only view над data, тому пам'ять зростає
+    лінійно з довжиною запису. Батчі слід збирати індексуванням
+    (X[batch_indices]), яке копіює лише потрібні вікна.
+
+    Args:
+        data (np.ndarray): ряд форми (n_samples, n_features)
+        input_size (int): розмір вхідного вікна
+        output_size (int): розмір вихідного вікна
+
+    Returns:
+        tuple: (X, Y) форм (n_windows, input_size, n_features) та (n_windows, n_features)
+    """
+    n_windows = count_windows(len(data), input_size, output_size)
+    if n_windows == 0:
+        return (np.empty((0, input_size) + data.shape[1:], dtype=data.dtype),
+                np.empty((0,) + data.shape[1:], dtype=data.dtype))
+    windows = np.lib.stride_tricks.sliding_window_view(data, input_size, axis=0)
+    # sliding_window_view кладе вісь вікна останньою: (n, features, input_size)
+    X = windows[:n_windows].transpose(0, 2, 1)
+    Y = data[input_size : input_size + n_windows]
+    Y = Y.view()
+    Y.flags.writeable = False
+    return X, Y
+
+
+def series_from_windows(X, Y, output_size=OUTPUT_SIZE):
+    """Ряд, з якого утворено вікна make_windows (обернення для X[i] та Y[i])
+
+    Повертає ряд довжини len(X) + input_size + output_size, у якому кожен
+    початок i < len(X) дає вікно X[i] з ціллю Y[i]. Останні output_size
+    рядків (повтор Y[-1]) лише доповнюють ряд до count_windows == len(X)
+    і ціллю не стають.
+    """
+    if len(X) == 0:
+        return np.empty((0, X.shape[2]), dtype=X.dtype)
+    return np.concatenate([X[:, 0, :], X[-1, 1:, :], Y[-1:], np.repeat(Y[-1:], output_size, axis=0)])
+
+
+def load_data(filepath, input_size, output_size, min_vals=None, max_vals=None, windowed=False, cache=None):
     """Завантаження та підготовка даних
     
     Args:
@@ -104,70 +325,74 @@ def load_data(filepath, input_size, output_size, min_vals=None, max_vals=None):
         output_size (int): розмір вихідного вікна
         min_vals (np.ndarray, optional): мінімальні значення для нормалізації
         max_vals (np.ndarray, optional): максимальні значення для нормалізації
+        windowed (bool): повернути read-only view вікон (див. make_windows)
+            замість матеріалізованих копій
+        cache (PreprocessedDataCache, optional): дисковий кеш підготовлених
+            рядів; використовується лише коли задано min_vals і max_vals
     """
-    with open(filepath, "r") as f:
-        lines = f.readlines()
-
-    acc_data, gyro_data = [], []
-    reading_gyro = False
-    for line in lines:
-        line = line.strip()
-        if not line or "Accelerometer" in line:
-            continue
-        if "Gyroscope" in line:
-            reading_gyro = True
-            continue
-        values = list(map(float, line.split(",")))
-        if reading_gyro:
-            gyro_data.append(values)
-        else:
-            acc_data.append(values)
+    data = load_prepared_series(filepath, input_size, min_vals, max_vals, cache=cache)
+    X, Y = make_windows(data, input_size, output_size)
+    if windowed:
+        return X, Y
+    return np.ascontiguousarray(X), np.ascontiguousarray(Y)
 
-    min_length = min(len(acc_data), len(gyro_data))
-    acc_data = np.array(acc_data[:min_length])
-    gyro_data = np.array(gyro_data[:min_length])
 
-    # Застосування усереднювального вікна до даних
-    acc_data = apply_moving_average(acc_data, window_size=5)
-    gyro_data = apply_moving_average(gyro_data, window_size=5)
+def load_prepared_series(filepath, input_size, min_vals=None, max_vals=None, cache=None):
+    """Підготовлений ряд з кешу (якщо він заданий і відомі min/max) або з файлу запису"""
+    if cache is not None and min_vals is not None and max_vals is not None:
+        return cache.load_series(filepath, min_vals, max_vals, input_size=input_size)
+    return load_series(filepath, min_vals, max_vals)
 
-    data = np.hstack([acc_data, gyro_data])
 
-    # Нормалізація даних
-    if min_vals is None or max_vals is None:
-        min_vals = np.min(data, axis=0)
-        max_vals = np.max(data, axis=0)
-        # Зберігаємо значення тільки якщо вони були обчислені
-        np.save("min_vals.npy", min_vals)
-        np.save("max_vals.npy", max_vals)
+def iterate_batches(X, Y, batch_size, shuffle=True):
+    """Генератор батчів (batch_X, batch_y) з перемішуванням індексів NumPy"""
+    indices = np.random.permutation(len(X)) if shuffle else np.arange(len(X))
+    for i in range(0, len(X), batch_size):
+        batch_indices = indices[i:min(i + batch_size, len(X))]
+        yield X[batch_indices], Y[batch_indices]
 
-        min_vals_str = ",".join(map(str, min_vals))
-        max_vals_str = ",".join(map(str, max_vals))
-        with open(os.path.join("min_vals.txt"), "w") as f_min:
-            f_min.write(min_vals_str)
-        with open(os.path.join("max_vals.txt"), "w") as f_max:
-            f_max.write(max_vals_str)
-        print(f"Saved new min/max normalization parameters to min_vals.txt and max_vals.txt")
 
-    data = (data - min_vals) / (max_vals - min_vals + 1e-8)
+def make_window_dataset(series, input_size, output_size, batch_size, shuffle_buffer=None):
+    """tf.data конвеєр, що формує вікна з базового ряду на льоту
 
-    X, Y = [], []
-    for i in range(len(data) - input_size - output_size):
-        X.append(data[i : i + input_size])
-        Y.append(data[i + input_size])
+    Перемішуються лише індекси початку вікон; вікна збираються з ряду через
+    tf.gather вже після формування батчу, паралельно з тренуванням завдяки
+    map(num_parallel_calls=AUTOTUNE) та prefetch(AUTOTUNE).
 
-    return np.array(X, dtype=np.float32), np.array(Y, dtype=np.float32)
+    Args:
+        series (np.ndarray): ряд форми (n_samples, FEATURES)
+        input_size (int): розмір вхідного вікна
+        output_size (int): розмір вихідного вікна
+        batch_size (int): розмір батчу
+        shuffle_buffer (int, optional): розмір буфера перемішування
+            (за замовчуванням - усі вікна, тобто повне перемішування)
 
+    Returns:
+        tf.data.Dataset: батчі (x, y) форм (batch, input_size, FEATURES) та (batch, FEATURES)
+    """
+    n_windows = count_windows(len(series), input_size, output_size)
+    series_tensor = tf.constant(np.asarray(series, dtype=np.float32))
+    offsets = tf.range(input_size, dtype=tf.int64)
 
-def load_and_prepare_test_data(filepath):
+    def gather_windows(starts):
+        x = tf.gather(series_tensor, starts[:, None] + offsets[None, :])
+        y = tf.gather(series_tensor, starts + input_size)
+        return x, y
+
+    dataset = tf.data.Dataset.range(n_windows)
+    dataset = dataset.shuffle(shuffle_buffer or max(n_windows, 1), reshuffle_each_iteration=True)
+    dataset = dataset.batch(batch_size)
+    dataset = dataset.map(gather_windows, num_parallel_calls=tf.data.AUTOTUNE)
+    return dataset.prefetch(tf.data.AUTOTUNE)
+
+
+def load_and_prepare_test_data(filepath, windowed=False, cache=None):
     """Завантаження та підготовка тестових даних"""
-    try:
-        min_vals = np.load("testing_data/min_vals.npy")
-        max_vals = np.load("testing_data/max_vals.npy")
-    except FileNotFoundError:
-        print("Файли з значеннями нормалізації не знайдено. Буде використано значення з тестових даних")
-        min_vals = None
-        max_vals = None
-
-    X_test, y_test = load_data(filepath, INPUT_SIZE, 1, min_vals, max_vals)
+    # Імпорт тут, бо normalization_stats сам залежить від util_functions
+    from core_ml_components.normalization_stats import load_shared_min_max
+
+    # Тестові дані нормалізуються тими ж статистиками, що й дані клієнтів
+    min_vals, max_vals = load_shared_min_max()
+
+    X_test, y_test = load_data(filepath, INPUT_SIZE, 1, min_vals, max_vals, windowed=windowed, cache=cache)
     return X_test, y_test
\ No newline at end of file
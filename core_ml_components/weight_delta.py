@@ -0,0 +1,179 @@
+"""Стиснені різниці ваг (дельти) для передачі моделі клієнтом
+
+Клієнт надсилає не повний чекпоінт, а різницю між натренованими вагами та
+вагами отриманої глобальної моделі, стиснену одним із методів:
+    topk - для кожного тензора лише k = ratio * size найбільших за модулем
+           значень (індекси uint32 + значення float32);
+    int8 - кожен тензор квантується в int8 з одним масштабом float32.
+Похибка стиснення (error feedback) додається до дельти наступного раунду,
+тому відкинуті оновлення не втрачаються, а лише запізнюються. Нова похибка
+враховується лише після підтвердження завантаження сервером (commit), щоб
+невдале відправлення не додало ту саму похибку двічі.
+
+int8 майже не погіршує модель і є методом за замовчуванням; topk з малою
+часткою значень стискає сильніше, але помітно втрачає якість.
+
+Файл дельти - npz з JSON-заголовком: метод, імена, форми та типи тензорів,
+а також відбиток (tensors_digest) базової моделі, від якої рахувалась
+дельта. Сторона агрегації знаходить базову модель за відбитком і
+відновлює повні ваги через apply_delta.
+"""
+import io
+import os
+import json
+import hashlib
+import numpy as np
+
+DELTA_EXTENSION = ".delta"
+DELTA_FORMAT_VERSION = 1
+COMPRESSION_METHODS = ("topk", "int8")
+
+
+def tensors_digest(tensors):
+    """Відбиток вмісту набору тензорів (не залежить від формату файлу чекпоінта)"""
+    digest = hashlib.sha256()
+    for name in sorted(tensors):
+        value = np.ascontiguousarray(tensors[name])
+        digest.update(f"{name}:{value.dtype.str}:{value.shape};".encode())
+        digest.update(value.tobytes())
+    return digest.hexdigest()
+
+
+def compress_tensor(value, method, topk_ratio=0.01):
+    """Стиснення одного тензора; повертає словник масивів для запису в файл"""
+    flat = np.asarray(value, dtype=np.float32).ravel()
+    if method == "topk":
+        k = min(max(int(np.ceil(topk_ratio * flat.size)), 1), flat.size)
+        indices = np.argpartition(np.abs(flat), flat.size - k)[flat.size - k:]
+        indices.sort()
+        return {"indices": indices.astype(np.uint32), "values": flat[indices]}
+    if method == "int8":
+        max_abs = float(np.max(np.abs(flat))) if flat.size else 0.0
+        scale = max_abs / 127.0 if max_abs > 0 else 1.0
+        quantized = np.clip(np.rint(flat / scale), -127, 127).astype(np.int8)
+        return {"q": quantized, "scale": np.float32(scale)}
+    raise ValueError(f"Невідомий метод стиснення дельти: {method}")
+
+
+def decompress_tensor(encoded, method, shape):
+    """Щільний float32-тензор форми shape зі стисненого подання"""
+    size = int(np.prod(shape))
+    if method == "topk":
+        flat = np.zeros(size, dtype=np.float32)
+        flat[encoded["indices"]] = encoded["values"]
+    elif method == "int8":
+        flat = encoded["q"].astype(np.float32) * np.float32(encoded["scale"])
+    else:
+        raise ValueError(f"Невідомий метод стиснення дельти: {method}")
+    return flat.reshape(shape)
+
+
+class DeltaCompressor:
+    """Стиснення дельт ваг з накопиченням похибки між раундами (error feedback)"""
+
+    def __init__(self, method="int8", topk_ratio=0.01, error_feedback=True):
+        if method not in COMPRESSION_METHODS:
+            raise ValueError(f"Невідомий метод стиснення дельти: {method}")
+        if not 0 < topk_ratio <= 1:
+            raise ValueError("Частка top-k має бути в діапазоні (0, 1]")
+        self.method = method
+        self.topk_ratio = topk_ratio
+        self.error_feedback = error_feedback
+        self.residual = {}
+        # Похибка останнього стиснення, що чекає на підтвердження завантаження
+        self.pending_residual = None
+
+    def compress(self, delta):
+        """Стиснення словника дельт {ім'я: масив}
+
+        До дельти додається похибка попередніх підтверджених завантажень.
+        Нова похибка зберігається окремо і стає активною лише після commit().
+
+        Returns:
+            dict: {ім'я: стиснене подання} для write_delta
+        """
+        compressed = {}
+        pending = {}
+        for name, value in delta.items():
+            corrected = np.asarray(value, dtype=np.float32)
+            if self.error_feedback and name in self.residual:
+                corrected = corrected + self.residual[name]
+            encoded = compress_tensor(corrected, self.method, self.topk_ratio)
+            if self.error_feedback:
+                pending[name] = corrected - decompress_tensor(encoded, self.method, corrected.shape)
+            compressed[name] = encoded
+        self.pending_residual = pending if self.error_feedback else None
+        return compressed
+
+    def commit(self):
+        """Сервер прийняв останню дельту: її похибка переходить у наступний раунд"""
+        if self.pending_residual is not None:
+            self.residual = self.pending_residual
+        self.pending_residual = None
+
+    def discard(self):
+        """Останню дельту не доставлено: похибка попередніх раундів лишається без змін"""
+        self.pending_residual = None
+
+
+def weight_delta(trained, base):
+    """Різниця натренованих ваг та базових (float32)"""
+    return {name: np.asarray(trained[name], dtype=np.float32) - np.asarray(base[name], dtype=np.float32)
+            for name in base}
+
+
+def encode_delta(compressed, base_tensors, method, base_digest=None):
+    """Вміст файлу дельти (npz) у вигляді bytes"""
+    names = list(compressed)
+    header = {
+        "version": DELTA_FORMAT_VERSION,
+        "method": method,
+        "base_digest": base_digest or tensors_digest(base_tensors),
+        "names": names,
+        "shapes": [list(np.shape(base_tensors[name])) for name in names],
+        "dtypes": [np.asarray(base_tensors[name]).dtype.str for name in names],
+    }
+    arrays = {"header": np.array(json.dumps(header))}
+    for i, name in enumerate(names):
+        for key, value in compressed[name].items():
+            arrays[f"t{i}_{key}"] = np.asarray(value)
+
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, **arrays)
+    return buffer.getvalue()
+
+
+def write_delta(path, compressed, base_tensors, method, base_digest=None):
+    """Атомарний запис стисненої дельти разом з відбитком базової моделі"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(encode_delta(compressed, base_tensors, method, base_digest))
+    os.replace(tmp_path, path)
+    return path
+
+
+def read_delta(path):
+    """Читання файлу дельти
+
+    Returns:
+        tuple: (відбиток базової моделі, {ім'я: щільна дельта float32})
+    """
+    with np.load(path, allow_pickle=False) as data:
+        header = json.loads(str(data["header"]))
+        if header.get("version", 0) > DELTA_FORMAT_VERSION:
+            raise ValueError(f"Непідтримувана версія формату дельти: {header.get('version')}")
+        method = header["method"]
+        delta = {}
+        for i, name in enumerate(header["names"]):
+            prefix = f"t{i}_"
+            encoded = {key[len(prefix):]: data[key] for key in data.files if key.startswith(prefix)}
+            delta[name] = decompress_tensor(encoded, method, tuple(header["shapes"][i]))
+    return header["base_digest"], delta
+
+
+def apply_delta(base, delta):
+    """Повні ваги: базова модель + дельта (у типах базової моделі)"""
+    if base.keys() != delta.keys():
+        missing = sorted(set(base) ^ set(delta))
+        raise ValueError(f"Набори тензорів дельти та базової моделі не збігаються: {missing[:3]}")
+    return {name: (base[name] + delta[name]).astype(base[name].dtype) for name in base}
@@ -7,23 +7,76 @@ import socket
 import json
 import time
 import numpy as np
-import tensorflow as tf
-import matplotlib
-matplotlib.use('Agg')  # Встановлюємо агресивний режим для роботи в неосновному потоці
-import matplotlib.pyplot as plt
-import seaborn as sns
-from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
 from datetime import datetime
-from util_functions import SignalPredictor, INPUT_SIZE, FEATURES, load_and_prepare_test_data
 import threading
 import queue
 import struct
+import argparse
 
 # Додаємо кореневу директорію проекту до PYTHONPATH
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from core_ml_components.signal_predictor import SignalPredictor
-from core_ml_components.util_functions import load_and_prepare_test_data
+from core_ml_components.model_artifact import load_predictor
+from core_ml_components.util_functions import load_and_prepare_test_data, INPUT_SIZE, FEATURES
+from core_ml_components.data_cache import PreprocessedDataCache
+from core_ml_components.normalization_stats import SHARED_STATS_PATH, LEGACY_STATS_DIR
+from core_ml_components.recording_format import preferred_recording
+from core_ml_components.socket_transfer import recv_exact, recv_to_file
+
+TEST_DATA_PATH = "./testing_data/merged_testing_data_12min.txt"
+# Файли, зміна яких означає зміну спільних параметрів нормалізації
+TEST_NORMALIZATION_FILES = [
+    SHARED_STATS_PATH,
+    os.path.join(os.path.dirname(SHARED_STATS_PATH), "min_vals.npy"),
+    os.path.join(os.path.dirname(SHARED_STATS_PATH), "max_vals.npy"),
+    os.path.join(LEGACY_STATS_DIR, "min_vals.npy"),
+    os.path.join(LEGACY_STATS_DIR, "max_vals.npy"),
+]
+# Інтерпретатор TFLite не читає змінні середовища TF, тому кількість його потоків
+# береться з TF_NUM_INTRAOP_THREADS, яку задає лаунчер при розподілі ядер
+TFLITE_NUM_THREADS = int(os.environ["TF_NUM_INTRAOP_THREADS"]) if os.environ.get("TF_NUM_INTRAOP_THREADS") else None
+
+
+class SharedTestData:
+    """Тестовий набір, підготовлений один раз і спільний для всіх потоків оцінки
+
+    Дані зберігаються як read-only memmap з кешу підготовлених рядів, а
+    X/Y - це view вікон над ним, тож паралельні оцінки не тримають власних
+    копій. Набір перезавантажується лише коли змінився тестовий файл або
+    файли параметрів нормалізації.
+    """
+
+    def __init__(self, filepath, cache_dir=os.path.join("testing_data", "preprocessed_cache")):
+        self.filepath = filepath
+        self.cache_dir = cache_dir
+        self.lock = threading.Lock()
+        self.signature = None
+        self.data = None
+
+    def current_signature(self):
+        signature = []
+        for path in [preferred_recording(self.filepath)] + TEST_NORMALIZATION_FILES:
+            try:
+                stat = os.stat(path)
+                signature.append((path, stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append((path, None, None))
+        return tuple(signature)
+
+    def get(self):
+        """(X_test, y_test) - read-only view; перезавантаження за потреби"""
+        with self.lock:
+            signature = self.current_signature()
+            if self.data is None or signature != self.signature:
+                print("Завантаження тестових даних...")
+                cache = PreprocessedDataCache(self.cache_dir)
+                self.data = load_and_prepare_test_data(preferred_recording(self.filepath), windowed=True, cache=cache)
+                self.signature = signature
+                print(f"Тестові дані підготовлено: {len(self.data[0])} вікон")
+            return self.data
+
+
+test_data = SharedTestData(TEST_DATA_PATH)
 
 # Створюємо чергу для зберігання метрик
 metrics_queue = queue.Queue()
@@ -106,8 +159,18 @@ def mean_absolute_percentage_error(y_true, y_pred):
     return mape
 
 
+def plotting_modules():
+    """Відкладений імпорт matplotlib/seaborn: вони потрібні лише після першої оцінки"""
+    import matplotlib
+    matplotlib.use('Agg')  # Встановлюємо агресивний режим для роботи в неосновному потоці
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    return plt, sns
+
+
 def plot_predictions(y_true, y_pred, feature_names, model_name):
     """Візуалізація прогнозів для кожного параметра"""
+    plt, _ = plotting_modules()
     plt.figure(figsize=(15, 10))
     plt.suptitle(f'Прогнози моделі: {model_name}', fontsize=16)
     for i in range(FEATURES):
@@ -126,6 +189,7 @@ def plot_predictions(y_true, y_pred, feature_names, model_name):
 
 def plot_error_distribution(y_true, y_pred, feature_names, model_name):
     """Візуалізація розподілу помилок"""
+    plt, sns = plotting_modules()
     errors = y_pred - y_true
     plt.figure(figsize=(15, 10))
     plt.suptitle(f'Розподіл помилок моделі: {model_name}', fontsize=16)
@@ -141,6 +205,7 @@ def plot_error_distribution(y_true, y_pred, feature_names, model_name):
 
 def plot_time_series(y_true, y_pred, feature_names, model_name, window_size=150):
     """Візуалізація прогнозів у часовій області"""
+    plt, _ = plotting_modules()
     total_samples = len(y_true)
     start_indices = [0, total_samples // 2 - window_size // 2, total_samples - window_size - 100]
     section_names = ['Початок датасету', 'Середина датасету', 'Кінець датасету']
@@ -172,6 +237,7 @@ def plot_time_series(y_true, y_pred, feature_names, model_name, window_size=150)
 
 def plot_kde_residuals(y_true, y_pred, feature_names, model_name):
     """Візуалізація KDE залишків"""
+    plt, sns = plotting_modules()
     residuals = y_pred - y_true
     plt.figure(figsize=(15, 10))
     plt.suptitle(f'KDE залишків моделі: {model_name}', fontsize=16)
@@ -187,14 +253,22 @@ def plot_kde_residuals(y_true, y_pred, feature_names, model_name):
     plt.close()
 
 
-def evaluate_model(model, X_test, y_test, model_name):
-    """Модифікована функція оцінки, що повертає лише метрики та зберігає графіки."""
-    predictions = model.model.predict(X_test)
+def predict_in_batches(model, X, batch_size=512):
+    """Прогноз батчами: вікна копіюються з view лише для поточного батчу"""
+    predictions = []
+    for start in range(0, len(X), batch_size):
+        batch_X = np.ascontiguousarray(X[start:start + batch_size])
+        predictions.append(np.asarray(model.infer(batch_X)['output']))
+    if not predictions:
+        return np.empty((0, FEATURES), dtype=np.float32)
+    return np.concatenate(predictions)
 
 
-    # Метрики
-    metrics = {
-        'model_name': model_name,  # Додаємо ім'я моделі до метрик
+def compute_metrics(y_test, predictions):
+    """Метрики якості прогнозу"""
+    from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
+
+    return {
         'MSE': mean_squared_error(y_test, predictions),
         'RMSE': np.sqrt(mean_squared_error(y_test, predictions)),
         'MAE': mean_absolute_error(y_test, predictions),
@@ -203,7 +277,8 @@ def evaluate_model(model, X_test, y_test, model_name):
     }
 
 
-    # Візуалізація результатів (зберігаємо файли)
+def save_plots(y_test, predictions, model_name):
+    """Візуалізація результатів (зберігаємо файли)"""
     feature_names = ['AccX', 'AccY', 'AccZ', 'GyroX', 'GyroY', 'GyroZ']
     plot_predictions(y_test, predictions, feature_names, model_name)
     plot_error_distribution(y_test, predictions, feature_names, model_name)
@@ -211,20 +286,76 @@ def evaluate_model(model, X_test, y_test, model_name):
     plot_kde_residuals(y_test, predictions, feature_names, model_name)
 
 
+def evaluate_model(model, X_test, y_test, model_name):
+    """Модифікована функція оцінки, що повертає лише метрики та зберігає графіки."""
+    predictions = predict_in_batches(model, X_test)
+
+    # Метрики
+    metrics = {'model_name': model_name}  # Додаємо ім'я моделі до метрик
+    metrics.update(compute_metrics(y_test, predictions))
+
+    save_plots(y_test, predictions, model_name)
     return metrics
 
 
-def evaluate_model_async(model_path, model_name):
-    """Асинхронна оцінка моделі в окремому потоці"""
-    try:
-        print("Завантаження тестових даних...")
-        X_test, y_test = load_and_prepare_test_data("./testing_data/merged_testing_data_12min.txt")
+def evaluate_quantized(model_path, X_test, y_test, model_name, jit_compile=False, drift_sample=0):
+    """Оцінка через int8 TFLite-модель з дрейфом метрик відносно float32
+
+    Метрики квантованої моделі рахуються на всьому тестовому наборі. Для
+    дрейфу float32-модель запускається на перших drift_sample вікнах (0 -
+    float32-модель не створюється взагалі; None - на всьому наборі, тоді
+    метрики float32 також повертаються повністю). Дрейф - різниця метрик
+    (int8 - float32) на тих самих вікнах.
+    """
+    from core_ml_components.quantized_predictor import QuantizedPredictor
+
+    # Конвертований граф спільний для процесу, кожна оцінка має власний
+    # інтерпретатор, тому паралельні оцінки не серіалізуються
+    quantized_predictor = QuantizedPredictor(num_threads=TFLITE_NUM_THREADS)
+    start = time.perf_counter()
+    quantized_predictor.restore(model_path)
+    patch_time = time.perf_counter() - start
+    start = time.perf_counter()
+    quantized = predict_in_batches(quantized_predictor, X_test, batch_size=quantized_predictor.batch_size * 8)
+    quantized_time = time.perf_counter() - start
+    print(f"int8: підстановка ваг {patch_time:.2f} с, прогноз {quantized_time:.1f} с")
+
+    metrics = {'model_name': f"{model_name} (int8)"}
+    metrics.update(compute_metrics(y_test, quantized))
+
+    n_compare = len(X_test) if drift_sample is None else min(drift_sample, len(X_test))
+    if n_compare:
+        float_model = load_predictor(jit_compile=jit_compile)
+        float_model.restore(model_path)
+        start = time.perf_counter()
+        reference = predict_in_batches(float_model, X_test[:n_compare])
+        print(f"float32: прогноз {n_compare} вікон за {time.perf_counter() - start:.1f} с")
+
+        float_metrics = compute_metrics(y_test[:n_compare], reference)
+        quantized_subset = compute_metrics(y_test[:n_compare], quantized[:n_compare])
+        if n_compare == len(X_test):
+            metrics.update({f"{name} float32": value for name, value in float_metrics.items()})
+        metrics.update({f"Δ{name}": quantized_subset[name] - float_metrics[name] for name in float_metrics})
+        metrics['Макс. Δ прогнозу'] = float(np.max(np.abs(quantized[:n_compare] - reference)))
+
+    save_plots(y_test, quantized, f"{model_name}_int8")
+    return metrics
 
-        model_to_evaluate = SignalPredictor()
-        model_to_evaluate.restore(model_path)
-        print("Модель завантажено, починається оцінка...")
 
-        metrics = evaluate_model(model_to_evaluate, X_test, y_test, model_name)
+def evaluate_model_async(model_path, model_name, jit_compile=False, inference="float32", drift_sample=0):
+    """Асинхронна оцінка моделі в окремому потоці"""
+    try:
+        X_test, y_test = test_data.get()
+
+        if inference == "float32":
+            model_to_evaluate = load_predictor(jit_compile=jit_compile)
+            model_to_evaluate.restore(model_path)
+            print("Модель завантажено, починається оцінка...")
+            metrics = evaluate_model(model_to_evaluate, X_test, y_test, model_name)
+        else:
+            print(f"Починається оцінка квантованої моделі (режим {inference})...")
+            metrics = evaluate_quantized(model_path, X_test, y_test, model_name, jit_compile=jit_compile,
+                                         drift_sample=None if inference == "both" else drift_sample)
         print("Оцінку завершено. Графіки збережено.")
 
         # Додаємо метрики до черги для відправки на GUI
@@ -240,7 +371,7 @@ def evaluate_model_async(model_path, model_name):
         print(f"Помилка при асинхронній оцінці моделі: {e}")
 
 
-def handle_evaluation_request(client_socket):
+def handle_evaluation_request(client_socket, jit_compile=False, inference="float32", drift_sample=0):
     """Обробляє запит на оцінку: отримує модель і запускає асинхронну оцінку"""
     try:
         # 1. Отримати назву файлу
@@ -260,8 +391,9 @@ def handle_evaluation_request(client_socket):
         os.makedirs("received_models", exist_ok=True)
         model_path = os.path.join("received_models", model_name)
         
-        raw_size = client_socket.recv(8)
-        if len(raw_size) < 8:
+        try:
+            raw_size = recv_exact(client_socket, 8)
+        except ConnectionError:
             print("Не вдалося отримати розмір моделі")
             return
         model_size = struct.unpack('>Q', raw_size)[0]
@@ -269,31 +401,24 @@ def handle_evaluation_request(client_socket):
 
 
         # 2. Отримати і зберегти файл моделі
-        received = 0
-        with open(model_path, 'wb') as f:
-            while received < model_size:
-                try:
-                    chunk = client_socket.recv(min(4096, model_size - received))
-                    if not chunk:
-                        print("Потік раптово обірвався")
-                        return
-                    f.write(chunk)
-                    received += len(chunk)
-                    print(f"Отримано {received}/{model_size} байт")
-                except socket.timeout:
-                    print("Таймаут при отриманні даних")
-                    return
-                except Exception as e:
-                    print(f"Помилка при отриманні даних: {e}")
-                    return
-
+        try:
+            received = recv_to_file(client_socket, model_path, model_size)
+        except socket.timeout:
+            print("Таймаут при отриманні даних")
+            return
+        except ConnectionError:
+            print("Потік раптово обірвався")
+            return
+        except Exception as e:
+            print(f"Помилка при отриманні даних: {e}")
+            return
 
         print(f"Модель збережено в {model_path} (розмір: {received} байт)")
         
         # Запускаємо оцінку в окремому потоці
         evaluation_thread = threading.Thread(
             target=evaluate_model_async,
-            args=(model_path, model_name),
+            args=(model_path, model_name, jit_compile, inference, drift_sample),
             daemon=True
         )
         evaluation_thread.start()
@@ -314,12 +439,24 @@ def handle_evaluation_request(client_socket):
             pass
 
 
-def start_evaluation_server(host='0.0.0.0', port=54321):
+def start_evaluation_server(host='0.0.0.0', port=54321, jit_compile=False, inference="float32", drift_sample=0):
     """Основна функція запуску сервера."""
     os.makedirs('evaluation_results', exist_ok=True)
     os.makedirs('testing_result', exist_ok=True)
 
 
+    # Готуємо тестовий набір один раз при старті сервера
+    try:
+        test_data.get()
+    except Exception as e:
+        print(f"Не вдалося підготувати тестові дані при старті: {e}")
+
+    # Конвертація int8-графа виконується один раз на процес - запускаємо її
+    # у фоні, щоб перша квантована оцінка не чекала на конвертер
+    if inference != "float32":
+        from core_ml_components.quantized_predictor import get_template
+        threading.Thread(target=get_template, daemon=True).start()
+
     # Запускаємо потік для обробки запитів пошуку
     discovery_thread = threading.Thread(target=handle_discovery_requests, daemon=True)
     discovery_thread.start()
@@ -336,7 +473,7 @@ def start_evaluation_server(host='0.0.0.0', port=54321):
         while True:
             client_socket, addr = server_socket.accept()
             print(f"Прийнято з'єднання від {addr}")
-            handler_thread = threading.Thread(target=handle_evaluation_request, args=(client_socket,))
+            handler_thread = threading.Thread(target=handle_evaluation_request, args=(client_socket, jit_compile, inference, drift_sample))
             handler_thread.start()
     except KeyboardInterrupt:
         print("\nЗавершення роботи сервера...")
@@ -348,4 +485,16 @@ def start_evaluation_server(host='0.0.0.0', port=54321):
 
 
 if __name__ == "__main__":
-    start_evaluation_server()
+    parser = argparse.ArgumentParser(description='Запуск сервера оцінки моделей')
+    parser.add_argument('--jit_compile', action='store_true',
+                        help='Компілювати інференс моделі через XLA')
+    parser.add_argument('--inference', type=str, choices=['float32', 'quantized', 'both'], default='float32',
+                        help='float32 - повна точність; quantized - швидка оцінка int8 TFLite-моделлю (граф '
+                             'конвертується один раз, для чекпоінта лише квантуються ваги); both - обидві моделі '
+                             'на всьому наборі з дрейфом int8 відносно float32')
+    parser.add_argument('--drift_sample', type=int, default=0,
+                        help='Кількість вікон для оцінки дрейфу відносно float32 в режимі quantized '
+                             '(0 - float32-модель не завантажується)')
+    args = parser.parse_args()
+
+    start_evaluation_server(jit_compile=args.jit_compile, inference=args.inference, drift_sample=args.drift_sample)
@@ -6,33 +6,79 @@ import time
 import argparse
 import tensorflow as tf
 import numpy as np
-import glob
 
 # Додаємо кореневу директорію проекту до PYTHONPATH
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from core_ml_components.signal_predictor import SignalPredictor
-from core_ml_components.util_functions import load_data, apply_moving_average, INPUT_SIZE, OUTPUT_SIZE, FEATURES
+from core_ml_components.model_artifact import load_predictor
+from core_ml_components.util_functions import (load_data, load_prepared_series, iterate_batches, make_window_dataset,
+                                               count_windows, series_from_windows,
+                                               apply_moving_average, INPUT_SIZE, OUTPUT_SIZE)
+from core_ml_components.data_cache import PreprocessedDataCache
+from core_ml_components.normalization_stats import load_shared_min_max, SHARED_STATS_PATH
+from core_ml_components.stream_reader import SensorLogTail
+from core_ml_components.recording_format import list_recordings
+from core_ml_components.early_stopping import LossPlateau
+from core_ml_components.batch_autotune import (autotune_batch_size, load_cached_batch_size, save_cached_batch_size,
+                                               machine_key)
+from core_ml_components.checkpoint_io import read_checkpoint
+from core_ml_components.weight_delta import DeltaCompressor, weight_delta, encode_delta, DELTA_EXTENSION
+from core_ml_components.socket_transfer import send_file, recv_to_file, recv_exact
+from core_ml_components.upload_protocol import (send_frame, recv_frame, upload_header, codec_for_path,
+                                                HELLO_COMMAND, HELLO_REPLY)
 
 class FederatedClient:
-    def __init__(self, server_host='localhost', server_port=2121, data_dir_num=1, max_rounds=10, local_epochs=5):
+    def __init__(self, server_host='localhost', server_port=2121, data_dir_num=1, max_rounds=10, local_epochs=5,
+                 data_cache_mb=256, input_pipeline="numpy", stats_path=None,
+                 preload_workers=0, stream_file=None, jit_compile=False,
+                 patience=0, min_delta=1e-4, max_local_epochs=None, batch_size=128, batch_memory_mb=512,
+                 model=None, upload="full", delta_compression="int8", topk_ratio=0.01, persist_models=False,
+                 protocol="v1", negotiation_timeout=2.0, normalization=None, data_cache=None):
         self.server_host = server_host
         self.server_port = server_port
         self.socket = None
+        # Протокол завантаження моделі: v1, v2 або auto (v2, якщо сервер його підтримує)
+        self.protocol = protocol
+        self.negotiation_timeout = negotiation_timeout
+        self.upload_protocol = 1
+        # Після таймауту узгодження HELLO_REPLY ще може надійти перед першою відповіддю сервера
+        self.late_hello_reply = False
         self.data_iteration = 1
         self.client_dir = f"./client{data_dir_num}"
         self.base_model_path = os.path.join(self.client_dir, "base_model/signal_predictor_model.ckpt")
         self.data_dir = os.path.join(self.client_dir, "data")
         self.base_model_loaded = os.path.exists(self.base_model_path)
+        # Отримані та перетреновані моделі - чекпоінти у файловій системі TF в пам'яті (ram://),
+        # на диск - лише з persist_models. Ваги все одно проходять через файл чекпоінта:
+        # ram:// прибирає лише запис на диск, а не серіалізацію, і не пришвидшує раунд
+        self.persist_models = persist_models
+        self.memory_dir = f"ram://client{data_dir_num}"
+        # Чекпоінт, ваги якого зараз у self.model (None - ваги змінені тренуванням)
+        self.restored_path = None
         self.data_dir_num = data_dir_num
         self.max_rounds = max_rounds
         self.current_round = 0
         self.local_epochs = local_epochs
+        # Адаптивна кількість епох: при patience > 0 тренування зупиняється на плато втрати
+        self.stopping = LossPlateau(max_local_epochs or local_epochs, patience=patience, min_delta=min_delta)
+        self.last_epochs_used = 0
+        self.input_pipeline = input_pipeline
+        # Розмір батчу: число або "auto" (автопідбір при першому раунді з кешем на машину)
+        self.batch_size = batch_size
+        self.batch_memory_mb = batch_memory_mb
+        self.jit_compile = jit_compile
+        # Передача моделі: full - повний чекпоінт, delta - стиснена різниця з отриманою моделлю
+        self.delta_compressor = None
+        if upload == "delta":
+            self.delta_compressor = DeltaCompressor(delta_compression, topk_ratio=topk_ratio)
+        # Після невдалої відправки дельти (наприклад, сервер не знайшов її базову модель)
+        # наступного раунду надсилається повний чекпоінт
+        self.full_upload_next = False
         
         # Підраховуємо кількість доступних файлів даних
-        self.available_data_files = sorted(glob.glob(os.path.join(self.data_dir, "data*.txt")))
+        self.available_data_files = list_recordings(self.data_dir)
         self.total_data_files = len(self.available_data_files)
-        if self.total_data_files == 0:
+        if self.total_data_files == 0 and not stream_file:
             raise Exception("Не знайдено файлів даних")
         
         # Визначаємо раунд, з якого почнеться повторне використання даних
@@ -47,12 +93,68 @@ class FederatedClient:
         os.makedirs(os.path.join(self.client_dir, "received_model"), exist_ok=True)
         os.makedirs(self.data_dir, exist_ok=True)
 
-        self.model = SignalPredictor()
-        self.model.model.build(input_shape=(None, INPUT_SIZE, FEATURES))
+        # Дисковий кеш підготовлених даних (0 - вимкнено); data_cache - готовий кеш,
+        # спільний для клієнтів з однією директорією даних
+        self.data_cache = data_cache
+        if data_cache is None and data_cache_mb > 0:
+            self.data_cache = PreprocessedDataCache(
+                os.path.join(self.client_dir, "preprocessed_cache"),
+                max_bytes=data_cache_mb * 1024 * 1024
+            )
+
+        # Параметри нормалізації завантажуються один раз за запуск; normalization -
+        # вже завантажені (min_vals, max_vals), спільні для клієнтів одного процесу
+        self.stats_path = stats_path or SHARED_STATS_PATH
+        if normalization is not None:
+            self.min_vals, self.max_vals = normalization
+        else:
+            self.min_vals, self.max_vals = self.load_normalization_params()
+
+        # Потоковий режим: тренування на нових відліках файлу, що доповнюється
+        self.log_tail = None
+        self.stream_windows = None
+        if stream_file:
+            self.log_tail = SensorLogTail(stream_file, self.min_vals, self.max_vals, INPUT_SIZE, OUTPUT_SIZE)
+            print(f"Потоковий режим: дані читаються з {stream_file}")
+
+        # Попередня підготовка всіх файлів даних у кеш, поза критичним шляхом раундів
+        if preload_workers > 0:
+            self.preload_data(preload_workers)
+
+        if model is not None:
+            # Спільна модель (симуляція в одному процесі): ваги встановлює власник моделі
+            self.model = model
+            return
+
+        # Попередньо трасована модель з артефакту (або нова, якщо артефакт відсутній)
+        self.model = load_predictor(jit_compile=jit_compile)
 
         if self.base_model_loaded:
             self.model.restore(self.base_model_path)
+            self.restored_path = self.base_model_path
+
+
+    def load_normalization_params(self):
+        """Завантаження спільних статистик нормалізації
 
+        Усі клієнти та сервер оцінки читають один файл stats_path (без нього -
+        успадковані federated_client/min_vals.npy та max_vals.npy). Сирі дані
+        не читаються: якщо параметрів немає, клієнт завершується з помилкою.
+        """
+        min_vals, max_vals = load_shared_min_max(self.stats_path)
+        print("Завантажено параметри нормалізації")
+        return min_vals, max_vals
+
+    def preload_data(self, workers):
+        """Паралельна підготовка всіх файлів з available_data_files у дисковий кеш"""
+        if self.data_cache is None:
+            print("Кеш даних вимкнено, попередня підготовка пропущена")
+            return
+        start_time = time.time()
+        ready = self.data_cache.warm(self.available_data_files, self.min_vals, self.max_vals,
+                                     input_size=INPUT_SIZE, workers=workers)
+        print(f"Підготовлено {ready}/{self.total_data_files} файлів даних за "
+              f"{time.time() - start_time:.2f} с (потоків: {workers})")
 
     def connect_to_server(self):
         """Підключення до сервера та відправка команди LISTEN_COMMANDS"""
@@ -62,6 +164,8 @@ class FederatedClient:
             self.socket.connect((self.server_host, self.server_port))
             print("Підключено до сервера")
 
+            self.upload_protocol = self.negotiate_protocol()
+
             # Перевіряємо наявність базової моделі
             if not self.base_model_loaded:
                 print("Базова модель не знайдена, завантажуємо...")
@@ -80,6 +184,47 @@ class FederatedClient:
             print(f"Помилка підключення до сервера: {e}")
             return False
 
+    def negotiate_protocol(self):
+        """Узгодження версії протоколу завантаження моделі
+
+        Сервер v1 не відповідає на HELLO_COMMAND, тому відсутність відповіді
+        протягом negotiation_timeout означає протокол v1.
+        """
+        if self.protocol == "v1":
+            return 1
+
+        self.socket.settimeout(self.negotiation_timeout)
+        try:
+            self.socket.sendall(f"{HELLO_COMMAND}\n".encode())
+            response = self.process_response(self.socket.recv(1024).decode())
+        except socket.timeout:
+            response = ""
+            self.late_hello_reply = True
+        finally:
+            self.socket.settimeout(None)
+
+        if response == HELLO_REPLY:
+            print("Сервер підтримує протокол v2: модель передається одним кадром")
+            return 2
+        if self.protocol == "v2":
+            raise Exception("Сервер не підтримує протокол v2")
+        print("Сервер не відповів на узгодження протоколу, використовуємо протокол v1")
+        return 1
+
+    def recv_response(self):
+        """Перша відповідь сервера після підключення без запізнілого HELLO_REPLY"""
+        response = self.socket.recv(1024).decode()
+        if self.late_hello_reply:
+            # Сервер відповідає по черзі, тож запізніле HELLO_REPLY може бути лише на початку
+            self.late_hello_reply = False
+            stripped = response.lstrip("\x00")
+            if stripped.startswith(HELLO_REPLY):
+                print("Отримано запізніле підтвердження протоколу v2, продовжуємо за протоколом v1")
+                response = stripped[len(HELLO_REPLY):]
+                if not response.strip("\x00\n "):
+                    response = self.socket.recv(1024).decode()
+        return response
+
     def download_base_model(self):
         """Завантаження базової моделі з сервера"""
         try:
@@ -87,7 +232,7 @@ class FederatedClient:
             self.socket.sendall(b"SEND_BASE_MODEL\n")
 
             # Очікуємо розмір файлу
-            response = self.socket.recv(1024).decode().strip()
+            response = self.recv_response().strip()
             if not response.isdigit():
                 raise Exception(f"Неочікувана відповідь сервера: {response}")
 
@@ -98,14 +243,7 @@ class FederatedClient:
             os.makedirs(os.path.dirname(self.base_model_path), exist_ok=True)
 
             # Завантажуємо файл
-            with open(self.base_model_path, 'wb') as f:
-                bytes_received = 0
-                while bytes_received < file_size:
-                    chunk = self.socket.recv(min(4096, file_size - bytes_received))
-                    if not chunk:
-                        raise Exception("З'єднання перервано під час завантаження моделі")
-                    f.write(chunk)
-                    bytes_received += len(chunk)
+            recv_to_file(self.socket, self.base_model_path, file_size)
 
             print(f"Базова модель завантажена: {self.base_model_path}")
             return True
@@ -133,63 +271,172 @@ class FederatedClient:
     def retrain_model(self):
         """Перетренування моделі на локальних даних"""
         try:
-            self.model.restore(self.base_model_path)
-            print(f"Ваги моделі завантажені: {self.base_model_path}")
+            # Отримана модель відновлюється одразу при отриманні; з диска читаємо лише базову
+            if self.restored_path != self.base_model_path:
+                self.model.restore(self.base_model_path)
+                print(f"Ваги моделі завантажені: {self.base_model_path}")
+            self.restored_path = None
+
+            self.train_local()
 
-            # Завантажуємо дані для тренування
+            # Зберігаємо перетреновану модель
+            checkpoint_path = self.model_path("retrained_model", f"model_client_{self.data_dir_num}.ckpt")
+            self.model.save(checkpoint_path)
+
+            print(f"Модель перетренована та збережена: {checkpoint_path}")
+            return checkpoint_path
+
+        except Exception as e:
+            print(f"Помилка перетренування моделі: {e}")
+            return None
+
+    def train_local(self):
+        """Локальне тренування поточних ваг self.model на наступній порції даних
+
+        Оновлює last_training_samples та last_epochs_used.
+
+        Returns:
+            float: середня втрата останньої епохи
+        """
+        # Завантажуємо дані для тренування
+        if self.log_tail is None:
             data_file = self.get_next_data_file()
             print(f"Використовуємо дані з файлу: {data_file}")
 
-            # Завантажуємо параметри нормалізації
-            try:
-                min_vals = np.load("common_data/min_vals.npy")
-                max_vals = np.load("common_data/max_vals.npy")
-                print("Завантажено параметри нормалізації")
-            except FileNotFoundError:
-                print("Параметри нормалізації не знайдено, будуть обчислені заново")
-                min_vals = None
-                max_vals = None
-
-            # Завантажуємо дані
-            train_X, train_Y = load_data(data_file, INPUT_SIZE, OUTPUT_SIZE, min_vals, max_vals)
+        # Параметри тренування
+        EPOCHS = self.stopping.max_epochs  # Максимальна кількість локальних епох
 
+        series = None
+        if self.input_pipeline == "graph":
+            # Епоха цілком виконується в графі (SignalPredictor.train_epoch)
+            if self.log_tail is not None:
+                series = series_from_windows(*self.read_stream_windows())
+            else:
+                series = load_prepared_series(data_file, INPUT_SIZE, self.min_vals, self.max_vals,
+                                              cache=self.data_cache)
+            train_series = tf.convert_to_tensor(np.asarray(series, dtype=np.float32))
+            self.last_training_samples = count_windows(len(series), INPUT_SIZE, OUTPUT_SIZE)
+        elif self.log_tail is not None:
+            train_X, train_Y = self.read_stream_windows()
+            self.last_training_samples = len(train_X)
+        elif self.input_pipeline == "tf_data":
+            # Вікна формуються tf.data на льоту з базового ряду
+            series = load_prepared_series(data_file, INPUT_SIZE, self.min_vals, self.max_vals,
+                                          cache=self.data_cache)
+            self.last_training_samples = count_windows(len(series), INPUT_SIZE, OUTPUT_SIZE)
+        else:
+            # Завантажуємо дані як view вікон; батчі збираються індексуванням
+            train_X, train_Y = load_data(data_file, INPUT_SIZE, OUTPUT_SIZE, self.min_vals, self.max_vals,
+                                         windowed=True, cache=self.data_cache)
             # Зберігаємо кількість навчальних прикладів для подальшого використання
             self.last_training_samples = len(train_X)
 
-            # Параметри тренування
-            BATCH_SIZE = 128
-            EPOCHS = self.local_epochs  # Використовуємо задану кількість локальних епох
-
-            print(f"Початок перетренування моделі... (локальні епохи: {EPOCHS})")
-            for epoch in range(EPOCHS):
+        BATCH_SIZE = self.batch_size
+        if BATCH_SIZE == "auto":
+            BATCH_SIZE = self.tune_batch_size(series if series is not None else series_from_windows(train_X, train_Y))
+        if self.log_tail is None and self.input_pipeline == "tf_data":
+            train_dataset = make_window_dataset(series, INPUT_SIZE, OUTPUT_SIZE, BATCH_SIZE)
+
+        print(f"Початок перетренування моделі... (локальні епохи: до {EPOCHS}, батч: {BATCH_SIZE})")
+        self.stopping.reset()
+        for epoch in range(EPOCHS):
+            if self.input_pipeline == "graph":
+                avg_loss = float(self.model.train_epoch(train_series, BATCH_SIZE))
+            else:
                 epoch_losses = []
-                # Створюємо батчі
-                indices = np.random.permutation(len(train_X))
-                for i in range(0, len(train_X), BATCH_SIZE):
-                    batch_indices = indices[i:min(i + BATCH_SIZE, len(train_X))]
-                    batch_X = train_X[batch_indices]
-                    batch_y = train_Y[batch_indices]
+                if self.log_tail is None and self.input_pipeline == "tf_data":
+                    batches = train_dataset
+                else:
+                    batches = iterate_batches(train_X, train_Y, BATCH_SIZE)
 
+                for batch_X, batch_y in batches:
                     # Тренуємо модель
                     train_result = self.model.train(x=batch_X, y=batch_y)
                     epoch_losses.append(train_result['loss'])
 
                 avg_loss = np.mean(epoch_losses)
-                print(f"Епоха {epoch + 1}/{EPOCHS}, Середня втрата: {avg_loss:.6f}")
-
-            # Зберігаємо перетреновану модель
-            checkpoint_path = os.path.join(self.client_dir, "retrained_model", f"model_client_{self.data_dir_num}.ckpt")
-            self.model.save(checkpoint_path)
+            print(f"Епоха {epoch + 1}/{EPOCHS}, Середня втрата: {avg_loss:.6f}")
 
-            print(f"Модель перетренована та збережена: {checkpoint_path}")
-            return checkpoint_path
+            if self.stopping.update(float(avg_loss)):
+                break
 
+        self.last_epochs_used = self.stopping.epochs
+        if self.stopping.stopped_early:
+            print(f"Втрата вийшла на плато: зупинка після {self.last_epochs_used} епох")
+        return float(avg_loss)
+
+    def tune_batch_size(self, series):
+        """Автопідбір розміру батчу на реальних даних клієнта з кешем на машину
+
+        Ваги та стан оптимізатора після пробних кроків відновлює autotune_batch_size.
+        """
+        key = machine_key(self.jit_compile)
+        batch_size = load_cached_batch_size(key)
+        if batch_size is None:
+            batch_size, results = autotune_batch_size(self.model, series, memory_budget_mb=self.batch_memory_mb)
+            if not results:
+                # Замало даних для вимірювання: не кешуємо, спробуємо в наступному раунді
+                print(f"Замало даних для автопідбору батчу, використовуємо {batch_size}")
+                return batch_size
+            save_cached_batch_size(key, batch_size, results)
+        print(f"Розмір батчу для цієї машини: {batch_size}")
+        self.batch_size = batch_size
+        return batch_size
+
+    def prepare_delta_upload(self, checkpoint_path):
+        """Стиснена дельта натренованих ваг відносно моделі, з якої почалось тренування
+
+        Returns:
+            str: шлях до файлу дельти або None у разі помилки
+        """
+        try:
+            base = read_checkpoint(self.base_model_path)
+            delta = weight_delta(read_checkpoint(checkpoint_path), base)
+            compressed = self.delta_compressor.compress(delta)
+            delta_path = os.path.splitext(checkpoint_path)[0] + DELTA_EXTENSION
+            payload = encode_delta(compressed, base, self.delta_compressor.method)
+            with tf.io.gfile.GFile(delta_path, "wb") as f:
+                f.write(payload)
+
+            full_size = tf.io.gfile.stat(checkpoint_path).length
+            delta_size = len(payload)
+            print(f"Дельта ({self.delta_compressor.method}): {delta_size} байт замість {full_size} "
+                  f"({full_size / delta_size:.1f}x)")
+            return delta_path
         except Exception as e:
-            print(f"Помилка перетренування моделі: {e}")
+            print(f"Помилка підготовки дельти ваг: {e}")
             return None
 
+    def model_path(self, subdir, filename):
+        """Шлях для чекпоінта раунду: у пам'яті (ram://) або на диску з persist_models"""
+        if self.persist_models:
+            return os.path.join(self.client_dir, subdir, filename)
+        return f"{self.memory_dir}/{subdir}/{filename}"
+
+    def read_stream_windows(self):
+        """Нові вікна з потокового файлу з моменту попереднього раунду
+
+        Якщо нових відліків немає, повторно використовуються вікна
+        попереднього раунду.
+        """
+        train_X, train_Y = self.log_tail.read_new_windows()
+        if len(train_X) > 0:
+            self.stream_windows = (train_X, train_Y)
+            print(f"Нових вікон у потоковому файлі: {len(train_X)} (усього відліків: {self.log_tail.total_samples})")
+            return train_X, train_Y
+        if self.stream_windows is None:
+            raise Exception("У потоковому файлі ще недостатньо даних для жодного вікна")
+        print("Нових даних у потоковому файлі немає, використовуємо вікна попереднього раунду")
+        return self.stream_windows
+
+    def upload_filename(self, model_path):
+        """Ім'я файлу моделі на сервері: до імені додається data_dir_num"""
+        return f"client_{self.data_dir_num}_{os.path.basename(model_path)}"
+
     def send_model_to_server(self, model_path):
         """Відправка перетренованої моделі на сервер"""
+        if self.upload_protocol == 2:
+            return self.send_model_frame(model_path)
         try:
             # Відправляємо команду SEND_MODEL
             self.socket.sendall(b"SEND_MODEL\n")
@@ -199,16 +446,21 @@ class FederatedClient:
             if response != "READY":
                 raise Exception(f"Неочікувана відповідь сервера: {response}")
 
-            # Модифікуємо ім'я файлу, додаючи data_dir_num
-            base_filename = os.path.basename(model_path)
-            filename = f"client_{self.data_dir_num}_{base_filename}"
+            filename = self.upload_filename(model_path)
             self.socket.sendall(f"{filename}\n".encode())
 
             response = self.process_response(self.socket.recv(1024).decode().strip())
             if response != "OK":
                 raise Exception(f"Неочікувана відповідь сервера: {response}")
 
-            file_size = os.path.getsize(model_path)
+            # Чекпоінт з пам'яті відправляється з буфера, з диска - через sendfile
+            payload = None
+            if model_path.startswith("ram://"):
+                with tf.io.gfile.GFile(model_path, "rb") as f:
+                    payload = f.read()
+                file_size = len(payload)
+            else:
+                file_size = os.path.getsize(model_path)
             print("Відправляємо розмір моделі")
             self.socket.sendall(f"FILE_SIZE:{file_size}\n".encode())
             print(f"Відправляємо команду FILE_SIZE:{file_size}")
@@ -221,26 +473,20 @@ class FederatedClient:
                 raise Exception(f"Неочікувана відповідь сервера: {response}")
 
             # Відправляємо файл
-            with open(model_path, 'rb') as f:
-                bytes_sent = 0
-                while bytes_sent < file_size:
-                    chunk = f.read(4096)
-                    if not chunk:
-                        break
-                    self.socket.sendall(chunk)
-                    bytes_sent += len(chunk)
-
-
+            if payload is not None:
+                self.socket.sendall(payload)
+            else:
+                send_file(self.socket, model_path)
 
             response = self.process_response(self.socket.recv(1024).decode().strip())
             if response != "OK":
                 raise Exception(f"Неочікувана відповідь сервера: {response}")
 
-            # Відправляємо кількість навчальних прикладів
+            # Відправляємо кількість навчальних прикладів та фактично використаних епох
             if not hasattr(self, 'last_training_samples'):
                 raise Exception("Не знайдено інформацію про кількість навчальних прикладів")
 
-            self.socket.sendall(f"DATA_COUNT:{self.last_training_samples}\n".encode())
+            self.socket.sendall(f"DATA_COUNT:{self.last_training_samples} EPOCHS:{self.last_epochs_used}\n".encode())
 
             # Очікуємо DATA_COUNT_RECEIVED
             response = self.process_response(self.socket.recv(1024).decode().strip())
@@ -254,6 +500,31 @@ class FederatedClient:
             print(f"Помилка відправки моделі на сервер: {e}")
             return False
 
+    def send_model_frame(self, model_path):
+        """Відправка моделі за протоколом v2: заголовок і вміст одним кадром, одне підтвердження"""
+        try:
+            if not hasattr(self, 'last_training_samples'):
+                raise Exception("Не знайдено інформацію про кількість навчальних прикладів")
+
+            header = upload_header(self.data_dir_num, self.upload_filename(model_path), self.last_training_samples,
+                                   self.last_epochs_used, self.current_round + 1, codec_for_path(model_path))
+            if model_path.startswith("ram://"):
+                with tf.io.gfile.GFile(model_path, "rb") as f:
+                    send_frame(self.socket, header, f.read())
+            else:
+                send_frame(self.socket, header, payload_path=model_path)
+
+            ack, _ = recv_frame(self.socket)
+            if ack.get("status") != "OK":
+                raise Exception(f"Сервер відхилив модель: {ack.get('message', ack)}")
+
+            print("Модель успішно відправлена на сервер")
+            return True
+
+        except Exception as e:
+            print(f"Помилка відправки моделі на сервер: {e}")
+            return False
+
     def ensure_base_model(self):
         """Перевіряє наявність базової моделі та завантажує її при необхідності"""
         if not self.base_model_loaded:
@@ -275,19 +546,21 @@ class FederatedClient:
             file_size = int(response)
             self.socket.sendall(b"OK\n")
 
-            # Створюємо директорію для нової моделі
-            new_model_path = os.path.join(self.client_dir, "received_model", f"model_{self.data_dir_num}.ckpt")
+            new_model_path = self.model_path("received_model", f"model_{self.data_dir_num}.ckpt")
 
             # Завантажуємо файл
-            with open(new_model_path, 'wb') as f:
-                bytes_received = 0
-                while bytes_received < file_size:
-                    chunk = self.socket.recv(min(4096, file_size - bytes_received))
-                    if not chunk:
-                        raise Exception("З'єднання перервано під час завантаження моделі")
-                    f.write(chunk)
-                    bytes_received += len(chunk)
-
+            if self.persist_models:
+                recv_to_file(self.socket, new_model_path, file_size)
+            else:
+                # Мета - не писати на диск, а не швидкість: файл у ram:// потрібен restore
+                # та як база для дельти, тож GFile однаково копіює буфер у свою пам'ять
+                with tf.io.gfile.GFile(new_model_path, "wb") as f:
+                    f.write(recv_exact(self.socket, file_size))
+
+            # Ваги відновлюються з цього чекпоінта за шляхом (не напряму з отриманих байтів)
+            # одразу, тому наступний retrain_model їх не перечитує
+            self.model.restore(new_model_path)
+            self.restored_path = new_model_path
             print(f"Нові ваги моделі завантажено: {new_model_path}")
 
             # Оновлюємо шлях до базової моделі
@@ -321,7 +594,7 @@ class FederatedClient:
                     break
 
                 # Очікуємо команду від сервера
-                command = self.process_response(self.socket.recv(1024).decode().strip())
+                command = self.process_response(self.recv_response().strip())
                 print("Отримана команда: ", command)
                 if command == "RETRAIN":
                     print(f"Отримано команду RETRAIN (раунд {self.current_round + 1}/{self.max_rounds})")
@@ -334,10 +607,21 @@ class FederatedClient:
                     model_path = self.retrain_model()
                     if not model_path:
                         continue
+                    if self.delta_compressor is not None and not self.full_upload_next:
+                        model_path = self.prepare_delta_upload(model_path)
+                        if not model_path:
+                            continue
 
-                    # Відправляємо модель на сервер
+                    # Відправляємо модель на сервер; похибка стиснення дельти враховується
+                    # лише для завантаження, яке сервер підтвердив
                     if not self.send_model_to_server(model_path):
+                        if self.delta_compressor is not None:
+                            self.delta_compressor.discard()
+                            self.full_upload_next = True
                         continue
+                    if self.delta_compressor is not None:
+                        self.delta_compressor.commit()
+                    self.full_upload_next = False
 
                     if not self.receive_and_restore_model():
                         print("Помилка отримання та відновлення моделі")
@@ -361,7 +645,55 @@ if __name__ == "__main__":
     parser.add_argument('--data_dir', type=int, default=1, help='Номер директорії даних')
     parser.add_argument('--rounds', type=int, default=10, help='Максимальна кількість раундів навчання')
     parser.add_argument('--local_epochs', type=int, default=5, help='Кількість локальних епох тренування')
+    parser.add_argument('--patience', type=int, default=0,
+                        help='Зупинка після стількох епох без покращення втрати (0 - фіксована кількість епох)')
+    parser.add_argument('--min_delta', type=float, default=1e-4,
+                        help='Мінімальне зменшення втрати, яке вважається покращенням')
+    parser.add_argument('--max_local_epochs', type=int, default=None,
+                        help='Максимальна кількість локальних епох в адаптивному режимі (за замовчуванням --local_epochs)')
+    parser.add_argument('--data_cache_mb', type=int, default=256,
+                        help='Максимальний розмір кешу підготовлених даних у МБ (0 - вимкнути кеш)')
+    parser.add_argument('--stats_file', type=str, default=None,
+                        help='Спільний файл статистик нормалізації (за замовчуванням common_data/normalization_stats.json у корені проекту)')
+    parser.add_argument('--preload_workers', type=int, default=0,
+                        help='Кількість потоків для попередньої підготовки всіх файлів даних (0 - вимкнено)')
+    parser.add_argument('--stream_file', type=str, default=None,
+                        help='Файл запису, що доповнюється; кожен раунд тренується лише на нових відліках')
+    parser.add_argument('--input_pipeline', type=str, choices=['numpy', 'graph', 'tf_data'], default='numpy',
+                        help='Конвеєр вхідних даних: numpy (батчі з view вікон), graph (ціла епоха в одному '
+                             'виклику графа, експериментально) або tf_data (tf.data з prefetch)')
+    parser.add_argument('--batch_size', type=str, default='128',
+                        help='Розмір батчу або auto (автопідбір за швидкістю тренування, кешується для машини)')
+    parser.add_argument('--batch_memory_mb', type=int, default=512,
+                        help='Бюджет пам\'яті на крок тренування для автопідбору батчу, МБ')
+    parser.add_argument('--jit_compile', action='store_true',
+                        help='Компілювати кроки тренування та інференсу через XLA')
+    parser.add_argument('--upload', type=str, choices=['full', 'delta'], default='full',
+                        help='Передача моделі: full (повний чекпоінт) або delta (стиснена різниця з отриманою моделлю)')
+    parser.add_argument('--delta_compression', type=str, choices=['topk', 'int8'], default='int8',
+                        help='Стиснення дельти: int8 (квантування, майже без втрати якості) або topk '
+                             '(найбільші за модулем значення; з малим --topk_ratio помітно погіршує модель)')
+    parser.add_argument('--topk_ratio', type=float, default=0.01,
+                        help='Частка значень кожного тензора, що передаються при стисненні topk')
+    parser.add_argument('--persist_models', action='store_true',
+                        help='Зберігати отримані та перетреновані моделі кожного раунду на диск '
+                             '(за замовчуванням - чекпоінти у файловій системі TF в пам\'яті, ram://)')
+    parser.add_argument('--protocol', type=str, choices=['v1', 'v2', 'auto'], default='v1',
+                        help='Протокол завантаження моделі: v1, v2 (сервер coordinator.py) або auto '
+                             '(спроба v2 з поверненням до v1 після таймауту)')
     args = parser.parse_args()
-
-    client = FederatedClient(data_dir_num=args.data_dir, max_rounds=args.rounds, local_epochs=args.local_epochs)
+    if args.batch_size != 'auto':
+        if not args.batch_size.isdigit() or int(args.batch_size) < 1:
+            parser.error("--batch_size має бути додатним числом або auto")
+        args.batch_size = int(args.batch_size)
+
+    client = FederatedClient(data_dir_num=args.data_dir, max_rounds=args.rounds, local_epochs=args.local_epochs,
+                             data_cache_mb=args.data_cache_mb, input_pipeline=args.input_pipeline,
+                             stats_path=args.stats_file, preload_workers=args.preload_workers,
+                             stream_file=args.stream_file, jit_compile=args.jit_compile,
+                             patience=args.patience, min_delta=args.min_delta,
+                             max_local_epochs=args.max_local_epochs, batch_size=args.batch_size,
+                             batch_memory_mb=args.batch_memory_mb, upload=args.upload,
+                             delta_compression=args.delta_compression, topk_ratio=args.topk_ratio,
+                             persist_models=args.persist_models, protocol=args.protocol)
     client.run()
\ No newline at end of file
@@ -0,0 +1,276 @@
+"""Симуляція багатьох федеративних клієнтів в одному процесі
+
+Логічні клієнти - це FederatedClient без власної моделі: вони ділять один
+рантайм TensorFlow та одну модель SignalPredictor (один граф і трасовані
+функції). Тренування через неї серіалізується: клієнт отримує модель,
+в неї записуються глобальні ваги (та стан оптимізатора цього клієнта),
+після train_local ваги зчитуються назад. --workers паралелізує лише
+підготовку даних: поки модель зайнята, інші потоки готують наступний
+файл даних своїх клієнтів у кеш, а тренування завжди йде по одному
+клієнту. Агрегація виконується в цьому ж процесі функціями
+aggregation_script, тому сервер координатора та сокети не потрібні.
+
+Логічні клієнти по черзі розподіляються між директоріями client*/data;
+клієнти однієї директорії починають з різних файлів даних і ділять
+один дисковий кеш. Параметри нормалізації завантажуються один раз.
+
+Запуск з директорії federated_client:
+    python simulation.py --clients 200 --rounds 5 --workers 2
+"""
+import os
+import sys
+import glob
+import time
+import random
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import psutil
+
+# Додаємо кореневу директорію проекту до PYTHONPATH
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from federated_client import FederatedClient
+from core_ml_components.signal_predictor import SignalPredictor
+from core_ml_components.data_cache import PreprocessedDataCache
+from core_ml_components.normalization_stats import load_shared_min_max, SHARED_STATS_PATH
+from server_components.aggregation_script import (aggregate_weights_weighted, aggregate_weights_async,
+                                                  epoch_weighted_counts)
+
+
+class SharedModel:
+    """Одна модель для всіх логічних клієнтів; тренує одного клієнта за раз"""
+
+    def __init__(self, jit_compile=False):
+        self.model = SignalPredictor(jit_compile=jit_compile)
+        # Змінні оптимізатора створюються одразу, щоб їх можна було підміняти між клієнтами
+        self.model.model.optimizer.build(self.model.model.trainable_variables)
+        self.lock = threading.Lock()
+        # Початковий стан оптимізатора (моменти нульові, лічильник кроків 0)
+        self.initial_optimizer_state = optimizer_state(self.model)
+
+    def acquire(self):
+        self.lock.acquire()
+        return self.model
+
+    def release(self, model):
+        self.lock.release()
+
+
+def optimizer_state(model):
+    return [variable.numpy() for variable in model.model.optimizer.variables]
+
+
+def set_optimizer_state(model, state):
+    for variable, value in zip(model.model.optimizer.variables, state):
+        variable.assign(value)
+
+
+def warm_next_file(client):
+    """Підготовка наступного файлу даних клієнта в кеш, поки модель зайнята іншим клієнтом"""
+    if client.data_cache is None or client.log_tail is not None or not client.available_data_files:
+        return
+    next_file = client.available_data_files[(client.data_iteration - 1) % len(client.available_data_files)]
+    client.data_cache.warm([next_file], client.min_vals, client.max_vals)
+
+
+def as_named(weights):
+    """Список ваг у вигляді словника для функцій агрегації (ключ - позиція ваги в моделі)"""
+    return dict(enumerate(weights))
+
+
+class ClientSimulation:
+    """Раунди федеративного навчання для логічних клієнтів в одному процесі
+
+    sync: усі вибрані клієнти раунду стартують з однієї глобальної моделі,
+    після чого ваги усереднюються зважено за кількістю даних.
+    async: клієнт бере поточну глобальну модель на момент початку
+    тренування, а його результат одразу змішується з глобальною моделлю
+    (w = (1 - alpha) * w + alpha * w_k), тому застарілість моделей виникає
+    природно, бо клієнти тренуються по черзі.
+    """
+
+    def __init__(self, num_clients, workers=1, aggregation_type="sync", alpha=0.1, epoch_weighting=False,
+                 clients_per_round=None, keep_optimizer_state=True, initial_model=None, output_dir=None,
+                 seed=0, jit_compile=False, **client_kwargs):
+        self.aggregation_type = aggregation_type
+        self.alpha = alpha
+        self.epoch_weighting = epoch_weighting
+        self.clients_per_round = clients_per_round or num_clients
+        self.keep_optimizer_state = keep_optimizer_state
+        self.output_dir = output_dir
+        self.rng = random.Random(seed)
+        self.pool = SharedModel(jit_compile=jit_compile)
+        self.workers = workers
+
+        data_dirs = sorted(int(path[len("./client"):]) for path in glob.glob("./client*")
+                           if path[len("./client"):].isdigit() and os.path.isdir(os.path.join(path, "data")))
+        if not data_dirs:
+            raise Exception("Не знайдено директорій клієнтів з даними")
+
+        normalization = load_shared_min_max(client_kwargs.get("stats_path") or SHARED_STATS_PATH)
+        data_cache_mb = client_kwargs.pop("data_cache_mb", 256)
+        data_caches = {}
+        for data_dir_num in data_dirs:
+            if data_cache_mb > 0:
+                data_caches[data_dir_num] = PreprocessedDataCache(
+                    os.path.join(f"./client{data_dir_num}", "preprocessed_cache"),
+                    max_bytes=data_cache_mb * 1024 * 1024
+                )
+
+        self.clients = {}
+        for client_id in range(1, num_clients + 1):
+            data_dir_num = data_dirs[(client_id - 1) % len(data_dirs)]
+            client = FederatedClient(data_dir_num=data_dir_num, jit_compile=jit_compile,
+                                     model=self.pool.model, normalization=normalization,
+                                     data_cache=data_caches.get(data_dir_num), data_cache_mb=data_cache_mb,
+                                     **client_kwargs)
+            # Клієнти однієї директорії починають з різних файлів
+            client.data_iteration = (client_id - 1) // len(data_dirs) % max(client.total_data_files, 1) + 1
+            self.clients[client_id] = client
+        self.optimizer_states = {}
+
+        model = self.pool.acquire()
+        if initial_model:
+            model.restore(initial_model)
+            print(f"Початкова глобальна модель: {initial_model}")
+        self.global_weights = model.model.get_weights()
+        self.global_lock = threading.Lock()
+        self.pool.release(model)
+
+    def train_client(self, client_id, start_weights=None):
+        """Локальне тренування клієнта на спільній моделі
+
+        Returns:
+            tuple: (client_id, ваги, кількість даних, використані епохи, втрата)
+        """
+        client = self.clients[client_id]
+        warm_next_file(client)
+        model = self.pool.acquire()
+        try:
+            if start_weights is None:
+                with self.global_lock:
+                    start_weights = self.global_weights
+            model.model.set_weights(start_weights)
+            if self.keep_optimizer_state and client_id in self.optimizer_states:
+                set_optimizer_state(model, self.optimizer_states[client_id])
+            else:
+                set_optimizer_state(model, self.pool.initial_optimizer_state)
+
+            client.model = model
+            loss = client.train_local()
+
+            weights = model.model.get_weights()
+            if self.keep_optimizer_state:
+                self.optimizer_states[client_id] = optimizer_state(model)
+            return client_id, weights, client.last_training_samples, client.last_epochs_used, loss
+        finally:
+            self.pool.release(model)
+
+    def run_round(self, round_number):
+        selected = sorted(self.rng.sample(list(self.clients), self.clients_per_round))
+        start_time = time.time()
+        results = []
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            if self.aggregation_type == "sync":
+                futures = [executor.submit(self.train_client, client_id, self.global_weights)
+                           for client_id in selected]
+            else:
+                futures = [executor.submit(self.train_client, client_id) for client_id in selected]
+
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"Помилка локального тренування: {e}")
+                    continue
+                results.append(result)
+                if self.aggregation_type == "async":
+                    with self.global_lock:
+                        aggregated = aggregate_weights_async([as_named(result[1])], as_named(self.global_weights),
+                                                             self.alpha)
+                        self.global_weights = [aggregated[i] for i in range(len(self.global_weights))]
+
+        if self.aggregation_type == "sync" and results:
+            data_counts = [result[2] for result in results]
+            if self.epoch_weighting:
+                data_counts = epoch_weighted_counts(data_counts, [result[3] for result in results])
+            if sum(data_counts) > 0:
+                aggregated = aggregate_weights_weighted([as_named(result[1]) for result in results], data_counts)
+                self.global_weights = [aggregated[i] for i in range(len(self.global_weights))]
+            else:
+                print("Жоден клієнт не мав даних для тренування, глобальна модель не змінилась")
+
+        samples = sum(result[2] for result in results)
+        mean_loss = (sum(result[4] * result[2] for result in results) / samples) if samples else float("nan")
+        print(f"Раунд {round_number}: клієнтів {len(results)}/{len(selected)}, прикладів {samples}, "
+              f"зважена втрата {mean_loss:.6f}, час {time.time() - start_time:.2f} с")
+
+        if self.output_dir:
+            self.save_global_model(os.path.join(self.output_dir, f"global_model_{round_number}.ckpt"))
+
+    def save_global_model(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        model = self.pool.acquire()
+        try:
+            model.model.set_weights(self.global_weights)
+            model.save(path)
+            print(f"Глобальна модель збережена: {path}")
+        finally:
+            self.pool.release(model)
+
+    def run(self, rounds):
+        for round_number in range(1, rounds + 1):
+            self.run_round(round_number)
+        rss_mb = psutil.Process().memory_info().rss / (1024 * 1024)
+        print(f"Симуляцію завершено: {len(self.clients)} клієнтів, {self.workers} воркерів, "
+              f"RSS процесу {rss_mb:.0f} МБ")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Симуляція федеративних клієнтів в одному процесі')
+    parser.add_argument('--clients', type=int, default=20, help='Кількість логічних клієнтів')
+    parser.add_argument('--clients_per_round', type=int, default=None,
+                        help='Кількість клієнтів, вибраних у кожному раунді (за замовчуванням усі)')
+    parser.add_argument('--rounds', type=int, default=10, help='Кількість раундів')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Кількість потоків клієнтів. Паралелізує лише підготовку даних: модель одна '
+                             'і тренує одного клієнта за раз, інші потоки тим часом готують дані наступних клієнтів')
+    parser.add_argument('--aggregation_type', type=str, choices=['sync', 'async'], default='sync',
+                        help='Тип агрегації: sync (зважене середнє) або async (змішування з alpha)')
+    parser.add_argument('--alpha', type=float, default=0.1, help='ALPHA для асинхронної агрегації')
+    parser.add_argument('--epoch_weighting', action='store_true',
+                        help='Синхронна агрегація зважує клієнтів за кількістю даних x використані епохи')
+    parser.add_argument('--local_epochs', type=int, default=5, help='Кількість локальних епох тренування')
+    parser.add_argument('--patience', type=int, default=0,
+                        help='Зупинка після стількох епох без покращення втрати (0 - фіксована кількість епох)')
+    parser.add_argument('--batch_size', type=int, default=128, help='Розмір батчу')
+    parser.add_argument('--input_pipeline', type=str, choices=['numpy', 'graph', 'tf_data'], default='numpy',
+                        help='Конвеєр вхідних даних клієнтів')
+    parser.add_argument('--reset_optimizer', action='store_true',
+                        help='Не зберігати стан оптимізатора кожного клієнта між раундами (економія пам\'яті)')
+    parser.add_argument('--initial_model', type=str, default=None, help='Чекпоінт початкової глобальної моделі')
+    parser.add_argument('--output_dir', type=str, default=None,
+                        help='Директорія для глобальних моделей після кожного раунду')
+    parser.add_argument('--seed', type=int, default=0, help='Зерно вибору клієнтів раунду')
+    parser.add_argument('--jit_compile', action='store_true', help='Компілювати кроки моделі через XLA')
+    args = parser.parse_args()
+    if args.clients < 1 or args.workers < 1:
+        parser.error("--clients та --workers мають бути більше 0")
+    if args.clients_per_round is not None and not 0 < args.clients_per_round <= args.clients:
+        parser.error("--clients_per_round має бути в діапазоні [1, --clients]")
+
+    simulation = ClientSimulation(args.clients, workers=args.workers, aggregation_type=args.aggregation_type,
+                                  alpha=args.alpha, epoch_weighting=args.epoch_weighting,
+                                  clients_per_round=args.clients_per_round,
+                                  keep_optimizer_state=not args.reset_optimizer,
+                                  initial_model=args.initial_model, output_dir=args.output_dir, seed=args.seed,
+                                  jit_compile=args.jit_compile, max_rounds=args.rounds,
+                                  local_epochs=args.local_epochs, patience=args.patience,
+                                  batch_size=args.batch_size, input_pipeline=args.input_pipeline)
+    simulation.run(args.rounds)
+
+
+if __name__ == "__main__":
+    main()
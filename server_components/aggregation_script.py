@@ -1,17 +1,13 @@
+import io
 import os
 import sys
+import uuid
 import socket
 import json
 import argparse
 import numpy as np
 import tensorflow as tf
-import pickle
-import pandas as pd
-import gc
 import time
-import matplotlib.pyplot as plt
-from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
-import seaborn as sns
 import threading
 from datetime import datetime
 import struct
@@ -19,10 +15,19 @@ import struct
 # Додаємо кореневу директорію проекту до PYTHONPATH
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from core_ml_components.signal_predictor import SignalPredictor
-from core_ml_components.util_functions import load_and_prepare_test_data
+from core_ml_components.checkpoint_io import read_checkpoint, write_checkpoint, model_tensors, check_compatible
+from core_ml_components.weight_delta import read_delta, apply_delta, tensors_digest, DELTA_EXTENSION
+from core_ml_components.socket_transfer import send_file
 
 ALPHA = 0.1
+MODEL_DIR = "./aggregation_models"
+GLOBAL_MODEL_DIR = "./global_model"
+BASE_MODEL_PATH = "./base_model/big_global_model_weights.ckpt"
+# Скільки останніх глобальних моделей (крім базової) можуть бути базою дельти клієнта
+MAX_BASE_MODELS = 8
+# Спроби агрегації, якщо глобальну модель змінив інший процес
+AGGREGATION_ATTEMPTS = 3
+
 # Додаємо парсер аргументів командного рядка
 def parse_args():
     parser = argparse.ArgumentParser(description='Сервер агрегації моделей')
@@ -34,6 +39,9 @@ def parse_args():
                       help='Значення ALPHA для асинхронної агрегації (в діапазоні (0, 1])')
     parser.add_argument('--evaluation_server_ip', type=str, default='127.0.0.1',
                       help='IP-адреса сервера оцінки')
+    parser.add_argument('--epoch_weighting', action='store_true',
+                      help='Синхронна агрегація зважує моделі за кількістю оброблених прикладів '
+                           '(кількість даних x фактично використані локальні епохи)')
     return parser.parse_args()
 
 
@@ -43,11 +51,67 @@ def mean_absolute_percentage_error(y_true, y_pred):
     mape = np.mean(np.abs((y_true[mask] - y_pred[mask]) / y_true[mask])) * 100
     return mape
 
-def load_weights(model_dir, buffer_size=1):
-    """Завантаження ваг моделі з директорії з обмеженням кількості моделей"""
-    weight_files = [f for f in os.listdir(model_dir) if f.endswith('.ckpt')]
+# Кеш відбитків моделей-кандидатів на базу дельт: {шлях: (mtime, відбиток)}
+model_digests = {}
+
+
+def find_model_by_digest(digest, candidate_paths):
+    """Ваги моделі з candidate_paths, відбиток якої дорівнює digest, або None"""
+    for path in candidate_paths:
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            continue
+        cached = model_digests.get(path)
+        if cached is not None and cached[0] == mtime:
+            if cached[1] == digest:
+                return read_checkpoint(path)
+            continue
+        tensors = read_checkpoint(path)
+        model_digests[path] = (mtime, tensors_digest(tensors))
+        if model_digests[path][1] == digest:
+            return tensors
+    return None
+
+
+def restore_delta(base_digest, delta, base_models):
+    """Повні ваги з дельти: базова модель шукається за відбитком серед base_models"""
+    base = find_model_by_digest(base_digest, base_models)
+    if base is None:
+        raise Exception(f"базову модель дельти {base_digest[:12]} не знайдено")
+    return apply_delta(base, delta)
+
+
+def read_upload(payload, codec, base_models=()):
+    """Ваги з вмісту завантаження клієнта в пам'яті, без запису в MODEL_DIR
+
+    Args:
+        payload: вміст файлу моделі (bytes)
+        codec: "checkpoint" (чекпоінт) або "delta" (стиснена дельта)
+    """
+    if codec == "delta":
+        return restore_delta(*read_delta(io.BytesIO(payload)), base_models)
+    # Чекпоінт читається засобами TF, тому тимчасово записується у файлову систему в пам'яті
+    checkpoint_path = f"ram://uploads/{uuid.uuid4().hex}.ckpt"
+    with tf.io.gfile.GFile(checkpoint_path, "wb") as f:
+        f.write(payload)
+    try:
+        return read_checkpoint(checkpoint_path)
+    finally:
+        tf.io.gfile.remove(checkpoint_path)
+
+
+def load_weights(model_dir, buffer_size=1, base_models=()):
+    """Завантаження ваг моделей з директорії з обмеженням кількості моделей
+
+    Ваги зчитуються напряму з чекпоінтів у словники {ім'я тензора: np.ndarray},
+    без створення моделей. Для файлів дельт (DELTA_EXTENSION) повні ваги
+    відновлюються з базової моделі, яка шукається за відбитком серед
+    base_models (шляхи до чекпоінтів, від найновішого).
+    """
+    weight_files = [f for f in os.listdir(model_dir) if f.endswith('.ckpt') or f.endswith(DELTA_EXTENSION)]
     if not weight_files:
-        return None, None
+        return None, None, None
 
     # Обмежуємо кількість файлів для завантаження
     weight_files = weight_files[:buffer_size]
@@ -55,15 +119,20 @@ def load_weights(model_dir, buffer_size=1):
 
     models = []
     data_counts = []
+    local_epochs = []
 
     for weight_file in weight_files:
-        model = SignalPredictor()
         weight_path = os.path.join(model_dir, weight_file)
 
         # Завантаження ваг
         try:
-            model.restore(weight_path)
-            models.append(model)
+            if weight_file.endswith(DELTA_EXTENSION):
+                weights = restore_delta(*read_delta(weight_path), base_models)
+            else:
+                weights = read_checkpoint(weight_path)
+            if models:
+                check_compatible(models[0], weights)
+            models.append(weights)
             print(f"Ваги {weight_file} завантажено")
         except Exception as e:
             print(f"Помилка завантаження ваг з {weight_file}: {e}")
@@ -71,7 +140,7 @@ def load_weights(model_dir, buffer_size=1):
             continue
 
         # Зчитування кількості даних з відповідного файлу
-        data_count_file = weight_file.replace('.ckpt', '_data_count.txt')
+        data_count_file = os.path.splitext(weight_file)[0] + '_data_count.txt'
         data_count_path = os.path.join(model_dir, data_count_file)
         count = 0 # Значення за замовчуванням, якщо файл не знайдено або помилка
         if os.path.exists(data_count_path):
@@ -91,6 +160,21 @@ def load_weights(model_dir, buffer_size=1):
 
         data_counts.append(count)
 
+        # Фактична кількість локальних епох (0 - клієнт її не повідомив)
+        epochs_path = os.path.join(model_dir, os.path.splitext(weight_file)[0] + '_epochs.txt')
+        epochs = 0
+        if os.path.exists(epochs_path):
+            try:
+                with open(epochs_path, 'r') as f:
+                    epochs_str = f.read().strip()
+                    if epochs_str:
+                        epochs = int(epochs_str)
+                print(f"Локальних епох {epochs} зчитано з {os.path.basename(epochs_path)}")
+                os.remove(epochs_path)
+            except Exception as e:
+                print(f"Помилка зчитування або видалення файлу {epochs_path}: {e}")
+        local_epochs.append(epochs)
+
         # Видалення файлів ваг після завантаження (зроблю це після обробки data_count_file)
         try:
             os.remove(weight_path)
@@ -103,7 +187,18 @@ def load_weights(model_dir, buffer_size=1):
         print("Попередження: Кількість завантажених моделей і кількість зчитаних значень даних не збігається!")
         # Можливо, тут потрібна додаткова логіка для обробки цієї ситуації
 
-    return models, data_counts
+    return models, data_counts, local_epochs
+
+def epoch_weighted_counts(data_counts, local_epochs):
+    """Кількість оброблених прикладів кожним клієнтом (дані x епохи)
+
+    Якщо хоча б один клієнт не повідомив кількість епох, повертаються
+    звичайні кількості даних.
+    """
+    if not local_epochs or min(local_epochs) <= 0:
+        print("Кількість локальних епох відома не для всіх моделей, зважуємо лише за кількістю даних")
+        return data_counts
+    return [count * epochs for count, epochs in zip(data_counts, local_epochs)]
 
 def aggregate_weights_weighted(models, data_counts):
     """Агрегація ваг моделей з використанням зваженого середнього"""
@@ -113,25 +208,15 @@ def aggregate_weights_weighted(models, data_counts):
     total_data_count = sum(data_counts)
     data_weights = np.array(data_counts) / total_data_count
 
-    # Створюємо нову модель для агрегованих ваг
-    aggregated_model = SignalPredictor()
-
-    # Отримуємо ваги всіх моделей
-    model_weights = [model.model.get_weights() for model in models]
-
-    # Агрегуємо ваги
-    aggregated_weights = []
-    for layer_idx in range(len(model_weights[0])):
-        weighted_sum = sum(model_weights[j][layer_idx] * data_weights[j]
-                         for j in range(len(models)))
-        aggregated_weights.append(weighted_sum)
+    # Агрегуємо ваги потензорно за іменами
+    aggregated_weights = {}
+    for name, reference in models[0].items():
+        weighted_sum = sum(models[j][name] * data_weights[j] for j in range(len(models)))
+        aggregated_weights[name] = weighted_sum.astype(reference.dtype)
 
-    # Встановлюємо агреговані ваги
-    aggregated_model.model.set_weights(aggregated_weights)
+    return aggregated_weights
 
-    return aggregated_model
-
-def aggregate_weights_async(models, global_model, alpha=None):
+def aggregate_weights_async(models, global_weights, alpha=None):
     """Агрегація ваг моделей з використанням асинхронного навчання"""
     if not models:
         return None
@@ -140,37 +225,42 @@ def aggregate_weights_async(models, global_model, alpha=None):
     if alpha is None:
         alpha = ALPHA
 
-    # Створюємо нову модель для агрегованих ваг
-    aggregated_model = SignalPredictor()
-
-    # Отримуємо ваги глобальної моделі
-    global_weights = global_model.model.get_weights()
-
-    # Отримуємо ваги локальних моделей
-    local_weights = [model.model.get_weights() for model in models]
+    check_compatible(global_weights, models[0])
 
     # Агрегуємо ваги за формулою: w_global(t+1) = (1-α)w_global(t) + αw_k
-    aggregated_weights = []
-    for layer_idx in range(len(global_weights)):
+    aggregated_weights = {}
+    for name, global_value in global_weights.items():
         # Беремо середнє значення локальних моделей
-        local_avg = np.mean([weights[layer_idx] for weights in local_weights], axis=0)
+        local_avg = np.mean([weights[name] for weights in models], axis=0)
         # Застосовуємо формулу асинхронної агрегації
-        weighted_sum = (1 - alpha) * global_weights[layer_idx] + alpha * local_avg
-        aggregated_weights.append(weighted_sum)
-
-    # Встановлюємо агреговані ваги
-    aggregated_model.model.set_weights(aggregated_weights)
-
-    return aggregated_model
-
-def save_model(model, model_dir):
-    """Збереження моделі"""
+        weighted_sum = (1 - alpha) * global_value + alpha * local_avg
+        aggregated_weights[name] = weighted_sum.astype(global_value.dtype)
+
+    return aggregated_weights
+
+def aggregate_models(models, data_counts, local_epochs, global_model, aggregation_type='sync', alpha=None,
+                     epoch_weighting=False):
+    """Нова глобальна модель з моделей клієнтів обраним типом агрегації"""
+    print(f"Локальні епохи моделей: {local_epochs}")
+    if aggregation_type == 'sync':
+        if epoch_weighting:
+            data_counts = epoch_weighted_counts(data_counts, local_epochs)
+        return aggregate_weights_weighted(models, data_counts)
+    return aggregate_weights_async(models, global_model, alpha=alpha)
+
+def save_model(model, model_dir, index=None):
+    """Збереження агрегованих ваг у чекпоінт global_model_<index>.ckpt
+
+    Без index номер визначається за кількістю збережених моделей.
+    """
     if model:
         os.makedirs(model_dir, exist_ok=True)
-        existing_models = [f for f in os.listdir(model_dir) if f.startswith("global_model_") and f.endswith(".ckpt")]
-        new_index = len(existing_models) + 1
+        new_index = index
+        if new_index is None:
+            existing_models = [f for f in os.listdir(model_dir) if f.startswith("global_model_") and f.endswith(".ckpt")]
+            new_index = len(existing_models) + 1
         save_path = os.path.join(model_dir, f"global_model_{new_index}.ckpt")
-        model.save(save_path)
+        write_checkpoint(save_path, model)
         print(f"Агрегована модель збережена в {save_path}")
         return save_path
 
@@ -202,14 +292,8 @@ def trigger_remote_evaluation(model_path, host=None, port=54321):
             file_size = os.path.getsize(model_path)
             s.sendall(struct.pack('>Q', file_size))
 
-            # Надсилаємо файл частинами
-            with open(model_path, 'rb') as f:
-                while True:
-                    bytes_read = f.read(4096)
-                    if not bytes_read:
-                        break
-                    s.sendall(bytes_read)
-
+            # Надсилаємо файл
+            send_file(s, model_path)
 
             # Очікуємо підтвердження отримання файлу
             response = s.recv(1024).decode().strip()
@@ -230,66 +314,194 @@ def trigger_remote_evaluation(model_path, host=None, port=54321):
         print(f"Помилка при відправці моделі на сервер оцінки: {e}")
 
 
-global_model = SignalPredictor()
+def initial_global_weights():
+    """Випадкові початкові ваги, якщо немає жодного збереженого чекпоінта"""
+    from core_ml_components.signal_predictor import SignalPredictor
+    return model_tensors(SignalPredictor())
 
 
-def handle_client_connection(client_socket, args):
-    """Обробка підключення клієнта"""
-    MODEL_DIR = "./aggregation_models"
-    GLOBAL_MODEL_DIR = "./global_model"
-    BASE_MODEL_PATH = "./base_model/big_global_model_weights.ckpt"
+def global_model_number(filename):
+    """Номер global_model_<n>.ckpt (-1, якщо ім'я не містить номера)"""
+    try:
+        # Видаляємо 'global_model_' з початку та '.ckpt' з кінця, щоб отримати номер
+        return int(filename.replace('global_model_', '').replace('.ckpt', ''))
+    except ValueError:
+        return -1
 
-    global_model_loaded = False
 
-    # Спочатку перевіряємо наявність агрегованих моделей
-    existing_models = [f for f in os.listdir(GLOBAL_MODEL_DIR) if f.startswith("global_model_") and f.endswith(".ckpt")]
+def file_mtime(path):
+    """Час модифікації файлу чи директорії в нс (None, якщо її немає)"""
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
 
-    if existing_models:
-        # Сортуємо моделі за номером, використовуючи правильне числове сортування
-        def get_model_number(filename):
+
+class StaleGlobalModelError(Exception):
+    """Глобальну модель змінив інший процес після того, як з неї почали агрегацію"""
+
+
+class GlobalModelState:
+    """Поточна глобальна модель, що зберігається в пам'яті процесу агрегації
+
+    Після кожної агрегації ваги та версія (n у global_model_<n>.ckpt)
+    оновлюються на місці, без повторного читання щойно записаного чекпоінта.
+    З диска модель читається лише при холодному старті або якщо вміст
+    model_dir чи файл поточної моделі змінив інший процес (перевіряється за
+    часом модифікації).
+    """
+
+    def __init__(self, aggregation_type='sync', model_dir=GLOBAL_MODEL_DIR, base_model_path=BASE_MODEL_PATH):
+        self.aggregation_type = aggregation_type
+        self.model_dir = model_dir
+        self.base_model_path = base_model_path
+        self.weights = None
+        # 0 - базова (або випадкова) модель, n - global_model_<n>.ckpt
+        self.version = 0
+        self.path = None
+        # Моделі, від яких клієнти могли рахувати дельти: від найновішої глобальної до базової
+        self.base_models = []
+        # Часи модифікації (model_dir, path) на момент останнього читання чи запису
+        self.disk_state = None
+        self.lock = threading.Lock()
+
+    def current_disk_state(self):
+        return file_mtime(self.model_dir), file_mtime(self.path) if self.path else None
+
+    def current(self):
+        """Ваги поточної глобальної моделі (None, якщо моделі немає)"""
+        with self.lock:
+            self.refresh()
+            return self.weights
+
+    def snapshot(self):
+        """Узгоджені (ваги, копія base_models) поточної глобальної моделі"""
+        with self.lock:
+            self.refresh()
+            return self.weights, list(self.base_models)
+
+    def refresh(self):
+        """Перечитування моделі, якщо її ще не читали або диск змінив інший процес (під self.lock)
+
+        Returns:
+            bool: True, якщо модель перечитано
+        """
+        if self.disk_state is None:
+            self.reload()
+            return True
+        if self.current_disk_state() != self.disk_state:
+            print("Глобальні моделі змінено іншим процесом, перечитуємо модель з диска")
+            self.reload()
+            return True
+        return False
+
+    def reload(self):
+        """Читання найновішої глобальної моделі з диска (або базової) (під self.lock)"""
+        # Стан диска фіксується до читання: зміна під час читання призведе до повторного читання
+        dir_mtime = file_mtime(self.model_dir)
+        existing_models = []
+        if os.path.isdir(self.model_dir):
+            existing_models = sorted((f for f in os.listdir(self.model_dir)
+                                      if f.startswith("global_model_") and f.endswith(".ckpt")),
+                                     key=global_model_number, reverse=True)
+        self.weights, self.version, self.path = None, 0, None
+
+        if existing_models:
+            latest_model_path = os.path.join(self.model_dir, existing_models[0])
             try:
-                # Видаляємо 'global_model_' з початку та '.ckpt' з кінця, щоб отримати номер
-                number = int(filename.replace('global_model_', '').replace('.ckpt', ''))
-                return number
-            except ValueError:
-                return -1  # Якщо не вдалося отримати номер, повертаємо -1
-
-        # Сортуємо за номером моделі
-        latest_model = max(existing_models, key=get_model_number)
-        latest_model_path = os.path.join(GLOBAL_MODEL_DIR, latest_model)
-        try:
-            global_model.restore(latest_model_path)
-            print(f"Ваги останньої агрегованої моделі успішно завантажено з {latest_model}")
-            global_model_loaded = True
-        except Exception as e:
-            print(f"Помилка завантаження останньої агрегованої моделі: {e}")
+                path_mtime = file_mtime(latest_model_path)
+                self.weights = read_checkpoint(latest_model_path)
+                self.path = latest_model_path
+                print(f"Ваги останньої агрегованої моделі успішно завантажено з {existing_models[0]}")
+            except Exception as e:
+                print(f"Помилка завантаження останньої агрегованої моделі: {e}")
+
+        # Якщо не вдалося завантажити агреговану модель, спробуємо завантажити базову модель
+        if self.weights is None and os.path.exists(self.base_model_path):
+            try:
+                path_mtime = file_mtime(self.base_model_path)
+                self.weights = read_checkpoint(self.base_model_path)
+                self.path = self.base_model_path
+                print("Ваги базової моделі успішно завантажено")
+            except Exception as e:
+                print(f"Помилка завантаження базової моделі: {e}")
+
+        if self.weights is None and self.aggregation_type == 'async':
+            print("Не вдалося завантажити жодну модель. Створюємо нову модель з випадковими вагами")
+            self.weights = initial_global_weights()
+
+        # Нумерація продовжується після найновішого файлу, навіть якщо його не вдалося прочитати
+        if existing_models:
+            self.version = max(global_model_number(existing_models[0]), 0)
+        self.base_models = [os.path.join(self.model_dir, f) for f in existing_models[:MAX_BASE_MODELS]]
+        self.base_models.append(self.base_model_path)
+        self.disk_state = (dir_mtime, path_mtime if self.path else None)
+
+    def update(self, weights):
+        """Збереження нової глобальної моделі наступної версії з оновленням у пам'яті
+
+        weights мають бути агреговані з моделі, яку повернув current() чи
+        snapshot(). Якщо після цього інший процес змінив глобальну модель,
+        запис перезаписав би її нащадка, тому модель перечитується, а
+        виклик завершується StaleGlobalModelError без збереження.
+
+        Returns:
+            str: шлях до збереженого чекпоінта
+        """
+        with self.lock:
+            # Перевірка диска та запис в одному блоці: версію між ними ніхто не змінить
+            if self.refresh():
+                raise StaleGlobalModelError(f"глобальну модель змінено іншим процесом (версія {self.version})")
+            save_path = save_model(weights, self.model_dir, index=self.version + 1)
+            self.weights = weights
+            self.version += 1
+            self.path = save_path
+            self.base_models.insert(0, save_path)
+            # Базова модель завжди лишається останньою
+            del self.base_models[MAX_BASE_MODELS:-1]
+            self.disk_state = self.current_disk_state()
+            return save_path
+
+    def aggregate_and_update(self, aggregate, attempts=AGGREGATION_ATTEMPTS):
+        """Агрегація від поточної глобальної моделі та збереження результату
+
+        Args:
+            aggregate: функція (ваги глобальної моделі) -> нові ваги; якщо
+                глобальну модель змінив інший процес, викликається знову з
+                перечитаною моделлю
+
+        Returns:
+            str: шлях до збереженого чекпоінта або None, якщо агрегувати нічого
+        """
+        for attempt in range(1, attempts + 1):
+            aggregated = aggregate(self.current())
+            if not aggregated:
+                return None
+            try:
+                return self.update(aggregated)
+            except StaleGlobalModelError as e:
+                if attempt == attempts:
+                    raise
+                print(f"Агрегацію повторено від перечитаної моделі: {e}")
 
-    # Якщо не вдалося завантажити агреговану модель, спробуємо завантажити базову модель
-    if not global_model_loaded and os.path.exists(BASE_MODEL_PATH):
-        try:
-            global_model.restore(BASE_MODEL_PATH)
-            print("Ваги базової моделі успішно завантажено")
-            global_model_loaded = True
-        except Exception as e:
-            print(f"Помилка завантаження базової моделі: {e}")
 
-    if not global_model_loaded:
-        print("Не вдалося завантажити жодну модель. Створюємо нову модель з випадковими вагами")
+def handle_client_connection(client_socket, args, global_state):
+    """Обробка підключення клієнта
+
+    global_state - глобальна модель у пам'яті між підключеннями (GlobalModelState).
+    """
+    _, base_models = global_state.snapshot()
 
     # Завантажуємо моделі для агрегації з урахуванням розміру буфера
-    models, data_counts = load_weights(MODEL_DIR, args.buffer_size)
+    models, data_counts, local_epochs = load_weights(MODEL_DIR, args.buffer_size, base_models)
     if models:
-        if args.aggregation_type == 'sync':
-            aggregated_model = aggregate_weights_weighted(models, data_counts)
-        else:  # async
-            aggregated_model = aggregate_weights_async(models, global_model, alpha=args.alpha)
-
-        if aggregated_model:
-            saved_model_path = save_model(aggregated_model, GLOBAL_MODEL_DIR)
+        saved_model_path = global_state.aggregate_and_update(
+            lambda global_model: aggregate_models(models, data_counts, local_epochs, global_model,
+                                                  args.aggregation_type, args.alpha, args.epoch_weighting))
 
+        if saved_model_path:
             # Запускаємо оцінку в окремому потоці
-            if saved_model_path:
-                trigger_remote_evaluation(saved_model_path, host=args.evaluation_server_ip)
+            trigger_remote_evaluation(saved_model_path, host=args.evaluation_server_ip)
 
             # Надсилаємо повідомлення клієнту
             model_filename = os.path.basename(saved_model_path)
@@ -312,10 +524,11 @@ def start_server():
     server_socket.listen(5)
     print("Сервер запущено. Очікування підключень...")
 
+    global_state = GlobalModelState(args.aggregation_type)
     while True:
         client_socket, addr = server_socket.accept()
         print(f"Підключено клієнта: {addr}")
-        handle_client_connection(client_socket, args)
+        handle_client_connection(client_socket, args, global_state)
 
 if __name__ == "__main__":
     # Створюємо директорії для результатів тестування та глобальної моделі
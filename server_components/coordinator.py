@@ -0,0 +1,437 @@
+"""Координатор федеративного навчання на asyncio (заміна main.cpp)
+
+Говорить з клієнтами тим самим протоколом, що й main.cpp: SEND_BASE_MODEL,
+SEND_MIN_VALS_FILE, SEND_MAX_VALS_FILE, UPLOAD_DATA, LISTEN_COMMANDS,
+RETRAIN, MAX_ROUNDS_REACHED, завантаження моделі SEND_MODEL (v1) та кадром
+v2 (core_ml_components.upload_protocol), а також відповідає на UDP-запити
+виявлення сервера. Семантика buffer_size та сама: одночасно приймається не
+більше buffer_size моделей, після чого всі вони агрегуються, а клієнти
+отримують нову глобальну модель і знову чекають RETRAIN.
+
+Агрегація виконується в цьому ж процесі функціями aggregation_script:
+моделі клієнтів розбираються з пам'яті, без директорії aggregation_models
+та виклику aggregation_script.py через порт 12345. Кожне з'єднання - це
+корутина в одному циклі подій, тому сотні клієнтів не потребують сотень
+потоків; розбір чекпоінтів, агрегація та запис моделі виконуються в пулі
+потоків, щоб не блокувати цикл.
+
+Запуск з директорії server_components:
+    python coordinator.py --buffer_size 3 --aggregation_type sync
+"""
+import os
+import sys
+import asyncio
+import argparse
+import functools
+
+# Додаємо кореневу директорію проекту до PYTHONPATH
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core_ml_components.checkpoint_io import check_compatible
+from core_ml_components.upload_protocol import (parse_frame_prefix, decode_frame_header, encode_frame_prefix,
+                                                check_upload_header, ack_header, codec_for_path,
+                                                FRAME_MAGIC, FRAME_PREFIX, HELLO_COMMAND, HELLO_REPLY)
+from server_components.aggregation_script import (GlobalModelState, read_upload, aggregate_models,
+                                                  trigger_remote_evaluation, ALPHA)
+
+BASE_MODEL_FILE_DIRECTORY = "base_model"
+BASE_MODEL_FILENAME = "big_global_model_weights.ckpt"
+UPLOADED_DATA_FILENAME = "data.txt"
+PORT = 2121
+DISCOVERY_PORT = 2122
+DISCOVERY_REQUEST = "ANDROID_CLIENT_DISCOVERY"
+DISCOVERY_RESPONSE = "SERVER_FOUND"
+RETRAIN_INTERVAL = 2
+LISTEN_BACKLOG = 1024
+# Команди - короткі рядки; довший рядок без '\n' означає пошкоджений потік
+MAX_COMMAND_LENGTH = 4096
+
+
+async def in_thread(func, *args, **kwargs):
+    """Виконання блокуючої функції в пулі потоків циклу подій"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, functools.partial(func, *args, **kwargs))
+
+
+async def read_command(reader):
+    """Рядок команди без '\\n', FRAME_MAGIC для кадру v2 або None, якщо з'єднання закрито
+
+    Спочатку читаються len(FRAME_MAGIC) байт: кадр v2 не має '\\n' після
+    magic, тому його треба розпізнати до readuntil. Команди протоколу
+    довші за magic, а клієнт чекає відповіді перед наступною командою,
+    тому '\\n' всередині перших байтів може бути лише в кінці рядка.
+    """
+    try:
+        head = await reader.readexactly(len(FRAME_MAGIC))
+    except asyncio.IncompleteReadError:
+        return None
+    if head == FRAME_MAGIC:
+        return FRAME_MAGIC
+    if b"\n" in head:
+        if not head.endswith(b"\n") or head.count(b"\n") > 1:
+            raise ValueError(f"Некоректна команда клієнта: {head!r}")
+        line = head
+    else:
+        try:
+            line = head + await reader.readuntil(b"\n")
+        except asyncio.IncompleteReadError:
+            return None
+        except asyncio.LimitOverrunError:
+            raise ValueError("Занадто довга команда клієнта")
+        if len(line) > MAX_COMMAND_LENGTH:
+            raise ValueError("Занадто довга команда клієнта")
+    return line[:-1].decode(errors="replace").replace('\x00', '').strip()
+
+
+async def send_payload(reader, writer, payload):
+    """Відправка файлу як у main.cpp: розмір, очікування OK, вміст"""
+    writer.write(f"{len(payload)}\n".encode())
+    await writer.drain()
+    response = await reader.read(1024)
+    if b"OK" not in response:
+        raise ConnectionError(f"Клієнт не підтвердив розмір файлу: {response!r}")
+    writer.write(payload)
+    await writer.drain()
+
+
+def read_file(filepath):
+    with open(filepath, "rb") as f:
+        return f.read()
+
+
+class DiscoveryProtocol(asyncio.DatagramProtocol):
+    """Відповідь на UDP-запити клієнтів, що шукають сервер у локальній мережі"""
+
+    def __init__(self, port):
+        self.port = port
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        if data.decode(errors="replace") == DISCOVERY_REQUEST:
+            print(f"Запит виявлення від: {addr[0]}")
+            self.transport.sendto(f"{DISCOVERY_RESPONSE}:{self.port}".encode(), addr)
+
+
+class Coordinator:
+    def __init__(self, buffer_size, aggregation_type="sync", alpha=ALPHA, epoch_weighting=False,
+                 evaluation_server_ip=None, port=PORT):
+        self.buffer_size = buffer_size
+        self.aggregation_type = aggregation_type
+        self.alpha = alpha
+        self.epoch_weighting = epoch_weighting
+        self.evaluation_server_ip = evaluation_server_ip
+        self.port = port
+
+        # Глобальна модель у пам'яті; з диска перечитується лише після зовнішніх змін
+        self.global_state = GlobalModelState(aggregation_type)
+        # Прийняті моделі раунду: (ваги, кількість даних, епохи)
+        self.uploads = []
+        self.uploads_in_progress = 0
+        self.aggregating = False
+        self.listening = 0
+        # Примітиви asyncio створюються в serve, всередині циклу подій
+        self.retrain_cv = None
+        self.buffer_cv = None
+        self.round_future = None
+        self.background_tasks = set()
+
+    async def serve(self):
+        server = await self.start()
+        async with server:
+            await server.serve_forever()
+
+    async def start(self, host='0.0.0.0', discovery=True):
+        """Запуск TCP-сервера (та служби виявлення) у поточному циклі подій
+
+        Returns:
+            asyncio.Server; з port=0 фактичний порт - server.sockets[0].getsockname()[1]
+        """
+        loop = asyncio.get_running_loop()
+        self.retrain_cv = asyncio.Condition()
+        self.buffer_cv = asyncio.Condition()
+        self.round_future = loop.create_future()
+
+        os.makedirs(self.global_state.model_dir, exist_ok=True)
+        await in_thread(self.global_state.current)
+
+        server = await asyncio.start_server(self.handle_client, host, self.port, backlog=LISTEN_BACKLOG)
+        if discovery:
+            try:
+                await loop.create_datagram_endpoint(lambda: DiscoveryProtocol(self.port),
+                                                    local_addr=('0.0.0.0', DISCOVERY_PORT))
+                print(f"Служба виявлення працює на UDP-порту {DISCOVERY_PORT}")
+            except OSError as e:
+                print(f"Не вдалося запустити службу виявлення: {e}")
+        print(f"Координатор запущено на порту {self.port} з розміром буфера {self.buffer_size} "
+              f"(агрегація: {self.aggregation_type})")
+
+        self.spawn(self.retrain_loop())
+        return server
+
+    def spawn(self, coroutine):
+        """Фонова задача, посилання на яку зберігається до її завершення"""
+        task = asyncio.create_task(coroutine)
+        self.background_tasks.add(task)
+        task.add_done_callback(self.background_tasks.discard)
+        return task
+
+    async def handle_client(self, reader, writer):
+        peer = writer.get_extra_info("peername")
+        try:
+            if await self.handle_setup_commands(reader, writer, peer):
+                await self.serve_rounds(reader, writer, peer)
+        except (ConnectionError, asyncio.IncompleteReadError) as e:
+            print(f"З'єднання з клієнтом {peer} перервано: {e}")
+        except Exception as e:
+            print(f"Помилка клієнта {peer}: {e}")
+        finally:
+            writer.close()
+
+    async def handle_setup_commands(self, reader, writer, peer):
+        """Команди клієнта до LISTEN_COMMANDS; False, якщо з'єднання завершено"""
+        while True:
+            command = await read_command(reader)
+            if command is None:
+                return False
+            if command == HELLO_COMMAND:
+                writer.write(f"{HELLO_REPLY}\n".encode())
+                await writer.drain()
+                print(f"Клієнт {peer} використовує протокол v2")
+            elif command == "SEND_BASE_MODEL":
+                payload = await in_thread(read_file, os.path.join(BASE_MODEL_FILE_DIRECTORY, BASE_MODEL_FILENAME))
+                await send_payload(reader, writer, payload)
+            elif command in ("SEND_MIN_VALS_FILE", "SEND_MAX_VALS_FILE"):
+                filename = "min_vals.txt" if command == "SEND_MIN_VALS_FILE" else "max_vals.txt"
+                filepath = os.path.join(BASE_MODEL_FILE_DIRECTORY, filename)
+                if os.path.exists(filepath):
+                    await send_payload(reader, writer, await in_thread(read_file, filepath))
+                else:
+                    print(f"Файл не знайдено: {filepath}")
+                    writer.write(b"ERROR_FILE_NOT_FOUND\n")
+                    await writer.drain()
+            elif command == "UPLOAD_DATA":
+                await self.save_uploaded_data(reader, writer)
+                return False
+            elif command == "LISTEN_COMMANDS":
+                return True
+            else:
+                # main.cpp невідомі команди на цьому етапі ігнорує
+                print(f"Невідома команда від {peer}: {command!r}")
+
+    @staticmethod
+    async def save_uploaded_data(reader, writer):
+        """UPLOAD_DATA: дані клієнта до закриття з'єднання записуються в UPLOADED_DATA_FILENAME"""
+        writer.write(b"OK\n")
+        await writer.drain()
+        total_bytes = 0
+        with open(UPLOADED_DATA_FILENAME, "wb") as f:
+            while True:
+                chunk = await reader.read(65536)
+                if not chunk:
+                    break
+                f.write(chunk)
+                total_bytes += len(chunk)
+        print(f"Дані клієнта ({total_bytes} байт) збережено у файл {UPLOADED_DATA_FILENAME}")
+
+    async def retrain_loop(self):
+        while True:
+            await asyncio.sleep(RETRAIN_INTERVAL)
+            async with self.retrain_cv:
+                if self.listening:
+                    print(f"Кількість клієнтів: {self.listening}")
+                    self.retrain_cv.notify_all()
+
+    async def serve_rounds(self, reader, writer, peer):
+        """Раунди клієнта: RETRAIN, прийом моделі, відправка нової глобальної моделі"""
+        while True:
+            async with self.retrain_cv:
+                self.listening += 1
+                try:
+                    await self.retrain_cv.wait()
+                finally:
+                    self.listening -= 1
+
+            writer.write(b"RETRAIN\n")
+            await writer.drain()
+            command = await read_command(reader)
+            if command is None or command == "MAX_ROUNDS_REACHED":
+                print(f"Клієнт {peer} завершив роботу")
+                return
+            if command not in (FRAME_MAGIC, "SEND_MODEL"):
+                print(f"Неочікувана команда від {peer}: {command!r}")
+                return
+
+            round_future = await self.receive_upload(reader, writer, command, peer)
+            if round_future is None:
+                # Модель відхилено, але потік цілий: клієнт чекає наступного RETRAIN
+                continue
+            model_payload = await round_future
+            await send_payload(reader, writer, model_payload)
+
+    async def receive_upload(self, reader, writer, command, peer):
+        """Прийом моделі клієнта з урахуванням buffer_size
+
+        Returns:
+            Future з вмістом нової глобальної моделі раунду або None, якщо модель відхилено
+            (клієнт уже отримав відповідь з помилкою)
+        """
+        async with self.buffer_cv:
+            await self.buffer_cv.wait_for(
+                lambda: not self.aggregating and len(self.uploads) + self.uploads_in_progress < self.buffer_size)
+            self.uploads_in_progress += 1
+
+        upload = None
+        try:
+            if command == FRAME_MAGIC:
+                upload = await self.receive_frame_upload(reader, writer, peer)
+            else:
+                upload = await self.receive_legacy_upload(reader, writer, peer)
+        finally:
+            async with self.buffer_cv:
+                self.uploads_in_progress -= 1
+                round_future = self.round_future
+                if upload is not None:
+                    self.uploads.append(upload)
+                    if len(self.uploads) >= self.buffer_size:
+                        self.aggregating = True
+                        uploads, self.uploads = self.uploads, []
+                        self.spawn(self.aggregate_round(uploads))
+                self.buffer_cv.notify_all()
+        return round_future if upload is not None else None
+
+    def decode_upload(self, payload, codec):
+        """Ваги моделі клієнта з вмісту завантаження (виконується в пулі потоків)"""
+        global_model, base_models = self.global_state.snapshot()
+        weights = read_upload(payload, codec, base_models)
+        if global_model is not None:
+            check_compatible(global_model, weights)
+        return weights
+
+    async def receive_frame_upload(self, reader, writer, peer):
+        """Протокол v2: кадр із заголовком та вмістом, одне підтвердження"""
+        prefix = FRAME_MAGIC + await reader.readexactly(FRAME_PREFIX.size - len(FRAME_MAGIC))
+        header_size, payload_size = parse_frame_prefix(prefix)
+        header = decode_frame_header(await reader.readexactly(header_size))
+        payload = await reader.readexactly(payload_size)
+        try:
+            check_upload_header(header)
+            weights = await in_thread(self.decode_upload, payload, header["codec"])
+        except Exception as e:
+            print(f"Модель від {peer} відхилено: {e}")
+            writer.write(encode_frame_prefix(ack_header(e), 0))
+            await writer.drain()
+            return None
+
+        writer.write(encode_frame_prefix(ack_header(), 0))
+        await writer.drain()
+        print(f"Модель клієнта {header['client_id']} (раунд {header['round']}, {header['codec']}) "
+              f"отримано: {header['filename']}, {payload_size} байт")
+        return weights, header["data_count"], header["epochs"]
+
+    async def receive_legacy_upload(self, reader, writer, peer):
+        """Протокол v1: послідовність запит/відповідь як у main.cpp"""
+        writer.write(b"READY\n")
+        await writer.drain()
+        filename = os.path.basename(await read_command(reader) or "")
+        if not filename:
+            raise ConnectionError("Порожнє ім'я файлу")
+        writer.write(b"OK\n")
+        await writer.drain()
+
+        size_line = await read_command(reader) or ""
+        if not size_line.startswith("FILE_SIZE:"):
+            raise ValueError(f"Неочікуваний формат розміру файлу: {size_line}")
+        file_size = int(size_line[len("FILE_SIZE:"):])
+        writer.write(b"SIZE_RECEIVED\n")
+        await writer.drain()
+
+        payload = await reader.readexactly(file_size)
+        writer.write(b"OK\n")
+        await writer.drain()
+
+        data_count, epochs = 0, 0
+        count_line = await read_command(reader) or ""
+        if count_line.startswith("DATA_COUNT:"):
+            # Необов'язкова кількість фактично використаних локальних епох: "DATA_COUNT:n EPOCHS:e"
+            count_value, _, epochs_value = count_line[len("DATA_COUNT:"):].partition(" EPOCHS:")
+            data_count = int(count_value)
+            epochs = int(epochs_value) if epochs_value else 0
+        else:
+            print(f"Неочікуваний формат кількості даних: {count_line}")
+
+        # У v1 немає кадру з помилкою: замість DATA_COUNT_RECEIVED клієнт отримує
+        # UPLOAD_REJECTED, вважає відправку невдалою і чекає наступного RETRAIN
+        try:
+            weights = await in_thread(self.decode_upload, payload, codec_for_path(filename))
+        except Exception as e:
+            print(f"Модель від {peer} відхилено: {e}")
+            writer.write(b"UPLOAD_REJECTED\n")
+            await writer.drain()
+            return None
+        writer.write(b"DATA_COUNT_RECEIVED\n")
+        await writer.drain()
+        print(f"Модель отримано від {peer}: {filename}, {file_size} байт")
+        return weights, data_count, epochs
+
+    async def aggregate_round(self, uploads):
+        print(f"Прийнято {len(uploads)} моделей. Запускаємо агрегацію...")
+        round_future = self.round_future
+        try:
+            model_path, payload = await in_thread(self.aggregate_uploads, uploads)
+            round_future.set_result(payload)
+            # Оцінка не затримує відправку моделі клієнтам
+            self.spawn(in_thread(trigger_remote_evaluation, model_path, host=self.evaluation_server_ip))
+        except Exception as e:
+            print(f"Помилка агрегації: {e}")
+            round_future.set_exception(e)
+        finally:
+            async with self.buffer_cv:
+                self.round_future = asyncio.get_running_loop().create_future()
+                self.aggregating = False
+                self.buffer_cv.notify_all()
+
+    def aggregate_uploads(self, uploads):
+        """Агрегація та збереження нової глобальної моделі (виконується в пулі потоків)
+
+        Returns:
+            tuple: (шлях до збереженої моделі, її вміст для відправки клієнтам)
+        """
+        models = [upload[0] for upload in uploads]
+        data_counts = [upload[1] for upload in uploads]
+        local_epochs = [upload[2] for upload in uploads]
+        model_path = self.global_state.aggregate_and_update(
+            lambda global_model: aggregate_models(models, data_counts, local_epochs, global_model,
+                                                  self.aggregation_type, self.alpha, self.epoch_weighting))
+        if model_path is None:
+            raise ValueError("Агрегація не дала нової моделі")
+        print(f"Версія глобальної моделі: {self.global_state.version}")
+        return model_path, read_file(model_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Координатор федеративного навчання з агрегацією в процесі')
+    parser.add_argument('--buffer_size', type=int, default=3,
+                        help='Кількість моделей клієнтів, після якої запускається агрегація')
+    parser.add_argument('--aggregation_type', type=str, choices=['sync', 'async'], default='sync',
+                        help='Тип агрегації: sync (синхронне зважене середнє) або async (асинхронне)')
+    parser.add_argument('--alpha', type=float, default=ALPHA,
+                        help='Значення ALPHA для асинхронної агрегації (в діапазоні (0, 1])')
+    parser.add_argument('--epoch_weighting', action='store_true',
+                        help='Синхронна агрегація зважує моделі за кількістю даних x використані локальні епохи')
+    parser.add_argument('--evaluation_server_ip', type=str, default='127.0.0.1', help='IP-адреса сервера оцінки')
+    parser.add_argument('--port', type=int, default=PORT, help='TCP-порт для клієнтів')
+    args = parser.parse_args()
+    if args.buffer_size < 1:
+        parser.error("--buffer_size має бути більше 0")
+
+    coordinator = Coordinator(args.buffer_size, aggregation_type=args.aggregation_type, alpha=args.alpha,
+                              epoch_weighting=args.epoch_weighting, evaluation_server_ip=args.evaluation_server_ip,
+                              port=args.port)
+    asyncio.run(coordinator.serve())
+
+
+if __name__ == "__main__":
+    main()
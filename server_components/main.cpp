@@ -489,6 +489,15 @@ private:
             std::string data_count_prefix = "DATA_COUNT:";
             if (data_count_line.rfind(data_count_prefix, 0) == 0) {
                 std::string data_count_value = data_count_line.substr(data_count_prefix.length());
+
+                // Необов'язкова кількість фактично використаних локальних епох: "DATA_COUNT:n EPOCHS:e"
+                std::string epochs_value;
+                std::string epochs_marker = " EPOCHS:";
+                size_t epochs_pos = data_count_value.find(epochs_marker);
+                if (epochs_pos != std::string::npos) {
+                    epochs_value = data_count_value.substr(epochs_pos + epochs_marker.length());
+                    data_count_value = data_count_value.substr(0, epochs_pos);
+                }
                 cout << "Received data count: " << data_count_value << "\n";
 
                 std::string base_filename = received_filename;
@@ -498,6 +507,19 @@ private:
                 }
                 std::string data_count_filename = models_dir + "/" + base_filename + "_data_count.txt";
 
+                if (!epochs_value.empty()) {
+                    cout << "Received local epochs: " << epochs_value << "\n";
+                    std::string epochs_filename = models_dir + "/" + base_filename + "_epochs.txt";
+                    std::ofstream epochs_file(epochs_filename);
+                    if (epochs_file) {
+                        epochs_file << epochs_value;
+                        epochs_file.close();
+                    }
+                    else {
+                        cerr << "Error saving local epochs to file: " << epochs_filename << "\n";
+                    }
+                }
+
                 std::ofstream data_count_file(data_count_filename);
                 if (data_count_file) {
                     data_count_file << data_count_value;
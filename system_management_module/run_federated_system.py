@@ -12,12 +12,18 @@ from tkinter import ttk, scrolledtext
 from datetime import datetime
 import socket
 import json
-import glob
 import re
 
 # Додаємо кореневу директорію проекту до PYTHONPATH
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from core_ml_components.recording_format import list_recordings
+from core_ml_components.cpu_partition import plan_cpu_partition, thread_env, pin_process, find_processes
+
+SERVER_COMPONENTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "server_components")
+CPP_SERVER_EXECUTABLE = os.path.join(SERVER_COMPONENTS_DIR, "x64", "Release", "aggregation_server_bchr.exe")
+EVALUATION_MODULE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "evaluation_module")
+
 def find_evaluation_server(broadcast_port=49152, timeout=5):
     """
     Пошук сервера оцінки в локальній мережі через broadcast.
@@ -80,6 +86,11 @@ class FederatedSystemGUI:
         self.alpha_value = tk.StringVar(value="0.1")  # Змінна для зберігання значення ALPHA
         self.rounds_count = tk.StringVar(value="10")  # Змінна для зберігання кількості раундів
         self.local_epochs = tk.StringVar(value="5")  # Змінна для зберігання кількості локальних епох
+        self.patience = tk.StringVar(value="0")  # Епохи без покращення до зупинки (0 - фіксована кількість епох)
+        self.cpu_partitioning = tk.BooleanVar(value=True)  # Розподіл ядер між процесами системи
+        self.cpu_plan = None  # Поточний розподіл ядер {роль: [ядра]}
+        # Python-координатор (агрегація в тому ж процесі) замість C++ сервера; за замовчуванням - якщо C++ сервер не зібрано
+        self.python_coordinator = tk.BooleanVar(value=not os.path.exists(CPP_SERVER_EXECUTABLE))
         self.evaluation_server_ip = None  # Змінна для зберігання IP сервера оцінки
         self.eval_server_status = tk.StringVar(value="Статус сервера оцінки: Перевірка...")  # Ініціалізуємо змінну статусу
         self.metrics_socket = None  # Ініціалізуємо сокет як None
@@ -130,6 +141,18 @@ class FederatedSystemGUI:
         self.epochs_entry = ttk.Entry(control_frame, textvariable=self.local_epochs, width=10)
         self.epochs_entry.pack(side=tk.LEFT, padx=5)
 
+        ttk.Label(control_frame, text="Терпіння:").pack(side=tk.LEFT, padx=5)
+        self.patience_entry = ttk.Entry(control_frame, textvariable=self.patience, width=5)
+        self.patience_entry.pack(side=tk.LEFT, padx=5)
+
+        self.cpu_partitioning_check = ttk.Checkbutton(control_frame, text="Розподіл ядер",
+                                                      variable=self.cpu_partitioning)
+        self.cpu_partitioning_check.pack(side=tk.LEFT, padx=5)
+
+        self.python_coordinator_check = ttk.Checkbutton(control_frame, text="Python-координатор",
+                                                        variable=self.python_coordinator)
+        self.python_coordinator_check.pack(side=tk.LEFT, padx=5)
+
         # Додаємо радіокнопки для вибору режиму агрегації
         ttk.Label(control_frame, text="Режим агрегації:").pack(side=tk.LEFT, padx=5)
         ttk.Radiobutton(control_frame, text="Асинхронний", variable=self.aggregation_mode,
@@ -384,6 +407,17 @@ class FederatedSystemGUI:
             except Exception as e:
                 print(f"Помилка при оновленні метрик: {e}")
 
+    def process_env(self, role):
+        """Середовище процесу з кількістю потоків TF під виділені йому ядра"""
+        if self.cpu_plan is None:
+            return None
+        return thread_env(self.cpu_plan[role])
+
+    def pin_to_plan(self, role, pid):
+        """Прив'язка процесу до ядер, виділених ролі"""
+        if self.cpu_plan is not None:
+            pin_process(pid, self.cpu_plan[role])
+
     def read_output(self, process, process_type, client_id=None):
         """Читання виводу процесу"""
         for line in iter(process.stdout.readline, ''):
@@ -409,7 +443,7 @@ class FederatedSystemGUI:
             reuse_info = []
             for i in range(1, num_clients + 1):
                 client_dir = f"federated_client/client{i}/data"
-                data_files = sorted(glob.glob(os.path.join(client_dir, "data*.txt")))
+                data_files = list_recordings(client_dir)
                 total_files = len(data_files)
                 if total_files == 0:
                     reuse_info.append(f"Клієнт {i}: Помилка - не знайдено файлів даних")
@@ -572,55 +606,42 @@ class FederatedSystemGUI:
                 local_epochs = int(self.local_epochs.get())
                 if local_epochs < 1:
                     raise ValueError("Кількість локальних епох повинна бути більше 0")
+                patience = int(self.patience.get())
+                if patience < 0:
+                    raise ValueError("Терпіння не може бути від'ємним")
             except ValueError as e:
                 self.metrics_text.config(state=tk.NORMAL)
                 self.metrics_text.insert(tk.END, f"\nПомилка: {str(e)}\n")
                 self.metrics_text.config(state=tk.DISABLED)
                 return
 
-            # Запуск C++ сервера
-            self.metrics_text.config(state=tk.NORMAL)
-            self.metrics_text.insert(tk.END, "\nЗапуск C++ сервера...\n")
-            self.metrics_text.config(state=tk.DISABLED)
-
-            server_process = subprocess.Popen(
-                ["./server_components/x64/Release/aggregation_server_bchr.exe", str(buffer_size)],
-                cwd=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "server_components"),
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                encoding='utf-8',
-                errors='replace'
-            )
-            self.processes['server'] = server_process
-            threading.Thread(target=self.read_output, args=(server_process, 'server'), daemon=True).start()
-
-            time.sleep(2)
-
-            # Запуск скрипту агрегації
-            self.metrics_text.config(state=tk.NORMAL)
-            self.metrics_text.insert(tk.END, "Запуск скрипту агрегації...\n")
-            self.metrics_text.config(state=tk.DISABLED)
+            # Розподіл ядер: без нього кожен процес створює пули потоків TF на всі ядра
+            self.cpu_plan = None
+            if self.cpu_partitioning.get():
+                local_evaluation = self.evaluation_server_ip == '127.0.0.1'
+                self.cpu_plan = plan_cpu_partition(num_clients, evaluation=local_evaluation)
+                self.metrics_text.config(state=tk.NORMAL)
+                self.metrics_text.insert(tk.END, "\nРозподіл ядер: " + ", ".join(
+                    f"{role}: {cores}" for role, cores in self.cpu_plan.items()) + "\n")
+                self.metrics_text.config(state=tk.DISABLED)
+                if local_evaluation:
+                    running = find_processes("evaluation_server.py")
+                    if running:
+                        # Сервер оцінки запущено вручну: пули потоків TF вже створено на всі ядра,
+                        # тому його можна лише прив'язати до ядра
+                        for pid in running:
+                            self.pin_to_plan('evaluation', pid)
+                        self.metrics_text.config(state=tk.NORMAL)
+                        self.metrics_text.insert(tk.END, "Сервер оцінки вже запущено: його прив'язано до ядра, "
+                                                         "але кількість потоків TF не змінено\n")
+                        self.metrics_text.config(state=tk.DISABLED)
+                    else:
+                        self.start_evaluation_server()
 
-            aggregation_process = subprocess.Popen(
-                [sys.executable, "aggregation_script.py",
-                 "--aggregation_type", self.aggregation_mode.get(),
-                 "--buffer_size", str(buffer_size),
-                 "--alpha", str(alpha),
-                 "--evaluation_server_ip", self.evaluation_server_ip],
-                cwd=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "server_components"),
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                encoding='utf-8',
-                errors='replace',
-                bufsize=1,
-                universal_newlines=True
-            )
-            self.processes['aggregation'] = aggregation_process
-            threading.Thread(target=self.read_output, args=(aggregation_process, 'aggregation'), daemon=True).start()
-
-            time.sleep(2)
+            if self.python_coordinator.get():
+                self.start_python_coordinator(buffer_size, alpha)
+            else:
+                self.start_cpp_server_and_aggregation(buffer_size, alpha)
 
             # Запуск клієнтів
             self.metrics_text.config(state=tk.NORMAL)
@@ -636,18 +657,25 @@ class FederatedSystemGUI:
                 self.client_states[i] = {"state": "⏳ Запуск", "round": 0}
                 self.update_client_state(i, "")
 
+                client_command = [sys.executable, "federated_client.py",
+                                  "--data_dir", str(i),
+                                  "--rounds", str(rounds),
+                                  "--local_epochs", str(local_epochs),
+                                  "--patience", str(patience)]
+                if self.python_coordinator.get():
+                    # Координатор підтримує кадри v2; C++ сервер - лише v1 (типовий протокол клієнта)
+                    client_command += ["--protocol", "v2"]
                 client_process = subprocess.Popen(
-                    [sys.executable, "federated_client.py",
-                     "--data_dir", str(i),
-                     "--rounds", str(rounds),
-                     "--local_epochs", str(local_epochs)],
+                    client_command,
                     cwd=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "federated_client"),
                     stdout=subprocess.PIPE,
                     stderr=subprocess.STDOUT,
                     text=True,
                     encoding='utf-8',
-                    errors='replace'
+                    errors='replace',
+                    env=self.process_env(f'client_{i}')
                 )
+                self.pin_to_plan(f'client_{i}', client_process.pid)
                 self.processes[f'client_{i}'] = client_process
                 threading.Thread(target=self.read_output, args=(client_process, 'client', i), daemon=True).start()
                 time.sleep(1)
@@ -681,6 +709,110 @@ class FederatedSystemGUI:
             if self.is_running:
                 self.stop_system()
 
+    def start_evaluation_server(self):
+        """Запуск локального сервера оцінки з пулами потоків TF під виділені йому ядра"""
+        self.metrics_text.config(state=tk.NORMAL)
+        self.metrics_text.insert(tk.END, "Запуск локального сервера оцінки...\n")
+        self.metrics_text.config(state=tk.DISABLED)
+
+        evaluation_process = subprocess.Popen(
+            [sys.executable, "evaluation_server.py"],
+            cwd=EVALUATION_MODULE_DIR,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            encoding='utf-8',
+            errors='replace',
+            bufsize=1,
+            universal_newlines=True,
+            env=self.process_env('evaluation')
+        )
+        self.pin_to_plan('evaluation', evaluation_process.pid)
+        self.processes['evaluation'] = evaluation_process
+        threading.Thread(target=self.read_output, args=(evaluation_process, 'evaluation'), daemon=True).start()
+
+        time.sleep(2)
+
+    def start_python_coordinator(self, buffer_size, alpha):
+        """Запуск asyncio-координатора, що агрегує моделі в тому ж процесі"""
+        self.metrics_text.config(state=tk.NORMAL)
+        self.metrics_text.insert(tk.END, "\nЗапуск Python-координатора...\n")
+        self.metrics_text.config(state=tk.DISABLED)
+
+        server_process = subprocess.Popen(
+            [sys.executable, "coordinator.py",
+             "--buffer_size", str(buffer_size),
+             "--aggregation_type", self.aggregation_mode.get(),
+             "--alpha", str(alpha),
+             "--evaluation_server_ip", self.evaluation_server_ip],
+            cwd=SERVER_COMPONENTS_DIR,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            encoding='utf-8',
+            errors='replace',
+            bufsize=1,
+            universal_newlines=True,
+            env=self.process_env('aggregation')
+        )
+        # Агрегація виконується в процесі координатора, тому він отримує ядро агрегації
+        self.pin_to_plan('aggregation', server_process.pid)
+        self.processes['server'] = server_process
+        threading.Thread(target=self.read_output, args=(server_process, 'server'), daemon=True).start()
+
+        time.sleep(2)
+
+    def start_cpp_server_and_aggregation(self, buffer_size, alpha):
+        """Запуск C++ сервера та окремого процесу aggregation_script.py"""
+        # Запуск C++ сервера
+        self.metrics_text.config(state=tk.NORMAL)
+        self.metrics_text.insert(tk.END, "\nЗапуск C++ сервера...\n")
+        self.metrics_text.config(state=tk.DISABLED)
+
+        server_process = subprocess.Popen(
+            ["./server_components/x64/Release/aggregation_server_bchr.exe", str(buffer_size)],
+            cwd=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "server_components"),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            encoding='utf-8',
+            errors='replace',
+            env=self.process_env('aggregation')
+        )
+        # C++ сервер лише пересилає моделі, тому ділить ядро з процесом агрегації
+        self.pin_to_plan('aggregation', server_process.pid)
+        self.processes['server'] = server_process
+        threading.Thread(target=self.read_output, args=(server_process, 'server'), daemon=True).start()
+
+        time.sleep(2)
+
+        # Запуск скрипту агрегації
+        self.metrics_text.config(state=tk.NORMAL)
+        self.metrics_text.insert(tk.END, "Запуск скрипту агрегації...\n")
+        self.metrics_text.config(state=tk.DISABLED)
+
+        aggregation_process = subprocess.Popen(
+            [sys.executable, "aggregation_script.py",
+             "--aggregation_type", self.aggregation_mode.get(),
+             "--buffer_size", str(buffer_size),
+             "--alpha", str(alpha),
+             "--evaluation_server_ip", self.evaluation_server_ip],
+            cwd=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "server_components"),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            encoding='utf-8',
+            errors='replace',
+            bufsize=1,
+            universal_newlines=True,
+            env=self.process_env('aggregation')
+        )
+        self.pin_to_plan('aggregation', aggregation_process.pid)
+        self.processes['aggregation'] = aggregation_process
+        threading.Thread(target=self.read_output, args=(aggregation_process, 'aggregation'), daemon=True).start()
+
+        time.sleep(2)
+
     def on_aggregation_mode_change(self, *args):
         """Обробник зміни режиму агрегації"""
         if self.aggregation_mode.get() == "async":
@@ -826,8 +958,10 @@ class FederatedSystemGUI:
                     encoding='utf-8',
                     errors='replace',
                     bufsize=1,
-                    universal_newlines=True
+                    universal_newlines=True,
+                    env=self.process_env('aggregation')
                 )
+                self.pin_to_plan('aggregation', new_agg_process.pid)
 
                 self.processes['aggregation'] = new_agg_process
                 threading.Thread(target=self.read_output,
@@ -842,6 +976,12 @@ class FederatedSystemGUI:
                 self.metrics_text.config(state=tk.NORMAL)
                 self.metrics_text.insert(tk.END, f"\nПомилка при оновленні агрегаційного скрипту: {str(e)}\n")
                 self.metrics_text.config(state=tk.DISABLED)
+        elif old_ip != self.evaluation_server_ip and self.is_running and self.python_coordinator.get():
+            # Перезапуск координатора розірвав би з'єднання з клієнтами
+            self.metrics_text.config(state=tk.NORMAL)
+            self.metrics_text.insert(tk.END, "\nPython-координатор використовуватиме новий сервер оцінки "
+                                             "після перезапуску системи\n")
+            self.metrics_text.config(state=tk.DISABLED)
 
 def kill_process_tree(pid):
     """Функція для завершення процесу та всіх його дочірніх процесів"""
@@ -0,0 +1,54 @@
+import os
+import sys
+
+# Додаємо кореневу директорію проекту до PYTHONPATH
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import socket
+
+import pytest
+
+
+def recv_line(sock):
+    """Рядок відповіді сервера без '\\n' (читання по байту, щоб не захопити наступний кадр)"""
+    data = bytearray()
+    while True:
+        byte = sock.recv(1)
+        if not byte:
+            return None
+        if byte == b"\n":
+            return data.decode()
+        data += byte
+
+
+def connect(port):
+    sock = socket.create_connection(("127.0.0.1", port), timeout=30)
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return sock
+
+
+@pytest.fixture
+def run_coordinator(tmp_path, monkeypatch):
+    """Запуск Coordinator на loopback у tmp_path та клієнтів-функцій (port -> результат) у потоках"""
+    from server_components import coordinator as coordinator_module
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(coordinator_module, "RETRAIN_INTERVAL", 0.05)
+    monkeypatch.setattr(coordinator_module, "trigger_remote_evaluation", lambda *args, **kwargs: None)
+
+    def run(coordinator, *clients, timeout=60):
+        async def main():
+            server = await coordinator.start(host="127.0.0.1", discovery=False)
+            port = server.sockets[0].getsockname()[1]
+            try:
+                return await asyncio.wait_for(
+                    asyncio.gather(*(asyncio.to_thread(client, port) for client in clients)), timeout)
+            finally:
+                server.close()
+                for task in list(coordinator.background_tasks):
+                    task.cancel()
+
+        return asyncio.run(main())
+
+    return run
@@ -0,0 +1,167 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from conftest import recv_line, connect
+from core_ml_components.checkpoint_io import write_checkpoint, read_checkpoint
+from core_ml_components.socket_transfer import recv_exact
+from core_ml_components.upload_protocol import upload_header, send_frame, recv_frame, FRAME_MAGIC
+from core_ml_components.weight_delta import DeltaCompressor, encode_delta
+from server_components.coordinator import Coordinator, read_command
+
+
+def read_commands(data, count):
+    async def main():
+        reader = asyncio.StreamReader()
+        reader.feed_data(data)
+        reader.feed_eof()
+        return [await read_command(reader) for _ in range(count)]
+    return asyncio.run(main())
+
+
+def test_read_command_lines_and_frame_magic():
+    data = b"LISTEN_COMMANDS\nMAX_ROUNDS_REACHED\x00\nabc\n" + FRAME_MAGIC + b"\x00\x00"
+    assert read_commands(data, 4) == ["LISTEN_COMMANDS", "MAX_ROUNDS_REACHED", "abc", FRAME_MAGIC]
+
+
+def test_read_command_eof():
+    assert read_commands(b"", 1) == [None]
+    assert read_commands(b"SEND_MOD", 1) == [None]
+
+
+def test_read_command_rejects_garbage():
+    with pytest.raises(ValueError):
+        read_commands(b"ab\ncd\n", 1)
+    with pytest.raises(ValueError):
+        read_commands(b"X" * 5000 + b"\n", 1)
+
+
+def checkpoint_bytes(tmp_path, name, weights):
+    path = tmp_path / f"{name}.ckpt"
+    write_checkpoint(str(path), weights)
+    return path.read_bytes()
+
+
+def model_weights(value):
+    return {"dense/kernel": np.full((3, 4), value, dtype=np.float32),
+            "dense/bias": np.full(4, value, dtype=np.float32)}
+
+
+def parse_model(tmp_path, payload):
+    path = tmp_path / f"received_{abs(hash(payload))}.ckpt"
+    path.write_bytes(payload)
+    return read_checkpoint(str(path))
+
+
+def receive_model(sock):
+    size = int(recv_line(sock))
+    sock.sendall(b"OK\n")
+    return bytes(recv_exact(sock, size))
+
+
+def v2_client(uploads):
+    """Клієнт v2: для кожного (вміст, ім'я файлу, кількість даних) - RETRAIN, кадр і підтвердження
+
+    Returns:
+        список (підтвердження, нова глобальна модель або None)
+    """
+    def client(port):
+        results = []
+        with connect(port) as sock:
+            sock.sendall(b"LISTEN_COMMANDS\n")
+            for payload, filename, data_count in uploads:
+                assert recv_line(sock) == "RETRAIN"
+                codec = "delta" if filename.endswith(".delta") else "checkpoint"
+                send_frame(sock, upload_header(1, filename, data_count, 1, 1, codec), payload)
+                ack, _ = recv_frame(sock)
+                results.append((ack, receive_model(sock) if ack["status"] == "OK" else None))
+            sock.sendall(b"MAX_ROUNDS_REACHED\n")
+        return results
+    return client
+
+
+def test_buffer_aggregates_uploads_of_one_round(tmp_path, run_coordinator):
+    """buffer_size=2: обидва клієнти раунду отримують одну модель - зважене середнє"""
+    a = checkpoint_bytes(tmp_path, "a", model_weights(1.0))
+    b = checkpoint_bytes(tmp_path, "b", model_weights(5.0))
+    coordinator = Coordinator(buffer_size=2, port=0)
+    results = run_coordinator(coordinator,
+                              v2_client([(a, "model_1.ckpt", 30), (a, "model_1.ckpt", 10)]),
+                              v2_client([(b, "model_2.ckpt", 10), (b, "model_2.ckpt", 30)]))
+
+    assert coordinator.global_state.version == 2
+    (first_a, second_a), (first_b, second_b) = results
+    assert first_a[1] == first_b[1]
+    assert second_a[1] == second_b[1]
+    np.testing.assert_allclose(parse_model(tmp_path, first_a[1])["dense/bias"], 2.0)
+    np.testing.assert_allclose(parse_model(tmp_path, second_a[1])["dense/bias"], 4.0)
+
+
+def test_round_future_per_round(tmp_path, run_coordinator):
+    """4 клієнти з buffer_size=2: два раунди, кожну модель отримують рівно два клієнти"""
+    clients = [v2_client([(checkpoint_bytes(tmp_path, str(i), model_weights(float(i))), f"model_{i}.ckpt", 1)])
+               for i in range(4)]
+    coordinator = Coordinator(buffer_size=2, port=0)
+    results = run_coordinator(coordinator, *clients)
+
+    assert coordinator.global_state.version == 2
+    models = [result[0][1] for result in results]
+    assert all(result[0][0] == {"status": "OK"} for result in results)
+    assert sorted(models.count(model) for model in set(models)) == [2, 2]
+    biases = sorted(float(parse_model(tmp_path, model)["dense/bias"][0]) for model in set(models))
+    assert sum(biases) == pytest.approx(3.0)
+
+
+def test_rejected_delta_keeps_connection(tmp_path, run_coordinator):
+    """Дельта від невідомої базової моделі відхиляється, але клієнт лишається в раундах"""
+    unknown_base = model_weights(7.0)
+    compressed = DeltaCompressor("int8").compress({name: np.ones_like(v) for name, v in unknown_base.items()})
+    delta = encode_delta(compressed, unknown_base, "int8")
+    full = checkpoint_bytes(tmp_path, "full", model_weights(2.0))
+
+    coordinator = Coordinator(buffer_size=1, port=0)
+    [results] = run_coordinator(coordinator, v2_client([(delta, "model_1.delta", 5), (full, "model_1.ckpt", 5)]))
+
+    (rejected_ack, rejected_model), (ack, model) = results
+    assert rejected_ack["status"] == "ERROR"
+    assert "базову модель" in rejected_ack["message"]
+    assert rejected_model is None
+    assert ack == {"status": "OK"}
+    np.testing.assert_allclose(parse_model(tmp_path, model)["dense/kernel"], 2.0)
+    assert coordinator.global_state.version == 1
+
+
+def v1_upload(sock, payload, filename, data_count):
+    sock.sendall(b"SEND_MODEL\n")
+    assert recv_line(sock) == "READY"
+    sock.sendall(f"{filename}\n".encode())
+    assert recv_line(sock) == "OK"
+    sock.sendall(f"FILE_SIZE:{len(payload)}\n".encode())
+    assert recv_line(sock) == "SIZE_RECEIVED"
+    sock.sendall(payload)
+    assert recv_line(sock) == "OK"
+    sock.sendall(f"DATA_COUNT:{data_count} EPOCHS:1\n".encode())
+    return recv_line(sock)
+
+
+def test_rejected_legacy_upload_keeps_connection(tmp_path, run_coordinator):
+    full = checkpoint_bytes(tmp_path, "full", model_weights(3.0))
+
+    def client(port):
+        with connect(port) as sock:
+            sock.sendall(b"LISTEN_COMMANDS\n")
+            assert recv_line(sock) == "RETRAIN"
+            rejected = v1_upload(sock, b"not a checkpoint", "model_1.ckpt", 5)
+            assert recv_line(sock) == "RETRAIN"
+            accepted = v1_upload(sock, full, "model_1.ckpt", 5)
+            model = receive_model(sock)
+            sock.sendall(b"MAX_ROUNDS_REACHED\n")
+        return rejected, accepted, model
+
+    coordinator = Coordinator(buffer_size=1, port=0)
+    [(rejected, accepted, model)] = run_coordinator(coordinator, client)
+
+    assert rejected == "UPLOAD_REJECTED"
+    assert accepted == "DATA_COUNT_RECEIVED"
+    np.testing.assert_allclose(parse_model(tmp_path, model)["dense/bias"], 3.0)
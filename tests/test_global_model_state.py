@@ -0,0 +1,98 @@
+import os
+
+import numpy as np
+import pytest
+
+from core_ml_components.checkpoint_io import write_checkpoint, read_checkpoint
+from server_components.aggregation_script import (GlobalModelState, StaleGlobalModelError, MAX_BASE_MODELS,
+                                                  AGGREGATION_ATTEMPTS)
+
+
+def weights(value):
+    return {"dense/kernel": np.full((2, 3), value, dtype=np.float32)}
+
+
+@pytest.fixture
+def state(tmp_path):
+    base_path = tmp_path / "base_model" / "base.ckpt"
+    base_path.parent.mkdir()
+    write_checkpoint(str(base_path), weights(0.0))
+    return GlobalModelState(model_dir=str(tmp_path / "global_model"), base_model_path=str(base_path))
+
+
+def write_external(state, version, value):
+    """Модель, записана іншим процесом; mtime директорії гарантовано змінюється"""
+    os.makedirs(state.model_dir, exist_ok=True)
+    path = os.path.join(state.model_dir, f"global_model_{version}.ckpt")
+    write_checkpoint(path, weights(value))
+    stat = os.stat(state.model_dir)
+    os.utime(state.model_dir, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    return path
+
+
+def test_update_saves_next_version(state):
+    np.testing.assert_array_equal(state.current()["dense/kernel"], 0.0)
+    path = state.update(weights(1.0))
+    assert state.version == 1
+    assert os.path.basename(path) == "global_model_1.ckpt"
+    np.testing.assert_array_equal(read_checkpoint(path)["dense/kernel"], 1.0)
+    assert state.base_models == [path, state.base_model_path]
+
+
+def test_update_refuses_stale_aggregate(state):
+    state.current()
+    external = write_external(state, 5, 9.0)
+
+    with pytest.raises(StaleGlobalModelError):
+        state.update(weights(1.0))
+    assert not os.path.exists(os.path.join(state.model_dir, "global_model_6.ckpt"))
+    assert state.version == 5
+    assert state.path == external
+    np.testing.assert_array_equal(state.current()["dense/kernel"], 9.0)
+
+
+def test_aggregate_and_update_reaggregates_from_fresh_model(state):
+    state.current()
+    seen = []
+
+    def aggregate(global_model):
+        seen.append(float(global_model["dense/kernel"][0, 0]))
+        if len(seen) == 1:
+            write_external(state, 3, 4.0)
+        return {name: value + 1 for name, value in global_model.items()}
+
+    path = state.aggregate_and_update(aggregate)
+    assert seen == [0.0, 4.0]
+    assert os.path.basename(path) == "global_model_4.ckpt"
+    np.testing.assert_array_equal(read_checkpoint(path)["dense/kernel"], 5.0)
+
+
+def test_aggregate_and_update_gives_up(state):
+    state.current()
+    versions = iter(range(10, 10 + AGGREGATION_ATTEMPTS))
+
+    def aggregate(global_model):
+        write_external(state, next(versions), 1.0)
+        return global_model
+
+    with pytest.raises(StaleGlobalModelError):
+        state.aggregate_and_update(aggregate)
+
+
+def test_aggregate_and_update_nothing_to_save(state):
+    assert state.aggregate_and_update(lambda global_model: {}) is None
+    assert state.version == 0
+
+
+def test_base_models_are_capped(state):
+    state.current()
+    for i in range(MAX_BASE_MODELS + 5):
+        state.update(weights(float(i)))
+
+    assert len(state.base_models) == MAX_BASE_MODELS + 1
+    assert state.base_models[0] == state.path
+    assert state.base_models[-1] == state.base_model_path
+
+    reloaded = GlobalModelState(model_dir=state.model_dir, base_model_path=state.base_model_path)
+    reloaded.current()
+    assert reloaded.base_models == state.base_models
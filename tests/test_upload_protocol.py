@@ -0,0 +1,175 @@
+import json
+import socket
+import types
+
+import numpy as np
+import pytest
+
+from conftest import recv_line, connect
+from core_ml_components.checkpoint_io import write_checkpoint, read_checkpoint
+from core_ml_components.socket_transfer import recv_exact
+from core_ml_components.upload_protocol import (encode_frame_prefix, parse_frame_prefix, decode_frame_header,
+                                                check_upload_header, upload_header, send_frame, recv_frame,
+                                                FRAME_MAGIC, FRAME_PREFIX, MAX_HEADER_SIZE,
+                                                HELLO_COMMAND, HELLO_REPLY)
+from federated_client.federated_client import FederatedClient
+from server_components.coordinator import Coordinator
+
+
+def test_frame_prefix_round_trip():
+    header = upload_header(3, "model_3.delta", 120, 2, 5, "delta")
+    frame = encode_frame_prefix(header, 4096)
+    header_size, payload_size = parse_frame_prefix(frame[:FRAME_PREFIX.size])
+    assert payload_size == 4096
+    assert decode_frame_header(frame[FRAME_PREFIX.size:FRAME_PREFIX.size + header_size]) == header
+    assert len(frame) == FRAME_PREFIX.size + header_size
+
+
+def test_bad_magic():
+    prefix = FRAME_PREFIX.pack(b"FLU1", 10, 0)
+    with pytest.raises(ValueError, match="початок кадру"):
+        parse_frame_prefix(prefix)
+
+
+def test_oversized_header():
+    prefix = FRAME_PREFIX.pack(FRAME_MAGIC, MAX_HEADER_SIZE + 1, 0)
+    with pytest.raises(ValueError, match="Завеликий заголовок"):
+        parse_frame_prefix(prefix)
+
+
+def test_header_must_be_object():
+    with pytest.raises(ValueError):
+        decode_frame_header(json.dumps([1, 2]).encode())
+
+
+@pytest.mark.parametrize("filename", ["../global_model/global_model_1.ckpt", "/etc/passwd", "dir/model.ckpt", ""])
+def test_path_traversal_filename(filename):
+    header = upload_header(1, filename, 10, 1, 1, "checkpoint")
+    with pytest.raises(ValueError, match="ім'я файлу"):
+        check_upload_header(header)
+
+
+def test_upload_header_checks():
+    header = upload_header(1, "model_1.ckpt", 10, 1, 1, "checkpoint")
+    assert check_upload_header(header) is header
+    with pytest.raises(ValueError, match="відсутні поля"):
+        check_upload_header({key: value for key, value in header.items() if key != "codec"})
+    with pytest.raises(ValueError, match="формат вмісту"):
+        check_upload_header(dict(header, codec="pickle"))
+    with pytest.raises(ValueError, match="від'ємною"):
+        check_upload_header(dict(header, data_count=-1))
+
+
+def negotiating_client(protocol, server_sock, reply, timeout=0.2):
+    """Об'єкт з полями, які використовують negotiate_protocol та recv_response"""
+    client_sock, peer = socket.socketpair()
+    client = types.SimpleNamespace(protocol=protocol, negotiation_timeout=timeout, socket=client_sock,
+                                   late_hello_reply=False, process_response=FederatedClient.process_response)
+    if reply:
+        peer.sendall(f"{HELLO_REPLY}\n".encode())
+    server_sock.append(peer)
+    return client
+
+
+def test_negotiation_v2_reply():
+    peers = []
+    client = negotiating_client("auto", peers, reply=True)
+    assert FederatedClient.negotiate_protocol(client) == 2
+    assert recv_line(peers[0]) == HELLO_COMMAND
+    assert not client.late_hello_reply
+
+
+def test_negotiation_falls_back_to_v1():
+    peers = []
+    client = negotiating_client("auto", peers, reply=False)
+    assert FederatedClient.negotiate_protocol(client) == 1
+    assert client.late_hello_reply
+
+
+def test_negotiation_v2_required():
+    peers = []
+    client = negotiating_client("v2", peers, reply=False)
+    with pytest.raises(Exception, match="не підтримує протокол v2"):
+        FederatedClient.negotiate_protocol(client)
+
+
+def test_negotiation_v1_sends_nothing():
+    peers = []
+    client = negotiating_client("v1", peers, reply=False)
+    assert FederatedClient.negotiate_protocol(client) == 1
+    peers[0].setblocking(False)
+    with pytest.raises(BlockingIOError):
+        peers[0].recv(1)
+
+
+@pytest.mark.parametrize("server_output", [
+    [f"{HELLO_REPLY}\n4096\n"],
+    [f"\x00{HELLO_REPLY}\n", "4096\n"],
+])
+def test_recv_response_strips_late_hello(server_output):
+    client_sock, peer = socket.socketpair()
+    client = types.SimpleNamespace(socket=client_sock, late_hello_reply=True)
+    for chunk in server_output:
+        peer.sendall(chunk.encode())
+    assert FederatedClient.recv_response(client).strip() == "4096"
+    assert not client.late_hello_reply
+
+
+def test_recv_response_without_late_hello():
+    client_sock, peer = socket.socketpair()
+    client = types.SimpleNamespace(socket=client_sock, late_hello_reply=False)
+    peer.sendall(b"RETRAIN\n")
+    assert FederatedClient.recv_response(client) == "RETRAIN\n"
+
+
+def checkpoint_payload(path, weights):
+    write_checkpoint(str(path), weights)
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def v2_upload(payload, filename, data_count=10):
+    """Клієнт v2: узгодження, RETRAIN, кадр моделі; повертає (підтвердження, нова глобальна модель)"""
+    def client(port):
+        with connect(port) as sock:
+            sock.sendall(f"{HELLO_COMMAND}\n".encode())
+            assert recv_line(sock) == HELLO_REPLY
+            sock.sendall(b"LISTEN_COMMANDS\n")
+            assert recv_line(sock) == "RETRAIN"
+            send_frame(sock, upload_header(1, filename, data_count, 1, 1, "checkpoint"), payload)
+            ack, ack_payload = recv_frame(sock)
+            assert len(ack_payload) == 0
+            if ack["status"] != "OK":
+                return ack, None
+            size = int(recv_line(sock))
+            sock.sendall(b"OK\n")
+            return ack, bytes(recv_exact(sock, size))
+    return client
+
+
+def test_v2_upload_loopback(tmp_path, run_coordinator):
+    weights = {"dense/kernel": np.arange(12, dtype=np.float32).reshape(3, 4),
+               "dense/bias": np.ones(4, dtype=np.float32)}
+    payload = checkpoint_payload(tmp_path / "upload.ckpt", weights)
+
+    coordinator = Coordinator(buffer_size=1, port=0)
+    [(ack, model)] = run_coordinator(coordinator, v2_upload(payload, "model_1.ckpt"))
+
+    assert ack == {"status": "OK"}
+    received = tmp_path / "received.ckpt"
+    received.write_bytes(model)
+    restored = read_checkpoint(str(received))
+    for name, value in weights.items():
+        np.testing.assert_allclose(restored[name], value)
+    assert coordinator.global_state.version == 1
+
+
+def test_v2_upload_rejected_filename(tmp_path, run_coordinator):
+    payload = checkpoint_payload(tmp_path / "upload.ckpt", {"w": np.zeros(2, dtype=np.float32)})
+    coordinator = Coordinator(buffer_size=1, port=0)
+    [(ack, model)] = run_coordinator(coordinator, v2_upload(payload, "../model_1.ckpt"))
+
+    assert ack["status"] == "ERROR"
+    assert "ім'я файлу" in ack["message"]
+    assert model is None
+    assert coordinator.uploads == []
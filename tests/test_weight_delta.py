@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+
+from core_ml_components.weight_delta import (DeltaCompressor, compress_tensor, decompress_tensor, weight_delta,
+                                             write_delta, read_delta, apply_delta, tensors_digest)
+
+
+def make_weights(rng):
+    return {
+        "kernel": rng.standard_normal((6, 288)).astype(np.float32),
+        "bias": rng.standard_normal((2, 288)).astype(np.float32),
+        "dense": rng.standard_normal((32,)).astype(np.float32),
+    }
+
+
+@pytest.mark.parametrize("method", ["int8", "topk"])
+def test_delta_file_round_trip(tmp_path, method):
+    rng = np.random.default_rng(0)
+    base = make_weights(rng)
+    trained = {name: value + 0.01 * rng.standard_normal(value.shape).astype(np.float32)
+               for name, value in base.items()}
+    delta = weight_delta(trained, base)
+    compressed = DeltaCompressor(method, topk_ratio=0.1).compress(delta)
+
+    path = str(tmp_path / "upload.delta")
+    write_delta(path, compressed, base, method)
+    digest, restored = read_delta(path)
+
+    assert digest == tensors_digest(base)
+    for name, value in delta.items():
+        expected = decompress_tensor(compressed[name], method, value.shape)
+        np.testing.assert_array_equal(restored[name], expected)
+    weights = apply_delta(base, restored)
+    assert all(weights[name].dtype == base[name].dtype for name in base)
+    if method == "int8":
+        for name in base:
+            scale = np.max(np.abs(delta[name])) / 127
+            assert np.max(np.abs(weights[name] - trained[name])) <= scale / 2 + 1e-6
+
+
+def test_topk_keeps_largest_values():
+    value = np.array([0.1, -5.0, 0.2, 3.0, -0.3, 0.0, 1.0, -0.05], dtype=np.float32)
+    encoded = compress_tensor(value, "topk", topk_ratio=0.25)
+    np.testing.assert_array_equal(encoded["indices"], [1, 3])
+    np.testing.assert_array_equal(decompress_tensor(encoded, "topk", value.shape),
+                                  [0, -5.0, 0, 3.0, 0, 0, 0, 0])
+
+
+def test_int8_zero_tensor():
+    encoded = compress_tensor(np.zeros((3, 4), dtype=np.float32), "int8")
+    np.testing.assert_array_equal(decompress_tensor(encoded, "int8", (3, 4)), np.zeros((3, 4)))
+
+
+def test_unknown_method():
+    with pytest.raises(ValueError):
+        DeltaCompressor("fp16")
+    with pytest.raises(ValueError):
+        compress_tensor(np.ones(3), "fp16")
+
+
+def test_error_feedback_delivers_dropped_updates_later():
+    """Сума переданих дельт плюс залишок дорівнює сумі справжніх дельт"""
+    rng = np.random.default_rng(1)
+    compressor = DeltaCompressor("topk", topk_ratio=0.05)
+    sent = np.zeros((6, 288), dtype=np.float32)
+    total = np.zeros((6, 288), dtype=np.float32)
+    for _ in range(5):
+        delta = rng.standard_normal((6, 288)).astype(np.float32)
+        total += delta
+        compressed = compressor.compress({"kernel": delta})
+        sent += decompress_tensor(compressed["kernel"], "topk", delta.shape)
+        compressor.commit()
+    np.testing.assert_allclose(sent + compressor.residual["kernel"], total, atol=1e-5)
+
+
+def test_residual_waits_for_commit():
+    rng = np.random.default_rng(2)
+    delta = {"kernel": rng.standard_normal((6, 288)).astype(np.float32)}
+    compressor = DeltaCompressor("topk", topk_ratio=0.05)
+
+    first = compressor.compress(delta)
+    assert compressor.residual == {}
+    compressor.discard()
+
+    # Невдале завантаження не змінює похибку: повторна спроба дає те саме
+    retry = compressor.compress(delta)
+    np.testing.assert_array_equal(retry["kernel"]["indices"], first["kernel"]["indices"])
+    np.testing.assert_array_equal(retry["kernel"]["values"], first["kernel"]["values"])
+
+    compressor.commit()
+    expected = delta["kernel"] - decompress_tensor(retry["kernel"], "topk", delta["kernel"].shape)
+    np.testing.assert_array_equal(compressor.residual["kernel"], expected)
+    assert compressor.pending_residual is None
+
+
+def test_without_error_feedback_no_residual():
+    compressor = DeltaCompressor("int8", error_feedback=False)
+    compressor.compress({"kernel": np.ones((2, 2), dtype=np.float32)})
+    compressor.commit()
+    assert compressor.residual == {}